@@ -87,6 +87,7 @@ setup(
         'console_scripts': [
             'janggu = janggu.cli:main',
             'janggu-trim = janggu.janggutrim:main',
+            'janggu-cache = janggu.janggucache:main',
         ]
     }
 )
@@ -0,0 +1,309 @@
+"""Registry of the cached datasets.
+
+The datasets are cached in JANGGU_OUTPUT/datasets. The registry
+records the last access and the pinning status of each cache entry,
+which allows to bound the total size of the cache by evicting
+the least recently used entries.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+from janggu.utils import _get_output_data_location
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    # file locking is not available on Windows
+    fcntl = None
+
+# index file of directory-based cache entries
+INDEXFILE = 'index.json'
+
+_CACHE_ENDINGS = ['.h5', '.npz', '.mmap', '.chunked']
+# default number of seconds after the last access during which
+# entries are not evicted automatically, as they might still be
+# in use by other processes.
+_CACHE_GRACE_PERIOD = 10 * 60
+# entries that were opened by this process
+_OPEN_ENTRIES = set()
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024**2, 'G': 1024**3, 'T': 1024**4}
+
+
+def _read_manifest(filename):
+    """Reads a JSON manifest (e.g. the file fingerprints)."""
+    try:
+        with open(filename, 'r') as file_:
+            return json.load(file_)
+    except (IOError, ValueError):
+        return {}
+
+
+def _write_manifest(filename, content):
+    """Writes a JSON manifest.
+
+    The manifest is replaced atomically, such that concurrent
+    processes never read a partially written manifest.
+    """
+    if not os.path.exists(os.path.dirname(filename)):
+        os.makedirs(os.path.dirname(filename))
+    with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(filename),
+                                     suffix='.tmp', delete=False) as file_:
+        json.dump(content, file_)
+    os.replace(file_.name, filename)
+
+
+def parse_size(size):
+    """Parses a size in bytes, e.g. '500M' or '20G'.
+
+    Parameters
+    ----------
+    size : str or int
+        Size in bytes, optionally with one of the suffixes K, M, G or T.
+
+    Returns
+    -------
+    int
+        Size in bytes.
+    """
+    size_ = str(size).strip().upper()
+    if size_.endswith('B'):
+        size_ = size_[:-1]
+    unit = size_[-1:] if size_[-1:] in _SIZE_UNITS else ''
+    try:
+        value = float(size_[:len(size_) - len(unit)])
+    except ValueError:
+        raise ValueError('Invalid size: "{}"'.format(size))
+    if value < 0:
+        raise ValueError('Invalid size: "{}"'.format(size))
+    return int(value * _SIZE_UNITS[unit])
+
+
+def get_cache_max_size():
+    """Size budget of the dataset caches.
+
+    The budget is set via the environment variable JANGGU_CACHE_MAX_SIZE.
+    Returns None if the caches are not bounded.
+    """
+    size = os.environ.get('JANGGU_CACHE_MAX_SIZE')
+    if size is None or size == '':
+        return None
+    return parse_size(size)
+
+
+def get_cache_grace_period():
+    """Grace period of the automatic cache eviction in seconds.
+
+    Entries that were accessed within the grace period are
+    not evicted automatically. The grace period is set via the
+    environment variable JANGGU_CACHE_GRACE_PERIOD. Default: 600.
+    """
+    period = os.environ.get('JANGGU_CACHE_GRACE_PERIOD')
+    if period is None or period == '':
+        return _CACHE_GRACE_PERIOD
+    try:
+        period = float(period)
+    except ValueError:
+        raise ValueError('JANGGU_CACHE_GRACE_PERIOD must be a number of seconds, '
+                         'got "{}"'.format(period))
+    if period < 0:
+        raise ValueError('JANGGU_CACHE_GRACE_PERIOD must not be negative, '
+                         'got "{}"'.format(period))
+    return period
+
+
+def _get_cache_registry():
+    """Location of the registry of cache entries."""
+    return os.path.join(_get_output_data_location(None), 'registry.json')
+
+
+@contextmanager
+def _registry_lock():
+    """Holds an exclusive lock on the cache registry.
+
+    The lock is acquired on a separate lock file,
+    because the registry itself is replaced when it is written.
+    Concurrent processes therefore never lose each other's updates.
+    """
+    filename = _get_cache_registry() + '.lock'
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'a') as file_:
+        if fcntl is not None:
+            fcntl.flock(file_.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file_.fileno(), fcntl.LOCK_UN)
+
+
+def _cache_entry_name(path):
+    """Name of a cache entry relative to the dataset cache directory."""
+    return os.path.relpath(os.path.abspath(path), _get_output_data_location(None))
+
+
+def _cache_entry_size(path):
+    """Size of a cache file or cache directory in bytes."""
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            size += os.path.getsize(os.path.join(dirpath, filename))
+    return size
+
+
+def list_cache_entries():
+    """Lists the cached datasets.
+
+    The cache entries are determined from the dataset cache directory
+    (JANGGU_OUTPUT/datasets) and annotated with the last access time
+    and the pinning status from the cache registry. Entries that
+    have not been accessed since the registry was introduced
+    are reported with their modification time.
+
+    Returns
+    -------
+    list(dict)
+        Cache entries with the keys 'name', 'path', 'size', 'accessed'
+        and 'pinned', sorted from the least to the most recently used entry.
+    """
+    root = _get_output_data_location(None)
+    registry = _read_manifest(_get_cache_registry())
+    entries = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        paths = [os.path.join(dirpath, filename) for filename in filenames]
+        for dirname in list(dirnames):
+            if dirname.endswith(('.mmap', '.chunked')):
+                # directory-based entries are not descended into
+                dirnames.remove(dirname)
+                paths.append(os.path.join(dirpath, dirname))
+        for path in paths:
+            if not path.endswith(tuple(_CACHE_ENDINGS)):
+                continue
+            name = _cache_entry_name(path)
+            record = registry.get(name, {})
+            entries.append({'name': name, 'path': path,
+                            'size': _cache_entry_size(path),
+                            'accessed': record.get('accessed',
+                                                   os.path.getmtime(path)),
+                            'pinned': record.get('pinned', False)})
+    return sorted(entries, key=lambda entry: entry['accessed'])
+
+
+def find_cache_entry(name):
+    """Finds a cache entry by its name or path."""
+    for entry in list_cache_entries():
+        if name in [entry['name'], entry['path']] or \
+                os.path.abspath(name) == entry['path']:
+            return entry
+    raise ValueError('Unknown cache entry: "{}"'.format(name))
+
+
+def pin_cache_entry(name, pinned=True):
+    """Pins a cache entry, such that it is not evicted.
+
+    Parameters
+    ----------
+    name : str
+        Name of the entry (relative to JANGGU_OUTPUT/datasets) or its path.
+    pinned : boolean
+        Whether to pin or unpin the entry. Default: True.
+    """
+    with _registry_lock():
+        entry = find_cache_entry(name)
+        registry = _read_manifest(_get_cache_registry())
+        record = registry.setdefault(entry['name'], {'accessed': entry['accessed']})
+        record['pinned'] = pinned
+        _write_manifest(_get_cache_registry(), registry)
+
+
+def prune_cache(max_size, keep=None, dry_run=False, grace_period=0):
+    """Evicts the least recently used cache entries.
+
+    Unpinned entries are removed, starting with the least recently
+    used one, until the total size of the cache entries does
+    not exceed max_size.
+
+    Parameters
+    ----------
+    max_size : int
+        Size budget in bytes.
+    keep : str, list(str) or None
+        Paths of cache entries that must not be evicted, e.g.
+        the entries that are currently in use. Default: None.
+    dry_run : boolean
+        If True, the entries are only determined, but not removed.
+        Default: False.
+    grace_period : float
+        Entries that were accessed within the last grace_period seconds
+        are not evicted. Default: 0.
+
+    Returns
+    -------
+    list(dict)
+        Evicted cache entries.
+    """
+    with _registry_lock():
+        entries = list_cache_entries()
+        total = sum(entry['size'] for entry in entries)
+        keep = [keep] if isinstance(keep, str) else keep or []
+        keep = set(os.path.abspath(path) for path in keep)
+        recent = time.time() - grace_period
+
+        evicted = []
+        for entry in entries:
+            if total <= max_size:
+                break
+            if entry['pinned'] or os.path.abspath(entry['path']) in keep or \
+                    entry['accessed'] > recent:
+                continue
+            evicted.append(entry)
+            total -= entry['size']
+
+        if dry_run:
+            return evicted
+
+        for entry in evicted:
+            if os.path.isdir(entry['path']):
+                shutil.rmtree(entry['path'], ignore_errors=True)
+            elif os.path.exists(entry['path']):
+                os.remove(entry['path'])
+
+        # records of evicted or otherwise removed entries are dropped
+        names = set(entry['name'] for entry in entries) - \
+            set(entry['name'] for entry in evicted)
+        registry = _read_manifest(_get_cache_registry())
+        if any(name not in names for name in registry):
+            _write_manifest(_get_cache_registry(),
+                            {name: record for name, record in registry.items()
+                             if name in names})
+    return evicted
+
+
+def _touch_cachefile(filename):
+    """Records the access of a cache entry.
+
+    If a size budget is set via JANGGU_CACHE_MAX_SIZE and the entry
+    is new, the least recently used entries are evicted afterwards.
+    Entries that were opened by this process or that were recently
+    accessed by other processes are retained, since they may still be in use.
+    """
+    _OPEN_ENTRIES.add(os.path.abspath(filename))
+    max_size = get_cache_max_size()
+    with _registry_lock():
+        registry = _read_manifest(_get_cache_registry())
+        name = _cache_entry_name(filename)
+        created = name not in registry
+        record = registry.setdefault(name, {'pinned': False})
+        record['accessed'] = time.time()
+        _write_manifest(_get_cache_registry(), registry)
+
+    # the lock is not reentrant, hence, it is released before pruning
+    if max_size is not None and created:
+        prune_cache(max_size, keep=list(_OPEN_ENTRIES),
+                    grace_period=get_cache_grace_period())
@@ -1,17 +1,18 @@
 """Coverage dataset"""
 
 import copy
+import gzip
 import os
-import tempfile
 import warnings
 from collections import OrderedDict
+from itertools import islice
+from multiprocessing import Pool
 
 import numpy as np
 import pyBigWig
 import pysam
 import pandas as pd
 from progress.bar import Bar
-from pybedtools import BedTool
 from pybedtools import Interval
 
 from janggu.data.data import Dataset
@@ -19,6 +20,9 @@ from janggu.data.genomic_indexer import GenomicIndexer
 from janggu.data.genomic_indexer import check_gindexer_compatibility
 from janggu.data.genomicarray import create_genomic_array
 from janggu.data.genomicarray import create_sha256_cache
+from janggu.data.genomicarray import get_default_storage_options
+from janggu.data.intervals import intersect
+from janggu.data.intervals import merge
 from janggu.utils import _check_valid_files
 from janggu.utils import _get_genomic_reader
 from janggu.utils import _to_list
@@ -69,13 +73,15 @@ class BedGenomicSizeLazyLoader:
         gsize = OrderedDict()
 
         for bedfile in self.bedfiles:
-            bed = BedTool(bedfile).sort().merge()
-            for region in bed:
-                if region.chrom not in gsize:
-                    gsize[region.chrom] = region.end
+            features = _read_bed_features(bedfile, 'binary')
+            chroms, _, ends = merge((features['chrom'], features['start'],
+                                     features['end']))
+            for chrom, end in zip(chroms.tolist(), ends):
+                if chrom not in gsize:
+                    gsize[chrom] = int(end)
                     continue
-                if gsize[region.chrom] < region.end:
-                    gsize[region.chrom] = region.end
+                if gsize[chrom] < end:
+                    gsize[chrom] = int(end)
 
         gsize_ = GenomicIndexer.create_from_genomesize(gsize)
 
@@ -108,6 +114,185 @@ class BedGenomicSizeLazyLoader:
         """string representation"""
         return "full_genome_lazy_loading"
 
+    def digest(self):
+        """digest for the cache key"""
+        return self.tostr()
+
+
+# loader function of a worker process
+_LOADER_FUNCTION = None
+
+
+def _init_loader_worker(function):
+    """Sets the loader function of a worker process.
+
+    The loader is transferred once per worker process
+    rather than with every job.
+    """
+    global _LOADER_FUNCTION  # pylint: disable=global-statement
+    _LOADER_FUNCTION = function
+
+
+def _call_loader_worker(job):
+    """Evaluates a job with the loader function of the worker process."""
+    return _LOADER_FUNCTION(*job)
+
+
+def _run_loader_jobs(garray, function, jobs, n_jobs=1, message=None):
+    """Evaluate loader jobs and write the results to the genomic array.
+
+    Each job returns a list of (interval, condition, values) tuples.
+    The jobs may be evaluated in a pool of processes, but the results are
+    always written to the genomic array by the calling process,
+    such that all storage types are supported.
+
+    Parameters
+    ----------
+    garray : GenomicArray
+        Genomic array that is filled.
+    function : callable
+        Function that evaluates a job.
+    jobs : list(tuple)
+        List of arguments for function.
+    n_jobs : int
+        Number of processes. If n_jobs=-1, all CPUs are used. Default: 1.
+    message : str or None
+        Message for the progress bar. If None, no progress is shown.
+
+    Returns
+    -------
+    GenomicArray
+        The filled genomic array.
+    """
+    if n_jobs is None or n_jobs == 0 or n_jobs < -1:
+        raise ValueError('n_jobs must be positive or -1.')
+    if n_jobs == -1:
+        n_jobs = os.cpu_count()
+    n_jobs = min(n_jobs, len(jobs))
+
+    if message is not None: bar = Bar(message, max=len(jobs))
+
+    pool = None
+    if n_jobs > 1:
+        # only the per-job arguments are sent to the workers
+        pool = Pool(n_jobs, initializer=_init_loader_worker,
+                    initargs=(function,))
+        results = pool.imap(_call_loader_worker, jobs)
+    else:
+        results = (function(*job) for job in jobs)
+
+    try:
+        for result in results:
+            for interval, condition, values in result:
+                garray[interval, condition] = values
+            if message is not None: bar.next()
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    if message is not None: bar.finish()
+    return garray
+
+
+# number of alignments that are processed at once
+_BAM_CHUNK_SIZE = 1 << 16
+
+# sam flags
+_BAM_PAIRED = 0x1
+_BAM_PROPER_PAIR = 0x2
+_BAM_UNMAPPED = 0x4
+_BAM_REVERSE = 0x10
+_BAM_READ2 = 0x80
+
+
+def _alignment_positions(alns, min_mapq, pairedend):
+    """Determine the counting positions of a chunk of alignments.
+
+    Parameters
+    ----------
+    alns : list(pysam.AlignedSegment)
+        Alignments.
+    min_mapq : int
+        Minimum mapping quality to be considered.
+    pairedend : str
+        Paired-end mode 'midpoint' or '5prime'.
+
+    Returns
+    -------
+    tuple(np.ndarray, np.ndarray)
+        Positions and strands (0: forward, 1: reverse) of the
+        alignments that pass the filters.
+    """
+    nalns = len(alns)
+
+    def _field(values):
+        return np.fromiter(values, dtype='int64', count=nalns)
+
+    flag = _field(aln.flag for aln in alns)
+    mapq = _field(aln.mapping_quality for aln in alns)
+    start = _field(aln.reference_start for aln in alns)
+    # reference_end is None for unmapped reads, which are discarded anyway
+    end = _field(aln.reference_end or -1 for aln in alns)
+    refid = _field(aln.reference_id for aln in alns)
+    nextstart = _field(aln.next_reference_start for aln in alns)
+    nextrefid = _field(aln.next_reference_id for aln in alns)
+
+    reverse = (flag & _BAM_REVERSE) > 0
+    paired = (flag & _BAM_PAIRED) > 0
+
+    keep = ((flag & _BAM_UNMAPPED) == 0) & (mapq >= min_mapq)
+
+    # single end reads are counted at the 5 prime end
+    pos = np.where(reverse, end, start)
+
+    # paired end reads are only considered if both mates
+    # are properly mapped to the same reference
+    keep &= ~paired | (((flag & _BAM_PROPER_PAIR) > 0) & (refid == nextrefid))
+    if paired.any():
+        if pairedend == 'midpoint':
+            # only consider read1 so as not to double count fragments
+            keep &= ~paired | ((flag & _BAM_READ2) == 0)
+            tlen = _field(aln.template_length for aln in alns)
+            ppos = np.minimum(start, nextstart) + np.abs(tlen) // 2
+        else:
+            qlen = _field(aln.query_length for aln in alns)
+            # last position of the downstream read or
+            # first position of the upstream read
+            ppos = np.where(reverse, np.maximum(end, nextstart + qlen),
+                            np.minimum(start, nextstart))
+        pos = np.where(paired, ppos, pos)
+
+    return pos[keep], reverse[keep].astype('int64')
+
+
+def _interval_blocks(intervals, distance=0):
+    """Group intervals by the blocks of merged intervals they belong to.
+
+    Parameters
+    ----------
+    intervals : list(Interval)
+        Intervals on the same chromosome.
+    distance : int
+        Intervals that are separated by at most distance base pairs
+        are merged as well. Default: 0.
+
+    Returns
+    -------
+    list(tuple)
+        List of (start, end, intervals) tuples for each block.
+    """
+    starts = [interval.start for interval in intervals]
+    _, bstarts, bends = merge(([interval.chrom for interval in intervals], starts,
+                               [interval.end for interval in intervals]),
+                              distance)
+    groups = [[] for _ in bstarts]
+    for bidx, interval in zip(np.searchsorted(bstarts, starts, side='right') - 1,
+                              intervals):
+        groups[bidx].append(interval)
+    return [(int(start), int(end), group)
+            for start, end, group in zip(bstarts, bends, groups)]
+
 
 class BamLoader:
     """BamLoader class.
@@ -115,6 +300,14 @@ class BamLoader:
     This class loads the GenomicArray with read count coverage
     extracted from BAM files.
 
+    The alignments are processed in chunks. For each chunk,
+    the counting positions are determined with numpy and
+    accumulated per strand using np.bincount.
+    Only the alignments in the vicinity of the regions,
+    extended by template_extension, are fetched.
+    If the whole genome is stored, the reads are counted in blocks of
+    at most 1Mb.
+
     Parameters
     ----------
     files : str or list(str)
@@ -127,115 +320,134 @@ class BamLoader:
         It may be possible that both read ends are located outside
         of the given interval, but the mid-points inside.
         template_extension extends the interval in order to correcly determine
-        the mid-points.
+        the mid-points. Fragments whose first read is located further away
+        than template_extension from the interval are not counted.
     min_mapq : int
         Minimum mapping quality to be considered.
     pairedend : str
         Paired-end mode 'midpoint' or '5prime'.
+    threads : int
+        Number of threads used for decompressing the BAM files. Default: 1.
+    n_jobs : int
+        Number of processes for loading the files and chromosomes
+        in parallel. Default: 1.
     verbose : boolean
         Default: False
     """
     def __init__(self, files, gsize, template_extension,
-                 min_mapq, pairedend, verbose=False):
+                 min_mapq, pairedend, threads=1, n_jobs=1, verbose=False):
         self.files = files
         self.gsize = gsize
         self.template_extension = template_extension
         self.min_mapq = min_mapq
         self.pairedend = pairedend
+        self.threads = threads
+        self.n_jobs = n_jobs
         self.verbose = verbose
 
-    def __call__(self, garray):
-        files = self.files
-        gsize = self.gsize
-        template_extension = self.template_extension
-        resolution = garray.resolution
-        dtype = garray.typecode
-        min_mapq = self.min_mapq
-        pairedend = self.pairedend
+    def _count(self, alns, blocks):
+        """Accumulate the read counts of the alignments into blocks.
 
-        if self.verbose: bar = Bar('Loading bam files'.format(len(files)), max=len(files))
-        for i, sample_file in enumerate(files):
-            aln_file = pysam.AlignmentFile(sample_file, 'rb')  # pylint: disable=no-member
+        Parameters
+        ----------
+        alns : iterable(pysam.AlignedSegment)
+            Alignments.
+        blocks : list(tuple(int, np.ndarray))
+            Sorted, non-overlapping blocks given by the genomic position
+            of their first row and an array of shape (length, 2) that holds
+            the counts per strand.
+        """
+        if not blocks:
+            return
+        bstarts = np.asarray([start for start, _ in blocks], dtype='int64')
+        bends = bstarts + np.asarray([array.shape[0] for _, array in blocks],
+                                     dtype='int64')
+        alns = iter(alns)
+        while True:
+            chunk = list(islice(alns, _BAM_CHUNK_SIZE))
+            if not chunk:
+                break
+            pos, strand = _alignment_positions(chunk, self.min_mapq,
+                                               self.pairedend)
+            # reads whose 5 prime end or mid point lies outside
+            # of the blocks are discarded
+            bidx = np.searchsorted(bstarts, pos, side='right') - 1
+            inside = (bidx >= 0) & (pos < bends[np.maximum(bidx, 0)])
+            pos, strand, bidx = pos[inside], strand[inside], bidx[inside]
+            for block in np.unique(bidx):
+                sel = bidx == block
+                bpos = pos[sel] - bstarts[block]
+                # the alignments are sorted by position, therefore
+                # the counts are only accumulated over the span of the chunk.
+                first, last = bpos.min(), bpos.max() + 1
+                counts = np.bincount((bpos - first) * 2 + strand[sel],
+                                     minlength=2 * (last - first))
+                array = blocks[block][1]
+                array[first:last] += counts.reshape(-1, 2).astype(array.dtype)
+
+    def _load_regions(self, condition, sample_file, chrom, regions, dtype):
+        """Load the read counts of a set of regions on a chromosome.
+
+        The regions are merged into blocks. Only the alignments
+        in the vicinity of each block, extended by template_extension,
+        are fetched from the indexed BAM file.
+
+        Returns
+        -------
+        list(tuple)
+            List of (interval, condition, values) tuples
+            that are written to the genomic array.
+        """
+        aln_file = pysam.AlignmentFile(sample_file, 'rb',  # pylint: disable=no-member
+                                       threads=self.threads)
+        try:
+            if chrom not in aln_file.header.references:
+                return []
+            chromlen = aln_file.header.get_reference_length(chrom)
+            ext = self.template_extension
+
+            # blocks whose fetched regions would overlap are combined
+            blocks = _interval_blocks(regions, 2 * ext)
+            arrays = [(bstart, np.zeros((bend - bstart, 2), dtype=dtype))
+                      for bstart, bend, _ in blocks]
+
+            for bstart, array in arrays:
+                # the 5 prime end of reverse strand reads is taken at
+                # reference_end, hence, reads ending just upstream of the
+                # block are fetched as well.
+                fstart = min(max(bstart - ext - 1, 0), chromlen)
+                fend = min(bstart + array.shape[0] + ext, chromlen)
+                if fend > fstart:
+                    self._count(aln_file.fetch(str(chrom), fstart, fend),
+                                [(bstart, array)])
+        finally:
+            aln_file.close()
+
+        return [(interval, condition,
+                 array[(interval.start - bstart):(interval.end - bstart), :])
+                for (bstart, array), (_, _, intervals) in zip(arrays, blocks)
+                for interval in intervals]
 
-            unique_chroms = list(set(gsize.chrs))
-            for process_chrom in unique_chroms:
-                if process_chrom not in set(aln_file.header.references):
+    def __call__(self, garray):
+        unique_chroms = list(set(self.gsize.chrs))
+        jobs = []
+        for i, sample_file in enumerate(self.files):
+            for chrom in unique_chroms:
+                tmp_gsize = self.gsize.filter_by_region(include=chrom)
+                if not garray._full_genome_stored:
+                    jobs.append((i, sample_file, chrom, list(tmp_gsize),
+                                 garray.typecode))
                     continue
-                tmp_gsize = gsize.filter_by_region(include=process_chrom)
-                length = aln_file.header.get_reference_length(process_chrom) + tmp_gsize.flank
-
-                array = np.zeros((length, 2), dtype=dtype)
-
-                for aln in aln_file.fetch(str(process_chrom)):
-
-                    if aln.is_unmapped:
-                        continue
-
-                    if aln.mapq < min_mapq:
-                        continue
-
-                    if aln.is_paired:
-                        # if paired end read, consider the midpoint
-                        if not (aln.is_proper_pair and
-                                aln.reference_name == aln.next_reference_name):
-                            # only consider paired end reads if both mates
-                            # are properly mapped and they map to the
-                            # same reference_name
-                            continue
-                        # if the next reference start >= 0,
-                        # the read is considered as a paired end read
-                        # in this case we consider the mid point
-                        if pairedend == 'midpoint':
-                            if aln.is_read2:
-                                # only consider read1 so as not to double count
-                                # fragments for paired end reads
-                                # read2 will also be false for single end
-                                # reads.
-                                continue
-                            pos = min(aln.reference_start,
-                                      aln.next_reference_start) + \
-                                      abs(aln.template_length) // 2
-                        else:
-
-                            if aln.is_reverse:
-                                # last position of the downstream read
-                                pos = max(aln.reference_end,
-                                          aln.next_reference_start +
-                                          aln.query_length)
-                            else:
-                                # first position of the upstream read
-                                pos = min(aln.reference_start,
-                                          aln.next_reference_start)
-                    else:
-                        # here we consider single end reads
-                        # whose 5 prime end is determined strand specifically
-                        if aln.is_reverse:
-                            pos = aln.reference_end
-                        else:
-                            pos = aln.reference_start
-
-                    if not garray._full_genome_stored:
-                        # if we get here, a region was given,
-                        # otherwise, the entire chromosome is read.
-                        #pos -= start + template_extension
-
-                        if pos < 0 or pos >= length:
-                            # if the read 5 p end or mid point is outside
-                            # of the region of interest, the read is discarded
-                            continue
-
-                    # fill up the read strand specifically
-                    if aln.is_reverse:
-                        array[pos, 1] += 1
-                    else:
-                        array[pos, 0] += 1
 
-                for interval in tmp_gsize:
-                    garray[interval, i] = array[interval.start:interval.end, :]
-            if self.verbose: bar.next()
-        if self.verbose: bar.finish()
-        return garray
+                # the chromosomes are counted blockwise to keep
+                # the memory consumption bounded.
+                jobs += [(i, sample_file, chrom, [block], garray.typecode)
+                         for interval in tmp_gsize
+                         for block in garray.blocks(interval)]
 
+        return _run_loader_jobs(garray, self._load_regions, jobs,
+                                self.n_jobs, 'Loading bam files'
+                                if self.verbose else None)
 
 
 class BigWigLoader:
@@ -252,50 +464,354 @@ class BigWigLoader:
         GenomicIndexer representing the genomic region that should be loaded.
     nan_to_num : bool
         Whether to convert NAN's to zeros or not. Default: True.
+    n_jobs : int
+        Number of processes for loading the files and chromosomes
+        in parallel. Default: 1.
+    summary : str or None
+        If 'mean', 'max' or 'sum', the signal is binned at the resolution
+        of the genomic array using the zoom levels of the bigwig files.
+        Regions whose length is not a multiple of the resolution or
+        that exceed the chromosome are loaded at base pair resolution.
+        Default: None means that the signal is loaded at base pair resolution.
     verbose : boolean
         Default: False
     """
-    def __init__(self, files, gsize, nan_to_num, verbose=False):
+    def __init__(self, files, gsize, nan_to_num, n_jobs=1, summary=None,
+                 verbose=False):
         self.files = files
         self.gsize = gsize
         self.nan_to_num = nan_to_num
+        self.n_jobs = n_jobs
+        self.summary = summary
         self.verbose = verbose
 
+    def _fetch(self, bwfile, chrom, chromlen, start, out):
+        """Write the signal starting at start into the buffer out.
+
+        Positions outside of the chromosome are set to zero.
+        """
+        out[:] = 0
+        fstart = max(start, 0)
+        fend = min(start + len(out), chromlen)
+        if fend <= fstart:
+            return
+        if pyBigWig.numpy:
+            values = bwfile.values(str(chrom), fstart, fend, numpy=True)
+        else:  # pragma: no cover
+            values = np.asarray(bwfile.values(str(chrom), fstart, fend))
+        if self.nan_to_num:
+            values = np.nan_to_num(values, copy=False)
+        out[(fstart - start):(fend - start)] = values
+
+    def _summarize(self, bwfile, chrom, start, end, nbins):
+        """Binned signal obtained from the zoom levels.
+
+        Bases without data are treated like NaN's in the
+        base pair signal, i.e. they count as zeros if nan_to_num=True.
+        """
+        def _stats(stat):
+            # missing values are returned as None
+            return np.asarray(bwfile.stats(str(chrom), start, end,
+                                           nBins=nbins, type=stat),
+                              dtype='float64')
+
+        coverage = np.nan_to_num(_stats('coverage'))
+        values = _stats(self.summary)
+        if not self.nan_to_num:
+            values[coverage < 1.] = np.nan
+        elif self.summary == 'mean':
+            values = np.nan_to_num(values) * coverage
+        elif self.summary == 'max':
+            values = np.where(coverage < 1., np.fmax(values, 0.), values)
+        else:
+            values = np.nan_to_num(values)
+        return values[:, None]
+
+    def _zoomable(self, interval, chromlen, resolution):
+        """Whether the interval can be loaded from the zoom levels."""
+        return self.summary is not None and resolution is not None \
+            and resolution > 1 and interval.length % resolution == 0 \
+            and 0 <= interval.start and interval.end <= chromlen
+
+    def _load_regions(self, condition, sample_file, chrom, regions,
+                      full_genome, dtype, resolution=1):
+        """Load the signal of a set of regions on a chromosome.
+
+        Returns
+        -------
+        list(tuple)
+            List of (interval, condition, values) tuples
+            that are written to the genomic array.
+        """
+        bwfile = pyBigWig.open(sample_file)
+        chromlen = bwfile.chroms()[chrom]
+        results = []
+
+        zoomed = [region for region in regions
+                  if self._zoomable(region, chromlen, resolution)]
+        for region in zoomed:
+            values = self._summarize(bwfile, chrom, int(region.start),
+                                     int(region.end), region.length // resolution)
+            results.append((region, condition, values.astype(dtype)))
+        if zoomed:
+            regions = [region for region in regions
+                       if not self._zoomable(region, chromlen, resolution)]
+        if not regions:
+            bwfile.close()
+            return results
+
+        if full_genome:
+            for block in regions:
+                array = np.zeros((block.length, 1), dtype=dtype)
+                self._fetch(bwfile, chrom, chromlen, int(block.start), array[:, 0])
+                results.append((block, condition, array))
+            bwfile.close()
+            return results
+
+        # only the merged regions of interest are queried
+        # using a buffer that is reused across the blocks.
+        blocks = _interval_blocks(regions)
+        buffer = np.zeros((max(end - start for start, end, _ in blocks), 1),
+                          dtype=dtype)
+        for bstart, bend, intervals in blocks:
+            array = buffer[:(bend - bstart)]
+            self._fetch(bwfile, chrom, chromlen, bstart, array[:, 0])
+
+            for interval in intervals:
+                results.append((interval, condition,
+                                array[(int(interval.start) - bstart):
+                                      (int(interval.end) - bstart), :].copy()))
+        bwfile.close()
+        return results
+
     def __call__(self, garray):
-        files = self.files
         gsize = self.gsize
-        resolution = garray.resolution
-        dtype = garray.typecode
-        nan_to_num = self.nan_to_num
 
-        if self.verbose: bar = Bar('Loading bigwig files'.format(len(files)), max=len(files))
-        for i, sample_file in enumerate(files):
+        jobs = []
+        unique_chroms = list(set(gsize.chrs))
+        for i, sample_file in enumerate(self.files):
             bwfile = pyBigWig.open(sample_file)
+            chroms = bwfile.chroms()
+            bwfile.close()
 
-            unique_chroms = list(set(gsize.chrs))
             for process_chrom in unique_chroms:
 
+                if process_chrom not in chroms:
+                    continue
+
                 tmp_gsize = gsize.filter_by_region(include=process_chrom)
-                length = max(tmp_gsize.ends) + tmp_gsize.flank
 
-                array = np.zeros((length, 1), dtype=dtype)
+                if garray._full_genome_stored:
+                    # fill the chromosomes blockwise to keep
+                    # the memory consumption bounded.
+                    jobs += [(i, sample_file, process_chrom, [block],
+                              True, garray.typecode, garray.resolution)
+                             for interval in tmp_gsize
+                             for block in garray.blocks(interval)]
+                else:
+                    jobs.append((i, sample_file, process_chrom, list(tmp_gsize),
+                                 False, garray.typecode, garray.resolution))
 
-                if process_chrom not in bwfile.chroms():
-                    continue
-                values = np.asarray(bwfile.values(str(process_chrom),
-                                                  int(0),
-                                                  min(int(length),
-                                                      bwfile.chroms()[process_chrom])))
-                if nan_to_num:
-                    values = np.nan_to_num(values, copy=False)
+        return _run_loader_jobs(garray, self._load_regions, jobs,
+                                self.n_jobs, 'Loading bigwig files'
+                                if self.verbose else None)
 
-                array[:len(values), 0] = values
 
-                for interval in tmp_gsize:
-                    garray[interval, i] = array[int(interval.start):int(interval.end), :]
-            if self.verbose: bar.next()
-        if self.verbose: bar.finish()
-        return garray
+# number of lines that are parsed at once from bed files
+_BED_CHUNK_SIZE = 1 << 20
+
+# annotation formats that are not read as bed columns
+_NON_BED_EXTENSIONS = ['.gtf', '.gff', '.gff3', '.vcf']
+
+
+def _bed_header(filename):
+    """Determine the header of a BED file.
+
+    Returns
+    -------
+    tuple(int, list(str))
+        Number of track, browser and comment lines at the top of the file
+        and the fields of the first feature.
+    """
+    open_ = gzip.open if filename.endswith('.gz') else open
+    nlines = 0
+    fields = []
+    with open_(filename, 'rt') as handle:
+        for line in handle:
+            if not line.startswith(('track', 'browser', '#')):
+                fields = line.rstrip('\n').split('\t')
+                break
+            nlines += 1
+    return nlines, fields
+
+
+def _read_bed_features(regions, mode):
+    """Read the features of a BED or bedGraph file into arrays.
+
+    BED and bedGraph files are parsed in bulk and chunkwise.
+    Other region specifications (e.g. BedTool objects or GTF files)
+    are read via pybedtools.
+
+    Parameters
+    ----------
+    regions : str, list(Interval), BedTool or pandas.DataFrame
+        Features.
+    mode : str
+        Determines which of the columns are read.
+        Mode might be 'binary', 'score', 'categorical', 'score_category',
+        'name_category' or 'bedgraph'.
+
+    Returns
+    -------
+    dict
+        Dictionary with arrays of the chrom, start and end positions
+        as well as the name, score and value (last column) fields
+        if required by the mode.
+    """
+    fields = {'bedgraph': 'value', 'score': 'score', 'categorical': 'score',
+              'score_category': 'score', 'name_category': 'name'}
+    field = fields.get(mode)
+    columns = {'name': 3, 'score': 4}
+
+    filename = regions if isinstance(regions, str) else ''
+    extension = os.path.splitext(filename[:-3] if filename.endswith('.gz')
+                                 else filename)[1]
+    if not os.path.isfile(filename) or extension in _NON_BED_EXTENSIONS:
+        regions_ = _get_genomic_reader(regions)
+        if field == 'score' and regions_[0].score == '.':
+            raise ValueError(
+                'No Score available. Score field must '
+                'present in {}'.format(regions) + \
+                'for mode="{}"'.format(mode))
+        features = {'chrom': [], 'start': [], 'end': []}
+        if field is not None:
+            features[field] = []
+        for region in regions_:
+            features['chrom'].append(region.chrom)
+            features['start'].append(region.start)
+            features['end'].append(region.end)
+            if field == 'value':
+                features[field].append(region.fields[-1])
+            elif field is not None:
+                features[field].append(getattr(region, field))
+        return {key: np.asarray(features[key], dtype='int64'
+                                if key in ['start', 'end'] else None)
+                for key in features}
+
+    nheader, firstline = _bed_header(filename)
+    keys = ['chrom', 'start', 'end'] + ([field] if field is not None else [])
+    if not firstline:
+        return {key: np.zeros(0, dtype='int64' if key in ['start', 'end'] else object)
+                for key in keys}
+
+    usecols = [0, 1, 2]
+    if field == 'value':
+        usecols.append(len(firstline) - 1)
+    elif field is not None:
+        if len(firstline) <= columns[field] or \
+                field == 'score' and firstline[columns[field]] == '.':
+            raise ValueError(
+                'No Score available. Score field must '
+                'present in {}'.format(regions) + \
+                'for mode="{}"'.format(mode))
+        usecols.append(columns[field])
+
+    chunks = {key: [] for key in keys}
+    for chunk in pd.read_csv(filename, sep='\t', header=None, skiprows=nheader,
+                             usecols=usecols, dtype=str, keep_default_na=False,
+                             chunksize=_BED_CHUNK_SIZE):
+        for key, column in zip(keys, sorted(usecols)):
+            values = chunk[column].values
+            chunks[key].append(values.astype('int64')
+                               if key in ['start', 'end'] else values)
+    return {key: np.concatenate(chunks[key]) if chunks[key]
+                 else np.zeros(0, dtype='int64' if key in ['start', 'end'] else object)
+            for key in keys}
+
+
+def _paint_segments(starts, ends, values):
+    """Paint features onto the elementary segments they span.
+
+    The features are painted in the given order, such that
+    later features overwrite earlier ones. Features whose value
+    is NaN are not painted.
+
+    Parameters
+    ----------
+    starts, ends : np.ndarray
+        Features on the same chromosome.
+    values : np.ndarray
+        Feature values.
+
+    Returns
+    -------
+    tuple(np.ndarray, np.ndarray, np.ndarray)
+        Segment boundaries as well as the value and a mask
+        indicating whether a feature was painted for each segment.
+    """
+    painted = ~np.isnan(values) & (ends > starts)
+    starts, ends, values = starts[painted], ends[painted], values[painted]
+
+    bounds = np.unique(np.concatenate([starts, ends]))
+    first = np.searchsorted(bounds, starts)
+    lengths = np.searchsorted(bounds, ends) - first
+    segments = np.repeat(first - np.cumsum(lengths) + lengths, lengths) + \
+        np.arange(lengths.sum())
+
+    # the last painted feature is the one with the highest index
+    owner = np.full(max(len(bounds) - 1, 0), -1, dtype='int64')
+    np.maximum.at(owner, segments, np.repeat(np.arange(len(starts)), lengths))
+    mask = owner >= 0
+    return bounds, np.where(mask, values[owner] if len(values) else 0., 0.), mask
+
+
+def _nonzero_positions(bounds, nonzero, positions):
+    """Number of positions covered by non-zero segments up to each position.
+
+    Parameters
+    ----------
+    bounds : np.ndarray
+        Segment boundaries.
+    nonzero : np.ndarray
+        Boolean array indicating the non-zero segments.
+    positions : np.ndarray
+        Positions.
+
+    Returns
+    -------
+    np.ndarray
+        Cumulative number of non-zero positions before each position.
+    """
+    if len(bounds) < 2:
+        return np.zeros(len(positions), dtype='int64')
+    lengths = np.diff(bounds)
+    cumulative = np.concatenate([[0], np.cumsum(lengths * nonzero)])
+    seg = np.clip(np.searchsorted(bounds, positions, side='right') - 1,
+                  0, len(lengths) - 1)
+    return cumulative[seg] + \
+        np.clip(positions - bounds[seg], 0, lengths[seg]) * nonzero[seg]
+
+
+def _segments_to_array(bounds, values, mask, start, end, dtype):
+    """Dense array of the painted segments between start and end.
+
+    Returns
+    -------
+    np.ndarray
+        Array of shape (end - start, 2) containing the values
+        and the mask.
+    """
+    array = np.zeros((end - start, 2), dtype=dtype)
+    first = max(np.searchsorted(bounds, start, side='right') - 1, 0)
+    last = min(np.searchsorted(bounds, end, side='left'), len(bounds) - 1)
+    if last <= first:
+        return array
+    segstarts = np.maximum(bounds[first:last], start)
+    lengths = np.maximum(np.minimum(bounds[first + 1:last + 1], end) - segstarts, 0)
+    offset = segstarts[0] - start
+    array[offset:offset + lengths.sum(), 0] = np.repeat(values[first:last], lengths)
+    array[offset:offset + lengths.sum(), 1] = np.repeat(mask[first:last], lengths)
+    return array
 
 
 class BedLoader:
@@ -317,109 +833,120 @@ class BedLoader:
         Default: None (already a single base-pair overlap is considered)
     conditions : list
         List of condition names
+    n_jobs : int
+        Number of processes for loading the files in parallel. Default: 1.
     verbose : boolean
         Default: False
     """
     def __init__(self, files, lazyloader, mode,
-                 minoverlap, conditions, verbose=False):
+                 minoverlap, conditions, n_jobs=1, verbose=False):
         self.files = files
         self.lazyloader = lazyloader
         self.mode = mode
         self.minoverlap = minoverlap
+        self.n_jobs = n_jobs
         self.verbose = verbose
         self.conditions = conditions
         self.conditionindex = {c: i for i, c in enumerate(conditions)}
 
-    def __call__(self, garray):
-        files = self.files
-        dtype = garray.typecode
-        # Gindexer contains all relevant intervals
-        # We use the bedtools intersect method to
-        # project the feature overlaps with the ROI intervals.
-        gindexer = self.lazyloader.gindexer
-        mode = self.mode
-
-        tmpdir = tempfile.mkdtemp()
-        predictable_filename = 'gindexerdump'
-        tmpfilename = os.path.join(tmpdir, predictable_filename)
-
-        gindexer.export_to_bed(tmpfilename)
-
-        roifile = BedTool(tmpfilename)
-        nfields_a = len(roifile[0].fields)
+    def _load_file(self, condition, sample_file, dtype):
+        """Load the features of a BED file for the regions of interest.
 
-        if self.verbose: bar = Bar('Loading bed files', max=len(files))
+        Returns
+        -------
+        list(tuple)
+            List of (interval, condition, values) tuples
+            that are written to the genomic array.
+        """
+        mode = self.mode
         gsize = self.lazyloader.gsize
 
         gs = (pd.DataFrame({'chrom': gsize.chrs,
                            'end': gsize.ends})
                  .groupby('chrom')
-                 .aggregate({'end':'max'}))
+                 .aggregate({'end':'max'}))['end']
 
-        for i, sample_file in enumerate(files):
-            regions_ = _get_genomic_reader(sample_file)
+        features = _read_bed_features(sample_file, mode)
 
-            if regions_[0].score == '.' and mode in ['score',
-                                                     'categorical',
-                                                     'score_category',
-                                                     'name_category']:
-                raise ValueError(
-                    'No Score available. Score field must '
-                    'present in {}'.format(sample_file) + \
-                    'for mode="{}"'.format(mode))
-
-            # init whole genome array
-            arrays = {j: np.zeros((row['end'], 2), dtype=dtype) for j, row in gs.iterrows()}
-
-            # load data from signal coverage
-            for region in regions_:
-                if mode == 'bedgraph':
-                    score = float(region.fields[-1])
-                elif mode == 'score':
-                    score = int(region.score)
-                elif mode == 'binary':
-                    score = 1
-                elif mode in ['categorical', 'score_category']:
-                    score = self.conditionindex[str(region.score)] if str(region.score) in self.conditionindex else None
-                else:
-                    score = self.conditionindex[region.name] if region.name in self.conditionindex else None
-
-                if region.chrom in arrays and score is not None:
-                    # first dim, score value, second dim, mask
-                    arrays[region.chrom][region.start:region.end, 0] = score
-                    arrays[region.chrom][region.start:region.end, 1] = 1
-
-            # map data to rois
-            roiregs = roifile.intersect(regions_, wa=True, u=True)
-            for roireg in roiregs:
-                if roireg.end <= arrays[roireg.chrom].shape[0]:
-                    tmp_array = arrays[roireg.chrom][roireg.start:roireg.end]
-                else:
-                    tmp_array = np.zeros((roireg.length, 2))
-                    tmp_array[:arrays[roireg.chrom][roireg.start:].shape[0]] = \
-                        arrays[roireg.chrom][roireg.start:]
-                if self.minoverlap is not None:
-                    if tmp_array[:, :1].nonzero()[0].shape[0]/roireg.length < \
-                        self.minoverlap:
-                        # minimum overlap not achieved, skip
-                        continue
+        if mode == 'bedgraph':
+            scores = features['value'].astype('float64')
+        elif mode == 'score':
+            scores = features['score'].astype('int64').astype('float64')
+        elif mode == 'binary':
+            scores = np.ones(len(features['chrom']))
+        else:
+            # features of unknown categories are not painted
+            scores = pd.Series(features['score' if mode in ['categorical',
+                                                             'score_category']
+                                        else 'name']).map(
+                                            self.conditionindex).values.astype('float64')
+
+        # the intervals are only created for the regions of interest
+        # that are written.
+        roichroms, allstarts, allends, allstrands = \
+            self.lazyloader.gindexer.coordinates()
+
+        # only the regions of interest that overlap with a feature are written
+        overlaps = np.zeros(len(roichroms), dtype='bool')
+        overlaps[intersect((roichroms, allstarts, allends),
+                           (features['chrom'], features['start'], features['end']),
+                           unique=True)] = True
+
+        results = []
+        for chrom in np.unique(roichroms):
+            if chrom not in gs.index:
+                continue
+            ridxs = np.where(roichroms == chrom)[0]
+            overlapping = overlaps[ridxs]
+            if not overlapping.any():
+                continue
+            roistarts = allstarts[ridxs]
+            roiends = allends[ridxs]
+
+            fidxs = np.where(features['chrom'] == chrom)[0]
+            fstarts = features['start'][fidxs]
+            fends = features['end'][fidxs]
+
+            # the features are painted in the order of the file
+            # and clipped to the extent of the genome.
+            chromend = gs[chrom]
+            bounds, values, mask = _paint_segments(np.minimum(fstarts, chromend),
+                                                   np.minimum(fends, chromend),
+                                                   scores[fidxs])
+            values = values.astype(dtype)
+
+            if self.minoverlap is not None:
+                # fraction of positions with non-zero values
+                # for all regions of interest at once
+                nonzero = _nonzero_positions(bounds, values != 0, roiends) - \
+                    _nonzero_positions(bounds, values != 0, roistarts)
+                # skip regions for which the minimum overlap is not achieved
+                overlapping &= nonzero / (roiends - roistarts) >= self.minoverlap
+
+            for ridx, roistart, roiend in zip(ridxs[overlapping],
+                                              roistarts[overlapping],
+                                              roiends[overlapping]):
+                roireg = Interval(str(chrom), int(roistart), int(roiend),
+                                  strand=str(allstrands[ridx]))
+                tmp_array = _segments_to_array(bounds, values, mask,
+                                               roistart, roiend, dtype)
 
                 if mode in ['categorical', 'score_category', 'name_category']:
                     tmp_cat = np.zeros((roireg.length, 1, int(tmp_array.max())+1), dtype=dtype)
                     tmp_cat[np.arange(roireg.length), 0, tmp_array[:, 0].astype('int')] = tmp_array[:, 1]
 
-                    for r in range(tmp_cat.shape[-1]):
-                        garray[roireg, r] = tmp_cat[:, :, r]
+                    # all categories are written at once
+                    results.append((roireg, slice(None), tmp_cat))
 
                 else:
-                    garray[roireg, i] = tmp_array[:, :1]
-            if self.verbose: bar.next()
+                    results.append((roireg, condition, tmp_array[:, :1]))
+        return results
 
-        if self.verbose: bar.finish()
-        os.remove(tmpfilename)
-        os.rmdir(tmpdir)
-
-        return garray
+    def __call__(self, garray):
+        jobs = [(i, sample_file, garray.typecode)
+                for i, sample_file in enumerate(self.files)]
+        return _run_loader_jobs(garray, self._load_file, jobs, self.n_jobs,
+                                'Loading bed files' if self.verbose else None)
 
 
 class ArrayLoader:
@@ -478,16 +1005,22 @@ class Cover(Dataset):
         A genomic indexer translates an integer index to a
         corresponding genomic coordinate.
         It can be None the genomic indexer is supplied later.
+    output_dtype : str or None
+        Data type of the mini-batches returned by the dataset.
+        If None, the data type of the underlying genomic array is used.
+        Default: None.
     """
 
     _flank = None
     _gindexer = None
+    _output_dtype = None
 
     def __init__(self, name, garray,
-                 gindexer):
+                 gindexer, output_dtype=None):
 
         self.garray = garray
         self.gindexer = gindexer
+        self.output_dtype = output_dtype
         Dataset.__init__(self, name)
 
     @classmethod
@@ -512,6 +1045,9 @@ class Cover(Dataset):
                         zero_padding=True,
                         random_state=None,
                         store_whole_genome=False,
+                        storage_options=None,
+                        threads=1,
+                        n_jobs=1,
                         verbose=False):
         """Create a Cover class from a bam-file (or files).
 
@@ -575,7 +1111,8 @@ class Cover(Dataset):
             Default: 1.
         storage : str
             Storage mode for storing the coverage data can be
-            'ndarray', 'hdf5' or 'sparse'. Default: 'ndarray'.
+            'ndarray', 'hdf5', 'memmap', 'chunked', 'runlength' or 'sparse'.
+            Default: 'ndarray'.
         dtype : str
             Typecode to be used for storage the data.
             Default: 'int'.
@@ -597,8 +1134,8 @@ class Cover(Dataset):
             Elongates intervals by template_extension which allows to properly count
             template mid-points whose reads lie outside of the interval.
             This option is only relevant for paired-end reads counted at the
-            'midpoint' and if the coverage is not obtained from the
-            whole genome, e.g. roi is not None.
+            'midpoint'. It should cover the distance between the first read
+            and the mid-point of the fragments.
         cache : boolean
             Indicates whether to cache the dataset. Default: False.
         zero_padding : boolean
@@ -631,6 +1168,18 @@ class Cover(Dataset):
             Indicates whether the whole genome or only ROI
             should be loaded. If False, a bed-file with regions of interest
             must be specified. Default: False
+        storage_options : dict or None
+            Additional options that are specific to the storage type,
+            e.g. chunk_length, compression or chunk_cache_size
+            for storage='hdf5'. Default: None.
+        threads : int
+            Number of threads used for decompressing the BAM files.
+            Default: 1.
+        n_jobs : int
+            Number of processes for loading the files and chromosomes in parallel.
+            The results are written to the genomic array
+            by the calling process. If n_jobs=-1, all CPUs are used.
+            Default: 1.
         verbose : boolean
             Verbosity. Default: False
         """
@@ -683,7 +1232,7 @@ class Cover(Dataset):
             gsize = GenomicIndexer.create_from_genomesize(gsize)
 
         bamloader = BamLoader(bamfiles, gsize, template_extension,
-                              min_mapq, pairedend, verbose)
+                              min_mapq, pairedend, threads, n_jobs, verbose)
 
         datatags = [name]
         normalizer = _to_list(normalizer)
@@ -691,7 +1240,7 @@ class Cover(Dataset):
         if cache:
             files = copy.copy(bamfiles)
 
-            parameters = [gsize.tostr(), min_mapq,
+            parameters = [gsize.digest(), min_mapq,
                           resolution, storage, dtype, stranded,
                           pairedend, zero_padding,
                           store_whole_genome, version]
@@ -699,7 +1248,7 @@ class Cover(Dataset):
                 files += [roi]
                 parameters += [binsize, stepsize, flank,
                                template_extension, random_state]
-            if storage == 'hdf5':
+            if storage in ['hdf5', 'memmap', 'chunked', 'runlength']:
                 parameters += normalizer
             cache_hash = create_sha256_cache(files, parameters)
         else:
@@ -717,6 +1266,9 @@ class Cover(Dataset):
                                      loader=bamloader,
                                      normalizer=normalizer,
                                      collapser='sum',
+                                     storage_options=get_default_storage_options(
+                                         storage, storage_options, gindexer,
+                                         resolution, store_whole_genome),
                                      verbose=verbose)
 
         return cls(name, cover, gindexer)
@@ -739,6 +1291,9 @@ class Cover(Dataset):
                            collapser=None,
                            random_state=None,
                            nan_to_num=True,
+                           storage_options=None,
+                           n_jobs=1,
+                           zoom=False,
                            verbose=False):
         """Create a Cover class from a bigwig-file (or files).
 
@@ -795,7 +1350,8 @@ class Cover(Dataset):
             Default: 0.
         storage : str
             Storage mode for storing the coverage data can be
-            'ndarray', 'hdf5' or 'sparse'. Default: 'ndarray'.
+            'ndarray', 'hdf5', 'memmap', 'chunked', 'runlength' or 'sparse'.
+            Default: 'ndarray'.
         dtype : str
             Typecode to define the datatype to be used for storage.
             Default: 'float32'.
@@ -848,6 +1404,23 @@ class Cover(Dataset):
             (e.g. input and output datasets) use the same random_state
             value so that the datasets are synchronized.
             Default: None means that no randomization is used.
+        storage_options : dict or None
+            Additional options that are specific to the storage type,
+            e.g. chunk_length, compression or chunk_cache_size
+            for storage='hdf5'. Default: None.
+        n_jobs : int
+            Number of processes for loading the files and chromosomes in parallel.
+            The results are written to the genomic array
+            by the calling process. If n_jobs=-1, all CPUs are used.
+            Default: 1.
+        zoom : boolean
+            Indicates whether to obtain the binned signal for resolution > 1
+            from the zoom levels of the bigwig files, which holds precomputed
+            summaries of the signal. This is considerably faster than
+            loading the signal at base pair resolution, but the summaries
+            may be approximate if the bins are not aligned with the zoom levels.
+            Only applies to the collapsers 'mean', 'max' and 'sum'.
+            Default: False.
         verbose : boolean
             Verbosity. Default: False
         """
@@ -894,15 +1467,19 @@ class Cover(Dataset):
 
         conditions = _condition_from_filename(bigwigfiles, conditions)
 
-        bigwigloader = BigWigLoader(bigwigfiles, gsize, nan_to_num, verbose)
+        collapser_ = collapser if collapser is not None else 'mean'
+
+        summary = collapser_ if zoom and collapser_ in ['mean', 'max', 'sum'] \
+            else None
+        bigwigloader = BigWigLoader(bigwigfiles, gsize, nan_to_num, n_jobs,
+                                    summary, verbose)
         datatags = [name]
 
-        collapser_ = collapser if collapser is not None else 'mean'
         normalizer = _to_list(normalizer)
 
         if cache:
             files = copy.copy(bigwigfiles)
-            parameters = [gsize.tostr(),
+            parameters = [gsize.digest(),
                           resolution, storage, dtype,
                           zero_padding,
                           collapser.__name__ if hasattr(collapser, '__name__') else collapser,
@@ -910,8 +1487,10 @@ class Cover(Dataset):
             if not store_whole_genome:
                 files += [roi]
                 parameters += [binsize, stepsize, flank, random_state]
-            if storage == 'hdf5':
+            if storage in ['hdf5', 'memmap', 'chunked', 'runlength']:
                 parameters += normalizer
+            if summary is not None:
+                parameters += ['zoom']
             cache_hash = create_sha256_cache(files, parameters)
         else:
             cache_hash = None
@@ -927,6 +1506,9 @@ class Cover(Dataset):
                                      loader=bigwigloader,
                                      collapser=collapser_,
                                      normalizer=normalizer,
+                                     storage_options=get_default_storage_options(
+                                         storage, storage_options, gindexer,
+                                         resolution, store_whole_genome),
                                      verbose=verbose)
 
         return cls(name, cover, gindexer)
@@ -950,6 +1532,8 @@ class Cover(Dataset):
                         minoverlap=None,
                         random_state=None,
                         datatags=None, cache=False,
+                        storage_options=None,
+                        n_jobs=1,
                         verbose=False):
         """Create a Cover class from a bed-file (or files).
 
@@ -1002,7 +1586,8 @@ class Cover(Dataset):
             Default: 0.
         storage : str
             Storage mode for storing the coverage data can be
-            'ndarray', 'hdf5' or 'sparse'. Default: 'ndarray'.
+            'ndarray', 'hdf5', 'memmap', 'chunked', 'runlength' or 'sparse'.
+            Default: 'ndarray'.
         dtype : str
             Typecode to define the datatype to be used for storage.
             Default: 'int'.
@@ -1070,6 +1655,15 @@ class Cover(Dataset):
             (e.g. input and output datasets) use the same random_state
             value so that the datasets are synchronized.
             Default: None means that no randomization is used.
+        storage_options : dict or None
+            Additional options that are specific to the storage type,
+            e.g. chunk_length, compression or chunk_cache_size
+            for storage='hdf5'. Default: None.
+        n_jobs : int
+            Number of processes for loading the files in parallel.
+            The results are written to the genomic array
+            by the calling process. If n_jobs=-1, all CPUs are used.
+            Default: 1.
         verbose : boolean
             Verbosity. Default: False
         """
@@ -1123,7 +1717,7 @@ class Cover(Dataset):
         conditions = _condition_from_filename(bedfiles, conditions)
 
         bedloader = BedLoader(bedfiles, gsize, mode,
-                              minoverlap, conditions, verbose)
+                              minoverlap, conditions, n_jobs, verbose)
 
         datatags = [name]
 
@@ -1133,7 +1727,7 @@ class Cover(Dataset):
 
         if cache:
             files = copy.copy(bedfiles)
-            parameters = [gsize.tostr(),
+            parameters = [gsize.digest(),
                           resolution, storage, dtype,
                           zero_padding, mode,
                           collapser.__name__ if hasattr(collapser, '__name__') else collapser,
@@ -1143,7 +1737,7 @@ class Cover(Dataset):
             if not store_whole_genome:
                 files += [roi]
                 parameters += [random_state]
-            if storage == 'hdf5':
+            if storage in ['hdf5', 'memmap', 'chunked', 'runlength']:
                 parameters += normalizer
             cache_hash = create_sha256_cache(files, parameters)
         else:
@@ -1160,6 +1754,9 @@ class Cover(Dataset):
                                      loader=bedloader,
                                      collapser=collapser_,
                                      normalizer=normalizer,
+                                     storage_options=get_default_storage_options(
+                                         storage, storage_options, gindexer,
+                                         resolution, store_whole_genome),
                                      verbose=verbose)
 
         return cls(name, cover, gindexer)
@@ -1177,6 +1774,7 @@ class Cover(Dataset):
                           datatags=None,
                           padding_value=0.0,
                           store_whole_genome=False,
+                          storage_options=None,
                           verbose=False):
         """Create a Cover class from a numpy.array.
 
@@ -1204,7 +1802,8 @@ class Cover(Dataset):
             and file-ending).
         storage : str
             Storage mode for storing the coverage data can be
-            'ndarray', 'hdf5' or 'sparse'. Default: 'ndarray'.
+            'ndarray', 'hdf5', 'memmap', 'chunked', 'runlength' or 'sparse'.
+            Default: 'ndarray'.
         overwrite : boolean
             Overwrite cachefiles. Default: False.
         datatags : list(str) or None
@@ -1217,6 +1816,10 @@ class Cover(Dataset):
             should be loaded. Default: False.
         padding_value : float
             Padding value. Default: 0.
+        storage_options : dict or None
+            Additional options that are specific to the storage type,
+            e.g. chunk_length, compression or chunk_cache_size
+            for storage='hdf5'. Default: None.
         verbose : boolean
             Verbosity. Default: False
         """
@@ -1294,7 +1897,7 @@ class Cover(Dataset):
             parameters = [genomesize, gindexer.binsize,
                           resolution, storage, stranded,
                           _dummy_collapser.__name__, version,
-                          store_whole_genome] + [str(reg_) for reg_ in gindexer]
+                          store_whole_genome, gindexer.digest()]
             cache_hash = create_sha256_cache(files, parameters)
         else:
             cache_hash = None
@@ -1310,6 +1913,9 @@ class Cover(Dataset):
                                      loader=arrayloader,
                                      padding_value=padding_value,
                                      collapser=_dummy_collapser,
+                                     storage_options=get_default_storage_options(
+                                         storage, storage_options, gindexer,
+                                         resolution, store_whole_genome),
                                      verbose=verbose)
 
         return cls(name, cover, gindexer)
@@ -1325,6 +1931,17 @@ class Cover(Dataset):
     def gindexer(self, gindexer):
         self._gindexer = gindexer
 
+    @property
+    def output_dtype(self):
+        """Data type of the mini-batches"""
+        if self._output_dtype is None:
+            return np.dtype(self.garray.typecode)
+        return self._output_dtype
+
+    @output_dtype.setter
+    def output_dtype(self, dtype):
+        self._output_dtype = None if dtype is None else np.dtype(dtype)
+
     def __repr__(self):  # pragma: no cover
         return "Cover('{}')".format(self.name)
 
@@ -1427,15 +2044,35 @@ class Cover(Dataset):
         except TypeError:
             raise IndexError('Cover.__getitem__: index must be iterable')
 
-        data = np.zeros((len(idxs),) + self.shape_static[1:])
+        return self.take(idxs)
 
-        for i, idx in enumerate(idxs):
-            interval = self.gindexer[idx]
+    def take(self, idxs, out=None):
+        """Retrieve a mini-batch of the dataset.
 
-            dat = self._getsingleitem(interval)
-            data[i, :len(dat), :, :] = dat
+        Parameters
+        ----------
+        idxs : list(int)
+            Indices of the regions of interest.
+        out : np.ndarray or None
+            Preallocated array of shape (len(idxs),) + shape[1:]
+            to write the mini-batch into. This allows to reuse the same
+            buffer across mini-batches. If None, a new array
+            of type output_dtype is allocated. Default: None.
+
+        Returns
+        -------
+        np.ndarray
+            Mini-batch of shape (len(idxs),) + shape[1:].
+        """
+        shape = (len(idxs),) + self.shape_static[1:]
+        if out is None:
+            out = np.empty(shape, dtype=self.output_dtype)
+        elif out.shape != shape:
+            raise ValueError('out must be of shape {}, got {}'.format(shape, out.shape))
 
-        return data
+        self.garray.get_batch(*self.gindexer.coordinates(idxs), out=out)
+
+        return out
 
     def _getsingleitem(self, pinterval):
 
@@ -1,5 +1,6 @@
 """Janggu specific dataset class."""
 
+import threading
 from abc import ABCMeta
 from abc import abstractmethod
 from abc import abstractproperty
@@ -113,10 +114,21 @@ class JangguSequence(Sequence):
         Whether to return mini-batches as dict or unnamed tuples.
         In the latter case, the order of the input arguments
         reflects the order to the mini-batch tuples. Default: True
+    buffer_pool_size : int or None
+        If set, mini-batches of datasets that support writing into
+        a preallocated array (e.g. :class:`Cover`) are retrieved into
+        a pool of reusable buffers rather than freshly allocated arrays.
+        Each worker thread cycles through buffer_pool_size buffers per dataset,
+        so a returned mini-batch is overwritten after buffer_pool_size
+        subsequent calls in the same thread. The pool size must therefore
+        exceed the number of mini-batches that are held at the same time,
+        e.g. the max_queue_size used for training.
+        Default: None, which means that a new array is allocated for
+        each mini-batch.
     """
     def __init__(self, inputs, outputs=None, sample_weights=None,
                  batch_size=32,
-                 shuffle=False, as_dict=True):
+                 shuffle=False, as_dict=True, buffer_pool_size=None):
 
         def _todict(x):
             if not isinstance(x, dict) and x is not None:
@@ -167,24 +179,57 @@ class JangguSequence(Sequence):
 
         self.indices = list(range(xlen))
         self.shuffle = shuffle
+        if buffer_pool_size is not None and buffer_pool_size < 1:
+            raise ValueError('buffer_pool_size must be positive.')
+        self.buffer_pool_size = buffer_pool_size
+        self._pool = threading.local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # buffers are not shared between worker processes
+        del state['_pool']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._pool = threading.local()
 
     def __len__(self):
         return int(numpy.ceil(len(self.indices) / float(self.batch_size)))
 
+    def _take(self, data, idxs):
+        """Retrieve a mini-batch, reusing a pooled buffer if possible."""
+        if self.buffer_pool_size is None or not isinstance(data, Dataset) \
+                or not hasattr(data, 'take'):
+            return data[idxs]
+
+        if not hasattr(self._pool, 'buffers'):
+            self._pool.buffers = {}
+        key = (id(data), len(idxs))
+        buffers, nextbuf = self._pool.buffers.get(key, ([], 0))
+        if len(buffers) < self.buffer_pool_size:
+            buffers.append(data.take(idxs))
+            out = buffers[-1]
+        else:
+            out = data.take(idxs, out=buffers[nextbuf])
+        self._pool.buffers[key] = (buffers,
+                                   (nextbuf + 1) % self.buffer_pool_size)
+        return out
+
     def _getitemlist(self, idx):
 
         inputs = []
 
         for inp in self.inputs:
-            inputs.append(inp[
-                self.indices[idx*self.batch_size:(idx+1)*self.batch_size]])
+            inputs.append(self._take(inp,
+                self.indices[idx*self.batch_size:(idx+1)*self.batch_size]))
 
         ret = (inputs, )
         if self.outputs is not None:
             outputs = []
             for oup in self.outputs:
-                outputs.append(oup[
-                    self.indices[idx*self.batch_size:(idx+1)*self.batch_size]])
+                outputs.append(self._take(oup,
+                    self.indices[idx*self.batch_size:(idx+1)*self.batch_size]))
         else:
             outputs = None
 
@@ -203,15 +248,15 @@ class JangguSequence(Sequence):
         inputs = {}
 
         for k in self.inputs:
-            inputs[k] = self.inputs[k][
-                self.indices[idx*self.batch_size:(idx+1)*self.batch_size]]
+            inputs[k] = self._take(self.inputs[k],
+                self.indices[idx*self.batch_size:(idx+1)*self.batch_size])
 
         ret = (inputs, )
         if self.outputs is not None:
             outputs = {}
             for k in self.outputs:
-                outputs[k] = self.outputs[k][
-                    self.indices[idx*self.batch_size:(idx+1)*self.batch_size]]
+                outputs[k] = self._take(self.outputs[k],
+                    self.indices[idx*self.batch_size:(idx+1)*self.batch_size])
         else:
             outputs = None
 
@@ -7,6 +7,9 @@ from itertools import product
 
 import Bio
 import numpy as np
+from Bio.Alphabet import IUPAC
+from Bio.Seq import Seq
+from Bio.SeqRecord import SeqRecord
 from progress.bar import Bar
 from pybedtools import BedTool
 from pybedtools import Interval
@@ -16,6 +19,8 @@ from janggu.data.data import Dataset
 from janggu.data.genomic_indexer import GenomicIndexer
 from janggu.data.genomicarray import create_genomic_array
 from janggu.data.genomicarray import create_sha256_cache
+from janggu.data.genomicarray import get_default_storage_options
+from janggu.data.intervals import intersect
 from janggu.utils import NMAP
 from janggu.utils import NOLETTER
 from janggu.utils import _check_valid_files
@@ -23,12 +28,53 @@ from janggu.utils import _complement_index
 from janggu.utils import _iv_to_str
 from janggu.utils import _to_list
 from janggu.utils import as_onehot
+from janggu.utils import open_indexed_reference
 from janggu.utils import seq2ind
 from janggu.utils import sequence_padding
 from janggu.utils import sequences_from_fasta
 from janggu.version import dataversion as version
 
 
+class IndexedSequences:
+    """IndexedSequences class
+
+    Sequence of SeqRecords that are fetched from an indexed
+    reference genome on demand. This avoids parsing the entire
+    reference genome if only a subset of regions is required.
+
+    Parameters
+    -----------
+    filename : str
+        Reference genome file.
+    regions : list(tuple)
+        List of (chrom, start, end) tuples that are fetched.
+        Positions outside of the chromosome are filled up with 'N'.
+    """
+    def __init__(self, filename, regions):
+        self.filename = filename
+        self.regions = regions
+
+    def __len__(self):
+        return len(self.regions)
+
+    def __iter__(self):
+        reference = open_indexed_reference(self.filename)
+        try:
+            for chrom, start, end in self.regions:
+                chromlen = reference.get_reference_length(chrom)
+                seq = reference.fetch(chrom, max(start, 0), max(min(end, chromlen), 0))
+                if start < 0:
+                    seq = 'N' * (-start) + seq
+                if len(seq) < end - start:
+                    seq = seq + 'N' * (end - start - len(seq))
+                seqid = _iv_to_str(chrom, start, end) if (start, end) != (0, chromlen) \
+                    else chrom
+                yield SeqRecord(Seq(seq, IUPAC.unambiguous_dna), id=seqid,
+                                name=seqid, description=seqid)
+        finally:
+            reference.close()
+
+
 class GenomicSizeLazyLoader:
     """GenomicSizeLazyLoader class
 
@@ -50,6 +96,25 @@ class GenomicSizeLazyLoader:
         store_whole_genome = self.store_whole_genome
         gindexer = self.gindexer
 
+        reference = None
+        if isinstance(self.fastafile, str) and self.seqtype == 'dna':
+            reference = open_indexed_reference(self.fastafile)
+
+        if reference is not None:
+            # only the required sequences are fetched
+            # using the index of the reference genome.
+            if store_whole_genome:
+                gsize = OrderedDict(zip(reference.references, reference.lengths))
+                regions = [(chrom, 0, gsize[chrom]) for chrom in gsize]
+                gsize = GenomicIndexer.create_from_genomesize(gsize)
+            else:
+                regions = [(giv.chrom, giv.start, giv.end) for giv in gindexer]
+                gsize = gindexer
+            reference.close()
+            self.gsize_ = gsize
+            self.seqs_ = IndexedSequences(self.fastafile, regions)
+            return
+
         if isinstance(self.fastafile, str):
             seqs = sequences_from_fasta(self.fastafile, self.seqtype)
         else:
@@ -103,6 +168,12 @@ class GenomicSizeLazyLoader:
             return self.gindexer.tostr()
         return "full_genome_lazy_loading"
 
+    def digest(self):
+        """digest for the cache key"""
+        if not self.store_whole_genome:
+            return self.gindexer.digest()
+        return "full_genome_lazy_loading"
+
 
 class SeqLoader:
     """SeqLoader class.
@@ -141,13 +212,14 @@ class SeqLoader:
         if self.verbose: bar = Bar('Loading sequences', max=len(gsize))
         for region, seq in zip(gsize, seqs):
 
-            indarray = np.asarray(seq2ind(seq))
+            indarray = seq2ind(seq)
 
             if order > 1:
                 # for higher order motifs, this part is used
                 filter_ = np.asarray([pow(len(seq.seq.alphabet.letters),
                                           i) for i in range(order)])
-                indarray = np.convolve(indarray, filter_, mode='valid')
+                # int64 avoids an overflow for the non-letter positions
+                indarray = np.convolve(indarray.astype('int64'), filter_, mode='valid')
                 # the specific type int8 is not irrelevant, as long as
                 # the negative values are maintained correctly.
                 indarray[indarray < np.iinfo('int8').min] = np.iinfo('int8').min
@@ -175,6 +247,15 @@ class Bioseq(Dataset):
         genomic coordinate. Can be None, if the Dataset is only loaded.
     alphabet : str
         String of sequence alphabet. For example, 'ACGT'.
+    order : int or None
+        Order of the one-hot representation. If None,
+        the order of the genomic array is used. A higher order than
+        that of the genomic array is used with storage='packed',
+        in which case the higher-order indices are derived from
+        the letter indices on the fly. Default: None.
+    output_dtype : str
+        Data type of the one-hot encoded mini-batches,
+        e.g. 'int8', 'float16' or 'float32'. Default: 'int8'.
     """
 
     _order = None
@@ -183,17 +264,21 @@ class Bioseq(Dataset):
     _flank = None
     _gindexer = None
 
-    def __init__(self, name, garray, gindexer, alphabet):
+    def __init__(self, name, garray, gindexer, alphabet, order=None,
+                 output_dtype='int8'):
 
         self.garray = garray
         self.gindexer = gindexer
+        self.output_dtype = output_dtype
         self._alphabet = alphabet
+        self._order = garray.order if order is None else order
         self.conditions = [''.join(item) for item in
                            product(sorted(self._alphabet),
-                                   repeat=self.garray.order)]
+                                   repeat=self.order)]
         self._alphabetsize = len(self._alphabet)
-        self._rcindex = [_complement_index(idx, garray.order)
-                         for idx in range(pow(self._alphabetsize, garray.order))]
+        self._rcindex = np.asarray([_complement_index(idx, self.order)
+                                    for idx in range(pow(self._alphabetsize,
+                                                         self.order))])
 
         Dataset.__init__(self, '{}'.format(name))
 
@@ -201,7 +286,8 @@ class Bioseq(Dataset):
     def _make_genomic_array(name, gsize, seqs, order, storage,
                             cache=None, datatags=None,
                             overwrite=False, store_whole_genome=True,
-                            random_state=None, verbose=False):
+                            random_state=None, storage_options=None,
+                            verbose=False):
 
         if overwrite:
             warnings.warn('overwrite=True is without effect '
@@ -222,8 +308,12 @@ class Bioseq(Dataset):
         # changed to be more permissive for the order.
         dtype = 'int16' if order > 3 else 'int32'
 
+        # the packed storage keeps the letter indices,
+        # higher-order indices are derived when the data is retrieved.
+        storage_order = 1 if storage == 'packed' else order
+
         # Extract chromosome lengths
-        seqloader = SeqLoader(gsize, seqs, order, verbose)
+        seqloader = SeqLoader(gsize, seqs, storage_order, verbose)
 
         # At the moment, we treat the information contained
         # in each bw-file as unstranded
@@ -231,7 +321,7 @@ class Bioseq(Dataset):
 
         if cache:
             files = seqs
-            parameters = [gsize.tostr(),
+            parameters = [gsize.digest(),
                           storage, dtype, order,
                           store_whole_genome, version]
             if not store_whole_genome:
@@ -245,12 +335,13 @@ class Bioseq(Dataset):
                                       datatags=datatags,
                                       cache=cache_hash,
                                       store_whole_genome=store_whole_genome,
-                                      order=order,
+                                      order=storage_order,
                                       conditions=['idx'],
                                       overwrite=overwrite,
                                       padding_value=NOLETTER,
                                       typecode=dtype,
                                       loader=seqloader,
+                                      storage_options=storage_options,
                                       verbose=verbose)
 
         return garray
@@ -266,6 +357,7 @@ class Bioseq(Dataset):
                               overwrite=False,
                               random_state=None,
                               store_whole_genome=False,
+                              storage_options=None,
                               verbose=False):
         """Create a Bioseq class from a reference genome.
 
@@ -278,7 +370,8 @@ class Bioseq(Dataset):
         name : str
             Name of the dataset
         refgenome : str or Bio.SeqRecord.SeqRecord
-            Reference genome location pointing to a fasta file
+            Reference genome location pointing to a fasta file,
+            a UCSC .2bit file
             or a SeqRecord object from Biopython that contains the sequences.
         roi : str, list(Interval), BedTool, pandas.DataFrame or None
             Region of interest over which to iterate.
@@ -304,7 +397,9 @@ class Bioseq(Dataset):
         order : int
             Order for the one-hot representation. Default: 1.
         storage : str
-            Storage mode for storing the sequence may be 'ndarray' or 'hdf5'.
+            Storage mode for storing the sequence may be 'ndarray', 'hdf5',
+            'memmap', 'chunked' or 'packed'. The packed storage
+            keeps the nucleotides with two bits per position in memory.
             Default: 'ndarray'.
         datatags : list(str) or None
             List of datatags. Together with the dataset name,
@@ -330,14 +425,19 @@ class Bioseq(Dataset):
             (e.g. input and output datasets) use the same random_state
             value so that the datasets are synchronized.
             Default: None means that no randomization is used.
+        storage_options : dict or None
+            Additional options that are specific to the storage type,
+            e.g. chunk_length, compression or chunk_cache_size
+            for storage='hdf5'. Default: None.
         verbose : boolean
             Verbosity. Default: False
         """
         # fill up int8 rep of DNA
         # load bioseq, region index, and within region index
 
-        if storage not in ['ndarray', 'hdf5']:
-            raise ValueError('Available storage options for Bioseq are: ndarray or hdf5')
+        if storage not in ['ndarray', 'hdf5', 'memmap', 'chunked', 'packed']:
+            raise ValueError('Available storage options for Bioseq are: '
+                             'ndarray, hdf5, memmap, chunked or packed')
 
         if roi is not None:
             gindexer = GenomicIndexer.create_from_file(roi, binsize,
@@ -357,10 +457,13 @@ class Bioseq(Dataset):
                                          overwrite=overwrite,
                                          store_whole_genome=store_whole_genome,
                                          random_state=random_state,
+                                         storage_options=get_default_storage_options(
+                                             storage, storage_options, gindexer,
+                                             1, store_whole_genome),
                                          verbose=verbose)
 
         return cls(name, garray, gindexer,
-                   alphabet='ACGT')
+                   alphabet='ACGT', order=order)
 
     @classmethod
     def create_from_seq(cls, name,  # pylint: disable=too-many-locals
@@ -372,6 +475,7 @@ class Bioseq(Dataset):
                         datatags=None,
                         cache=False,
                         overwrite=False,
+                        storage_options=None,
                         verbose=False):
         """Create a Bioseq class from a biological sequences.
 
@@ -398,7 +502,9 @@ class Bioseq(Dataset):
             are already of equal length. An exception is raised if this is
             not the case. Default: None.
         storage : str
-            Storage mode for storing the sequence may be 'ndarray' or 'hdf5'.
+            Storage mode for storing the sequence may be 'ndarray', 'hdf5',
+            'memmap', 'chunked' or 'packed'. The packed storage
+            keeps the nucleotides with two bits per position in memory.
             Default: 'ndarray'.
         datatags : list(str) or None
             List of datatags. Together with the dataset name,
@@ -409,11 +515,16 @@ class Bioseq(Dataset):
             Indicates whether to cache the dataset. Default: False.
         overwrite : boolean
             Overwrite the cachefiles. Default: False.
+        storage_options : dict or None
+            Additional options that are specific to the storage type,
+            e.g. chunk_length, compression or chunk_cache_size
+            for storage='hdf5'. Default: None.
         verbose : boolean
             Verbosity. Default: False
         """
-        if storage not in ['ndarray', 'hdf5']:
-            raise ValueError('Available storage options for Bioseq are: ndarray or hdf5')
+        if storage not in ['ndarray', 'hdf5', 'memmap', 'chunked', 'packed']:
+            raise ValueError('Available storage options for Bioseq are: '
+                             'ndarray, hdf5, memmap, chunked or packed')
 
         seqs = []
         fastafile = _to_list(fastafile)
@@ -435,6 +546,10 @@ class Bioseq(Dataset):
         assert lens == [len(seqs[0])] * len(seqs), "Input sequences must " + \
             "be of equal length."
 
+        if storage == 'packed' and len(seqs[0].seq.alphabet.letters) > 4:
+            raise ValueError("storage='packed' is only available "
+                             "for nucleotide sequences.")
+
         # Chromnames are required to be Unique
         chroms = [seq.id for seq in seqs]
         assert len(set(chroms)) == len(seqs), "Sequence IDs must be unique."
@@ -452,10 +567,11 @@ class Bioseq(Dataset):
                                          cache=cache, datatags=datatags,
                                          overwrite=overwrite,
                                          store_whole_genome=False,
+                                         storage_options=storage_options,
                                          verbose=verbose)
 
         return cls(name, garray, gindexer,
-                   alphabet=seqs[0].seq.alphabet.letters)
+                   alphabet=seqs[0].seq.alphabet.letters, order=order)
 
     def __repr__(self):  # pragma: no cover
         return 'Bioseq("{}")'.format(self.name,)
@@ -476,6 +592,11 @@ class Bioseq(Dataset):
 
         self._gindexer = gindexer
 
+    @property
+    def order(self):
+        """Order of the one-hot representation."""
+        return self._order
+
     def iseq4idx(self, idxs):
         """Extracts the Bioseq sequence for set of indices.
 
@@ -495,34 +616,99 @@ class Bioseq(Dataset):
             with shape `(len(idxs), sequence_length + 2*flank - order + 1)`
         """
 
-        # for each index read use the adaptor indices to retrieve the seq.
-        iseq = np.zeros((len(idxs), self.gindexer.binsize +
-                         2*self.gindexer.flank - self.garray.order + 1),
+        # retrieve the sequences for the entire batch at once.
+        iseq = np.empty((len(idxs), self.gindexer.binsize +
+                         2*self.gindexer.flank - self.garray.order + 1, 1, 1),
                         dtype=self.garray.typecode)
 
-        for i, idx in enumerate(idxs):
-            interval = self.gindexer[idx]
-
-            dat = self._getsingleitem(interval)
+        chroms, starts, ends, strands = self.gindexer.coordinates(idxs)
+        minus = strands == '-'
+
+        if self.order > self.garray.order:
+            # the higher-order indices are derived from
+            # the letters on the forward strand
+            iseq = self.garray.get_batch(chroms, starts, ends,
+                                         np.repeat('+', len(strands)),
+                                         out=iseq)[:, :, 0, 0]
+            iseq = self._higher_order(iseq)
+            if np.any(minus) and self.garray._full_genome_stored:
+                # reverse the sequences in the same way as get_batch,
+                # i.e. within the interval lengths, which may be shorter
+                # at the chromosome start.
+                offsets = np.arange(iseq.shape[1])
+                lengths = (ends - starts - self.order + 1)[minus, None]
+                iseq[minus] = np.take_along_axis(
+                    iseq[minus], np.where(offsets < lengths,
+                                          lengths - 1 - offsets, offsets), axis=1)
+            elif np.any(minus):
+                iseq[minus] = iseq[minus][:, ::-1]
+        else:
+            iseq = self.garray.get_batch(chroms, starts, ends, strands, out=iseq)[:, :, 0, 0]
 
-            iseq[i, :len(dat)] = dat
-            if len(dat) < iseq.shape[1]:
-                iseq[i, len(dat):] = NOLETTER
+        # the sequences on the minus strand are already reversed
+        # but still need to be complemented.
+        if np.any(minus):
+            iseq[minus] = self._complement(iseq[minus])
 
         return iseq
 
+    def _higher_order(self, iseq):
+        """Converts letter indices to higher-order indices.
+
+        Parameters
+        ----------
+        iseq : numpy.array
+            Letter indices of shape `(batch_size, length)`.
+
+        Returns
+        -------
+        numpy.array
+            Higher-order indices of shape `(batch_size, length - order + 1)`.
+            Indices that involve a non-letter position are negative.
+        """
+        length = iseq.shape[1] - self.order + 1
+        hseq = np.zeros((iseq.shape[0], max(length, 0)), dtype='int32')
+        invalid = np.zeros(hseq.shape, dtype=bool)
+        for i in range(self.order):
+            window = iseq[:, i:i + length]
+            hseq = hseq * self._alphabetsize + np.maximum(window, 0)
+            invalid |= window < 0
+        # mimic the representation obtained with the other storage options
+        hseq[invalid] = np.iinfo('int8').min
+        return hseq
+
     def _getsingleitem(self, interval):
 
+        iseq = np.asarray(self.garray[interval][:, 0, 0])
+        if self.order > self.garray.order:
+            iseq = self._higher_order(iseq[None])[0]
+
         # Computing the forward or reverse complement of the
         # sequence, depending on the strand flag.
         if interval.strand in ['.', '+']:
-            return np.asarray(self.garray[interval][:, 0, 0])
+            return iseq
 
-        return self._revcomp(self.garray[interval][:, 0, 0])
+        return self._revcomp(iseq)
+
+    def _complement(self, index_sequence):
+        """Complement of an index sequence or a batch of index sequences.
+
+        The complement is obtained by a lookup in the table of
+        complementary indices. Negative indices (e.g. 'N')
+        are retained.
+        """
+        index_sequence = np.asarray(index_sequence)
+        return np.where(index_sequence >= 0,
+                        self._rcindex[np.maximum(index_sequence, 0)],
+                        index_sequence)
 
     def _revcomp(self, index_sequence):
-        return np.asarray([self._rcindex[val] if val >= 0 else val for val
-                           in index_sequence])[::-1]
+        """Reverse complement of an index sequence.
+
+        index_sequence may be of shape `(length,)` or `(batch_size, length)`,
+        in which case each sequence in the batch is reverse complemented.
+        """
+        return self._complement(index_sequence)[..., ::-1]
 
     def __getitem__(self, idxs):
         if isinstance(idxs, tuple):
@@ -544,12 +730,13 @@ class Bioseq(Dataset):
                 raise ValueError('Indexing with Interval '
                                  'requires store_whole_genome=True.')
 
-            data = np.zeros((1, idxs.length  - self.garray.order + 1))
+            data = np.zeros((1, idxs.length  - self.order + 1))
             data[0] = self._getsingleitem(idxs)
             # accept a genomic interval directly
             data = as_onehot(data,
-                             self.garray.order,
-                             self._alphabetsize)
+                             self.order,
+                             self._alphabetsize,
+                             self.output_dtype)
 
             return data
 
@@ -559,8 +746,8 @@ class Bioseq(Dataset):
             raise IndexError('Bioseq.__getitem__: '
                              + 'index must be iterable')
 
-        data = as_onehot(self.iseq4idx(idxs), self.garray.order,
-                         self._alphabetsize)
+        data = as_onehot(self.iseq4idx(idxs), self.order,
+                         self._alphabetsize, self.output_dtype)
 
         return data
 
@@ -572,8 +759,8 @@ class Bioseq(Dataset):
         """Shape of the dataset"""
 
         return (len(self), self.gindexer.binsize +
-                2*self.gindexer.flank - self.garray.order + 1, 1,
-                pow(self._alphabetsize, self.garray.order))
+                2*self.gindexer.flank - self.order + 1, 1,
+                pow(self._alphabetsize, self.order))
 
     @property
     def ndim(self):  # pragma: no cover
@@ -601,7 +788,7 @@ class VariantStreamer:
         Consider using cache=True as well, such that the genome only needs to be loaded
         once, and reloaded from the cache if needed.
         Alternatively, a string pointing to the reference genome sequence in FASTA
-        format can be supplied from which the sequence context is extracted.
+        or UCSC .2bit format can be supplied from which the sequence context is extracted.
     variants : str
         VCF file name. Contains the variants
     binsize : int
@@ -669,6 +856,34 @@ class VariantStreamer:
                 ncounts += 1
         return ncounts
 
+    def get_minus_strand(self):
+        """Determines the strandedness of the variants from the annotation.
+
+        Returns
+        -------
+        np.ndarray
+            Boolean array indicating for each variant in the VCF file
+            whether it overlaps with an annotation feature on the minus strand.
+        """
+        chroms, starts, ends = [], [], []
+        for rec in VariantFile(self.variants).fetch():
+            chroms.append(rec.chrom)
+            starts.append(rec.start)
+            ends.append(rec.stop)
+
+        # a feature is regarded as being on the minus strand
+        # if any of its fields (usually the strand) is '-'.
+        annotation = [(region.chrom, region.start, region.end, '-' in region.fields)
+                      for region in self.annotation]
+        annot_chroms, annot_starts, annot_ends, annot_minus = \
+            [list(column) for column in zip(*annotation)] or [[], [], [], []]
+
+        ivar, iannot = intersect((chroms, starts, ends),
+                                 (annot_chroms, annot_starts, annot_ends))
+        minus = np.zeros(len(chroms), dtype='bool')
+        minus[ivar[np.asarray(annot_minus, dtype='bool')[iannot]]] = True
+        return minus
+
     def get_bioseq(self, bioseq, order):
         if isinstance(bioseq, Bioseq):
             if not bioseq.garray._full_genome_stored:
@@ -697,9 +912,23 @@ class VariantStreamer:
     def flow(self):
         """Data flow generator."""
 
-        refs = np.zeros((self.batch_size, self.binsize - self.bioseq.garray.order + 1, 1,
-                         pow(self.bioseq._alphabetsize, self.bioseq.garray.order)))
+        refs = np.zeros((self.batch_size, self.binsize - self.bioseq.order + 1, 1,
+                         pow(self.bioseq._alphabetsize, self.bioseq.order)))
         alts = np.zeros_like(refs)
+        irefs = np.zeros(refs.shape[:2], dtype='int64')
+        ialts = np.zeros_like(irefs)
+        minus = np.zeros(self.batch_size, dtype=bool)
+
+        def _to_onehot(nvariants):
+            # if the strandedness is negative (from the annotation)
+            # the DNA sequences are reverse complemented
+            for iseq in [irefs, ialts]:
+                iseq[:nvariants][minus[:nvariants]] = \
+                    self.bioseq._revcomp(iseq[:nvariants][minus[:nvariants]])
+            refs[:nvariants] = as_onehot(irefs[:nvariants], self.bioseq.order,
+                                         self.bioseq._alphabetsize)
+            alts[:nvariants] = as_onehot(ialts[:nvariants], self.bioseq.order,
+                                         self.bioseq._alphabetsize)
 
         # get variants
         vcf = VariantFile(self.variants).fetch()
@@ -712,9 +941,7 @@ class VariantStreamer:
         # annotation is used to inform about the strandedness
         # to evaluate the variant
         if self.annotation is not None:
-            varbed = BedTool(self.variants)
-            n_vcf_fields = len(varbed[0].fields)
-            vcf_strand_augment = iter(varbed.intersect(self.annotation, loj=True))
+            minus_strand = iter(self.get_minus_strand())
 
         try:
             while True:
@@ -732,8 +959,7 @@ class VariantStreamer:
                     rec = next(vcf)
                     rec_strandedness = '+'
                     if self.annotation is not None:
-                        rec_aug = next(vcf_strand_augment)
-                        rec_strandedness = '-' if '-' in rec_aug[n_vcf_fields:] else '+'
+                        rec_strandedness = '-' if next(minus_strand) else '+'
 
                     if not self.is_compatible(rec):
                         continue
@@ -750,7 +976,7 @@ class VariantStreamer:
                     iref = self.bioseq._getsingleitem(Interval(rec.chrom, start, end)).copy()
                     ialt = iref.copy()
 
-                    for o in range(self.bioseq.garray.order):
+                    for o in range(self.bioseq.order):
                         # in the loop we adjust the original DNA sequence
                         # by using the alternative alleele instead
                         #
@@ -764,7 +990,7 @@ class VariantStreamer:
 
                         # this is the positions at which to change the nucleotide
                         position_to_change = self.binsize//2 + o - \
-                                          self.bioseq.garray.order + \
+                                          self.bioseq.order + \
                                           (0 if self.binsize%2 == 0 else 1)
 
                         # determine the reference nucleotide
@@ -808,25 +1034,19 @@ class VariantStreamer:
                                  NMAP[rec.alts[0].upper()],
                                  NMAP[rec.ref.upper()], o)
 
-                    # if the strandedness is negative (from the annotation)
-                    # the DNA sequences are reverse complemented
-                    if rec_strandedness == '-':
-                        ialt = self.bioseq._revcomp(ialt)
-                        iref = self.bioseq._revcomp(iref)
-
-                    alt = as_onehot(ialt[None, :], self.bioseq.garray.order,
-                                    self.bioseq._alphabetsize)
-
-                    alts[ibatch] = alt
-
-                    ref = as_onehot(iref[None, :], self.bioseq.garray.order,
-                                    self.bioseq._alphabetsize)
-                    refs[ibatch] = ref
+                    irefs[ibatch] = iref
+                    ialts[ibatch] = ialt
+                    minus[ibatch] = rec_strandedness == '-'
 
                     ibatch += 1
+
+                # the reverse complement and one-hot encoding
+                # are determined for the entire batch at once.
+                _to_onehot(ibatch)
                 yield names, chroms, poss, rallele, aallele, refs, alts
 
         except StopIteration:
+            _to_onehot(ibatch)
             refs = refs[:ibatch]
             alts = alts[:ibatch]
 
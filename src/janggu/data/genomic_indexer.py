@@ -1,6 +1,9 @@
 """GenomicIndexer module"""
 
+import hashlib
+
 import numpy as np
+import pandas as pd
 from pybedtools import Interval
 from sklearn.utils import check_random_state
 
@@ -21,12 +24,53 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
     zero_padding = None
     collapse = None
     _randomidx = None
-    chrs = None
-    starts = None
-    strand = None
-    ends = None
+    _chrs = None
+    _starts = None
+    _strand = None
+    _ends = None
+    _coords = None
     _random_state = None
 
+    @property
+    def chrs(self):
+        """Chromosome names of the intervals"""
+        return self._chrs
+
+    @chrs.setter
+    def chrs(self, value):
+        self._coords = None
+        self._chrs = value
+
+    @property
+    def starts(self):
+        """Start positions of the intervals"""
+        return self._starts
+
+    @starts.setter
+    def starts(self, value):
+        self._coords = None
+        self._starts = value
+
+    @property
+    def ends(self):
+        """End positions of the intervals"""
+        return self._ends
+
+    @ends.setter
+    def ends(self, value):
+        self._coords = None
+        self._ends = value
+
+    @property
+    def strand(self):
+        """Strands of the intervals"""
+        return self._strand
+
+    @strand.setter
+    def strand(self, value):
+        self._coords = None
+        self._strand = value
+
     @property
     def randomidx(self):
         """randomidx property"""
@@ -286,6 +330,52 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
 
         raise IndexError('Cannot interpret index: {}'.format(type(index_)))
 
+    def _coordinate_arrays(self):
+        """Coordinates as numpy arrays.
+
+        The arrays are cached and rebuilt
+        when the intervals are modified.
+        """
+        if self._coords is None or len(self._coords[0]) != len(self.chrs):
+            self._coords = (np.asarray(self.chrs, dtype=str),
+                            np.asarray(self.starts, dtype='int64'),
+                            np.asarray(self.ends, dtype='int64'),
+                            np.asarray(self.strand, dtype=str))
+        return self._coords
+
+    def coordinates(self, idxs=None):
+        """Genomic coordinates for a set of indices.
+
+        This is a vectorized version of :code:`__getitem__`,
+        i.e. the coordinates are adjusted by the flank and
+        the random_state in the same way.
+
+        Parameters
+        ----------
+        idxs : array-like(int) or None
+            Region indices. If None, the coordinates for
+            all regions are returned. Default: None.
+
+        Returns
+        -------
+        tuple(np.ndarray)
+            Chromosome names, starts, ends and strands.
+        """
+        chrs, starts, ends, strand = self._coordinate_arrays()
+
+        if idxs is None:
+            idxs = np.arange(len(self))
+        idxs = np.asarray(idxs, dtype='int64')
+
+        if self.randomidx is not None:
+            idxs = np.asarray(self.randomidx)[idxs]
+
+        start = starts[idxs]
+        end = ends[idxs]
+        end = np.where(end == start, end + 1, end)
+        return (chrs[idxs], np.maximum(0, start - self.flank),
+                end + self.flank, strand[idxs])
+
     @property
     def binsize(self):
         """binsize of the intervals"""
@@ -323,6 +413,31 @@ class GenomicIndexer(object):  # pylint: disable=too-many-instance-attributes
         """Returns representing the region."""
         return ['{}:{}-{}'.format(iv.chrom, iv.start, iv.end) for iv in self]
 
+    def digest(self):
+        """SHA256 digest of the regions.
+
+        The digest is computed from the coordinate arrays
+        (see :code:`coordinates`) rather than from a string per region,
+        such that it can be used as part of a cache key
+        for large numbers of regions.
+
+        Returns
+        -------
+        str
+            Hex digest.
+        """
+        chrs, starts, ends, strand = self.coordinates()
+        chrcodes, chrnames = pd.factorize(chrs)
+        strandcodes, strandnames = pd.factorize(strand)
+
+        sha256_hash = hashlib.sha256()
+        sha256_hash.update(str([list(chrnames), list(strandnames),
+                                self.binsize, self.stepsize,
+                                self.flank]).encode('utf-8'))
+        for array in [chrcodes, starts, ends, strandcodes]:
+            sha256_hash.update(np.ascontiguousarray(array, dtype='int64').tobytes())
+        return sha256_hash.hexdigest()
+
     def idx_by_region(self, include=None, exclude=None, start=None, end=None):
 
         """idx_by_region filters for chromosome and region ids.
@@ -1,19 +1,46 @@
 """Genomic arrays"""
 
 import hashlib
+import json
 import os
+import shutil
+import threading
+import warnings
+import zlib
 from collections import OrderedDict
 
 import h5py
 import numpy as np
+import pandas as pd
 from pybedtools import Interval
 from scipy import sparse
 
+from janggu.data.cache import INDEXFILE
+from janggu.data.cache import _read_manifest
+from janggu.data.cache import _touch_cachefile
+from janggu.data.cache import _write_manifest
 from janggu.utils import _get_output_data_location
 from janggu.utils import _iv_to_str
 from janggu.utils import _str_to_iv
 
 
+_BLOCK_BYTES = 2**26
+_BLOCK_POSITIONS = 2**20
+_HDF5_CHUNK_BYTES = 2**16
+_HDF5_CHUNK_POSITIONS = 2**12
+_HDF5_CHUNK_SLOTS = 10007
+_SPARSE_COMPACT_SIZE = 2**24
+_PERCENTILE_BINS = 2**12
+
+
+def _bin_index(values, lower, upper):
+    """Index of the histogram bin between lower and upper for each value."""
+    if upper <= lower:
+        return np.zeros(len(values), dtype='int64')
+    index = np.floor((values - lower) / (upper - lower) * _PERCENTILE_BINS)
+    return np.clip(index, 0, _PERCENTILE_BINS - 1).astype('int64')
+
+
 def _get_iv_length(length, resolution):
     """obtain the chromosome length for a given resolution."""
     if resolution is None:
@@ -38,22 +65,158 @@ def get_collapser(method):
     raise ValueError('Unknown method: {}'.format(method))
 
 
+_FINGERPRINT_BLOCKS = 16
+_FINGERPRINT_BLOCK_BYTES = 2**16
+# fasta indices (.fai, .gzi) are not considered, because janggu creates them
+# while loading, i.e. after the cache key has been determined.
+# They are derived from the fasta file, whose fingerprint covers them.
+_INDEX_EXTENSIONS = ['.bai', '.crai', '.csi', '.tbi']
+
+
+def _get_cache_hash_mode():
+    """Determines how the content of the files enters the cache key.
+
+    The mode is set via the environment variable JANGGU_CACHE_HASH,
+    which may be 'fingerprint' (default) or 'verify'.
+    """
+    mode = os.environ.get('JANGGU_CACHE_HASH', 'fingerprint')
+    if mode not in ['fingerprint', 'verify']:
+        raise ValueError('JANGGU_CACHE_HASH must be "fingerprint" or "verify", '
+                         'got "{}"'.format(mode))
+    return mode
+
+
+def _index_files(filename):
+    """Index files that accompany a file (e.g. .bai or .fai)."""
+    candidates = [filename + ext for ext in _INDEX_EXTENSIONS]
+    candidates += [os.path.splitext(filename)[0] + ext for ext in ['.bai', '.crai']]
+    return [candidate for candidate in candidates if os.path.isfile(candidate)]
+
+
+def _file_state(filename):
+    """Size and modification time of a file and its index files."""
+    state = []
+    for file_ in [filename] + _index_files(filename):
+        stat = os.stat(file_)
+        state.append([os.path.basename(file_), stat.st_size, stat.st_mtime_ns])
+    return state
+
+
+def file_fingerprint(filename):
+    """Fingerprint of a file.
+
+    The fingerprint is a SHA256 of the size and modification time of the file,
+    of evenly spaced blocks of its content and of the content of
+    the accompanying index files. In contrast to hashing the entire file,
+    only a small, constant amount of data is read.
+
+    Parameters
+    ----------
+    filename : str
+        File name.
+
+    Returns
+    -------
+    str
+        Hex digest of the fingerprint.
+    """
+    sha256_hash = hashlib.sha256()
+    state = _file_state(filename)
+    sha256_hash.update(str([entry[1:] for entry in state]).encode('utf-8'))
+
+    size = state[0][1]
+    offsets = np.unique(np.linspace(0, max(size - _FINGERPRINT_BLOCK_BYTES, 0),
+                                    _FINGERPRINT_BLOCKS).astype('int64'))
+    with open(filename, 'rb') as file_:
+        for offset in offsets:
+            file_.seek(int(offset))
+            sha256_hash.update(file_.read(_FINGERPRINT_BLOCK_BYTES))
+
+    for index in _index_files(filename):
+        with open(index, 'rb') as file_:
+            for bblock in iter(lambda: file_.read(1024**2), b""):
+                sha256_hash.update(bblock)
+    return sha256_hash.hexdigest()
+
+
+def _get_fingerprint_manifest():
+    """Location of the manifest of file fingerprints."""
+    return os.path.join(_get_output_data_location(None), 'fingerprints.json')
+
+
+def _content_sha256(filename):
+    """SHA256 of the entire content of a file."""
+    sha256_hash = hashlib.sha256()
+    with open(filename, 'rb') as file_:
+        for bblock in iter(lambda: file_.read(1024**2), b""):
+            sha256_hash.update(bblock)
+    return sha256_hash.hexdigest()
+
+
+def _verify_fingerprint(filename, record):
+    """Verifies a fingerprint record against the entire file content.
+
+    The SHA256 of the content is recorded along with the fingerprint.
+    If the content changed without altering the fingerprint,
+    the fingerprint is replaced, such that the cache key changes as well.
+
+    Returns
+    -------
+    boolean
+        Whether the record was modified.
+    """
+    digest = _content_sha256(filename)
+    if record.get('sha256') == digest:
+        return False
+    if 'sha256' in record:
+        warnings.warn('The content of {} changed without altering its fingerprint. '
+                      'The dataset is recreated.'.format(filename))
+        record['fingerprint'] = hashlib.sha256(
+            (file_fingerprint(filename) + digest).encode('utf-8')).hexdigest()
+    record['sha256'] = digest
+    return True
+
+
 def create_sha256_cache(data, parameters):
-    """Cache file determined from files and parameters."""
+    """Cache file determined from files and parameters.
+
+    Files enter the hash via their fingerprint
+    (see :func:`file_fingerprint`), which is recorded in a manifest
+    in the output directory, such that unchanged files
+    are not read again. Setting the environment variable
+    JANGGU_CACHE_HASH='verify' additionally hashes the entire content
+    of the files and compares it with the content recorded during
+    the previous verification. The cache key only changes
+    if the content was modified without altering the fingerprint.
+    """
 
     sha256_hash = hashlib.sha256()
+    mode = _get_cache_hash_mode()
+    fingerprints = None
+    modified = False
 
     # add file content to hash
     for datum in data or []:
         if isinstance(datum, str) and os.path.exists(datum):
-            with open(datum, 'rb') as file_:
-                for bblock in iter(lambda: file_.read(1024**2), b""):
-                    sha256_hash.update(bblock)
+            if fingerprints is None:
+                fingerprints = _read_manifest(_get_fingerprint_manifest())
+            key = os.path.abspath(datum)
+            state = _file_state(datum)
+            if key not in fingerprints or fingerprints[key]['state'] != state:
+                fingerprints[key] = {'state': state,
+                                     'fingerprint': file_fingerprint(datum)}
+                modified = True
+            if mode == 'verify':
+                modified = _verify_fingerprint(datum, fingerprints[key]) or modified
+            sha256_hash.update(fingerprints[key]['fingerprint'].encode('utf-8'))
         elif isinstance(datum, np.ndarray):
             sha256_hash.update(datum.tobytes())
         else:
             sha256_hash.update(str(datum).encode('utf-8'))
 
+    if modified:
+        _write_manifest(_get_fingerprint_manifest(), fingerprints)
+
     # add parameter settings to hash
     sha256_hash.update(str(parameters).encode('utf-8'))
 
@@ -80,6 +243,53 @@ def _load_data(cachestr, tags, fileending):
         return False
     return True
 
+
+def _write_cacheindex(cachedir, index):
+    """ write the index of a directory-based cache.
+
+    The index is written last, such that its presence
+    marks the cache as complete.
+    """
+    with open(os.path.join(cachedir, INDEXFILE), 'w') as file_:
+        json.dump(index, file_)
+
+
+def _read_cacheindex(cachedir):
+    """ read the index of a directory-based cache """
+    with open(os.path.join(cachedir, INDEXFILE), 'r') as file_:
+        return json.load(file_)
+
+
+def _load_dir_data(cachedir):
+    """ loading directory-based data from scratch or from cache """
+    return not os.path.exists(os.path.join(cachedir, INDEXFILE))
+
+
+def _create_memmaps(dirname, shapes, dtype, padding_value):
+    """ create writable memory maps (as .npy files) for a list of datasets
+
+    Returns
+    -------
+    tuple(OrderedDict, list)
+        Dictionary of memory maps and list of (name, filename) pairs.
+    """
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+
+    handle = OrderedDict()
+    files = []
+    for i, (name, shape) in enumerate(shapes):
+        filename = '{}.npy'.format(i)
+        data = np.lib.format.open_memmap(os.path.join(dirname, filename),
+                                         mode='w+', dtype=dtype,
+                                         shape=shape)
+        if padding_value != 0.0:
+            data[:] = padding_value
+        handle[name] = data
+        files.append((name, filename))
+    return handle, files
+
+
 class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
     """GenomicArray stores multi-dimensional genomic information.
 
@@ -132,6 +342,156 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
         self._full_genome_stored = store_whole_genome
         self.collapser = collapser
 
+    def _dataset_shapes(self, gsize):
+        """Names and shapes of the datasets to allocate.
+
+        Parameters
+        ----------
+        gsize : GenomicIndexer
+            GenomicIndexer containing the genome sizes or
+            the regions of interest.
+
+        Returns
+        -------
+        list(tuple)
+            List of (name, shape) tuples.
+        """
+        if self._full_genome_stored:
+            return [(str(region.chrom),
+                     (_get_iv_length(region.length - self.order + 1,
+                                     self.resolution),
+                      2 if self.stranded else 1,
+                      len(self.condition))) for region in gsize]
+
+        return [('data',
+                 (len(gsize),
+                  _get_iv_length(gsize.binsize + 2*gsize.flank - self.order + 1,
+                                 self.resolution),
+                  2 if self.stranded else 1,
+                  len(self.condition)))]
+
+    def _set_region_index(self, gsize):
+        """Index of the regions of interest.
+
+        This is used for store_whole_genome=False to map
+        intervals to the rows of the dataset.
+        If a region occurs multiple times, the last occurrence is used.
+
+        Parameters
+        ----------
+        gsize : GenomicIndexer
+            Regions of interest.
+        """
+        chroms, starts, ends, _ = gsize.coordinates()
+        index = pd.Series(np.arange(len(chroms)),
+                          index=pd.MultiIndex.from_arrays([chroms, starts, ends]))
+        self._region_index = index[~index.index.duplicated(keep='last')]
+        self.region2index = {_iv_to_str(chrom, start, end): i
+                             for (chrom, start, end), i in self._region_index.items()}
+
+    def _region_rows(self, chroms, starts, ends):
+        """Rows associated with a set of regions of interest."""
+        pos = self._region_index.index.get_indexer(
+            pd.MultiIndex.from_arrays([chroms, starts, ends]))
+        if np.any(pos < 0):
+            missing = np.nonzero(pos < 0)[0][0]
+            raise KeyError(_iv_to_str(chroms[missing], starts[missing], ends[missing]))
+        return self._region_index.values[pos]
+
+    def _take(self, name, idxs):
+        """Gather the elements idxs along the first axis of a dataset.
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape (len(idxs),) + dataset.shape[1:]
+        """
+        return np.asarray(self.handle[name][idxs])
+
+    def get_batch(self, chroms, starts, ends, strands, out=None):
+        """Gather the data for a batch of genomic intervals.
+
+        This method is a vectorized equivalent of
+        querying each interval separately. Positions that
+        lie outside of the chromosomes are filled with the padding value.
+        The data for intervals on the minus strand is reversed
+        and the strand dimension is flipped, such that it is
+        relative to the minus strand.
+
+        Parameters
+        ----------
+        chroms : array-like(str)
+            Chromosome names.
+        starts : array-like(int)
+            Interval starts.
+        ends : array-like(int)
+            Interval ends.
+        strands : array-like(str)
+            Interval strands.
+        out : np.ndarray or None
+            Array of shape (len(starts), length, strand, condition)
+            to write the results to. If the intervals are shorter than
+            length, the remaining positions are filled with the padding value.
+            If None, a new array is allocated. Default: None.
+
+        Returns
+        -------
+        np.ndarray
+            Data of shape (len(starts), length, strand, condition).
+        """
+        chroms = np.asarray(chroms, dtype=str)
+        starts = np.asarray(starts, dtype='int64')
+        ends = np.asarray(ends, dtype='int64')
+        minus = np.asarray(strands, dtype=str) == '-'
+        nstrands = 2 if self.stranded else 1
+
+        if not self._full_genome_stored:
+            rows = self._region_rows(chroms, starts, ends)
+            data = self._reshape_batch(self._take('data', rows))
+            if out is None:
+                out = data
+            else:
+                out[:, :data.shape[1]] = data
+                out[:, data.shape[1]:] = self.padding_value
+            if np.any(minus):
+                out[minus] = out[minus][:, ::-1, ::-1, :]
+        else:
+            bstarts = starts // self.resolution
+            lengths = -(-ends // self.resolution) - bstarts - self.order + 1
+            if out is None:
+                out = np.empty((len(starts), max(lengths.max(initial=0), 0),
+                                nstrands, len(self.condition)), dtype=self.typecode)
+            out[:] = self.padding_value
+
+            # positions are reversed for the minus strand
+            offsets = np.arange(out.shape[1])
+            positions = np.where(minus[:, None],
+                                 (bstarts + lengths - 1)[:, None] - offsets,
+                                 bstarts[:, None] + offsets)
+            valid = (offsets < lengths[:, None]) & (positions >= 0)
+
+            names, codes = np.unique(chroms, return_inverse=True)
+            for icode, name in enumerate(names):
+                if name not in self.handle:
+                    continue
+                select = valid & (codes == icode)[:, None] & \
+                    (positions < self.handle[name].shape[0])
+                rowidx, colidx = np.nonzero(select)
+                if len(rowidx) == 0:
+                    continue
+                out[rowidx, colidx] = self._reshape_batch(
+                    self._take(name, positions[rowidx, colidx]))
+
+            if np.any(minus):
+                # the positions are already reversed
+                out[minus] = out[minus][:, :, ::-1, :]
+        return out
+
+    def _reshape_batch(self, data):
+        # shape not necessary here,
+        # data should just fall through
+        return data
+
     def _get_indices(self, interval, arraylen):
         """Given the original genomic coordinates,
            the array indices of the reference dataset (garray.handle)
@@ -347,11 +707,58 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
 
         return self.resolution
 
+    def _blocks(self, chrom):
+        """Slices along the first axis of a dataset.
+
+        The slices are used to process a dataset blockwise
+        with bounded memory consumption. For chunked datasets,
+        the blocks are aligned with the chunks.
+        """
+        data = self.handle[chrom]
+        rowbytes = max(1, int(np.prod(data.shape[1:])) * np.dtype(data.dtype).itemsize)
+        blocklen = max(1, _BLOCK_BYTES // rowbytes)
+        chunks = getattr(data, 'chunks', None)
+        if chunks:
+            blocklen = max(chunks[0], blocklen // chunks[0] * chunks[0])
+        for start in range(0, data.shape[0], blocklen):
+            yield slice(start, min(start + blocklen, data.shape[0]))
+
+    def blocks(self, interval):
+        """Split an interval into consecutive sub-intervals.
+
+        This allows loaders to fill the genomic array blockwise,
+        such that the memory consumption for loading
+        long intervals (e.g. entire chromosomes) remains bounded.
+        The sub-intervals are aligned with the resolution.
+        If only the regions of interest are stored,
+        the interval is returned as is.
+
+        Parameters
+        ----------
+        interval : Interval
+            Genomic interval.
+
+        Returns
+        -------
+        generator(Interval)
+            Sub-intervals.
+        """
+        if not self._full_genome_stored or self.resolution is None:
+            yield interval
+            return
+
+        blocklen = _BLOCK_POSITIONS // self.resolution * self.resolution
+        blocklen = max(blocklen, self.resolution)
+        for start in range(interval.start, interval.end, blocklen):
+            yield Interval(interval.chrom, start, min(start + blocklen, interval.end),
+                           strand=interval.strand)
+
     def scale_by_region_length(self):
         """ This method scales the regions by the region length ."""
         for chrom in self.handle:
             if self._full_genome_stored:
-                self.handle[chrom][:] /= self.interval_length(chrom)
+                for block in self._blocks(chrom):
+                    self.handle[chrom][block] /= self.interval_length(chrom)
             else:
                 for rstr, idx in self.region2index.items():
                     self.handle[chrom][idx] /= self.interval_length(rstr)
@@ -376,30 +783,38 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
 
         for chrom in self.handle:
             # adjust base pair resoltion mean to interval length
-            self.handle[chrom][:] -= means
+            for block in self._blocks(chrom):
+                self.handle[chrom][block] -= means
 
     def rescale(self, scale):
         """ Method to rescale the signal """
         for chrom in self.handle:
-            self.handle[chrom][:] /= scale
+            for block in self._blocks(chrom):
+                self.handle[chrom][block] /= scale
+
+    def _blocksum(self, chrom, func=None):
+        """Sum of the (transformed) signal computed blockwise."""
+        axis = tuple(range(self.handle[chrom].ndim - 1))
+        total = 0
+        for block in self._blocks(chrom):
+            data = self.handle[chrom][block]
+            if func is not None:
+                data = func(data)
+            total = total + data.sum(axis=axis)
+        return total
 
     def sum(self, chrom=None):
         """Sum signal across chromosomes."""
         if chrom is not None:
-            return self.handle[chrom][:]\
-                .sum(axis=tuple(range(self.handle[chrom].ndim - 1)))
+            return self._blocksum(chrom)
 
-        return np.asarray([self.handle[chrom][:]\
-            .sum(axis=tuple(range(self.handle[chrom].ndim - 1)))
-                           for chrom in self.handle])
+        return np.asarray([self._blocksum(chrom) for chrom in self.handle])
 
     def weighted_sd(self):
         """ Interval scaled standard deviation """
 
         # summing the squared signal signal
-        sums = [np.square(self.handle[chrom][:, :, :]).sum(
-            axis=tuple(range(self.handle[chrom].ndim - 1))) \
-            for chrom in self.handle]
+        sums = [self._blocksum(chrom, np.square) for chrom in self.handle]
         sums = np.asarray(sums).sum(axis=0)
 
         # weights are determined by interval and chromosome length
@@ -408,6 +823,86 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
         weights = np.asarray(weights).sum()
         return np.sqrt(sums / (weights - 1.))
 
+    def _selection(self, icond, steps):
+        """Signal of a condition that falls into the selected bins.
+
+        The values are yielded blockwise. Each selection step
+        (lower, upper, ibin) retains the values in the bin ibin
+        of a histogram between lower and upper.
+        """
+        for chrom in self.handle:
+            for block in self._blocks(chrom):
+                values = np.asarray(self.handle[chrom][block][..., icond],
+                                    dtype='float64').ravel()
+                for lower, upper, ibin in steps:
+                    values = values[_bin_index(values, lower, upper) == ibin]
+                yield values
+
+    def _order_statistic(self, icond, rank):
+        """Value at the given rank of the sorted signal of a condition.
+
+        The value is determined exactly by narrowing down the histogram bin
+        that contains the rank in several passes over the data,
+        until the remaining values fit into a single block.
+        """
+        steps = []
+        while True:
+            count, vmin, vmax = 0, np.inf, -np.inf
+            for values in self._selection(icond, steps):
+                if not steps and np.isnan(values).any():
+                    return np.nan
+                if len(values):
+                    count += len(values)
+                    vmin = min(vmin, values.min())
+                    vmax = max(vmax, values.max())
+
+            if vmin == vmax:
+                return vmin
+            if count * 8 <= _BLOCK_BYTES:
+                values = np.concatenate(list(self._selection(icond, steps)))
+                return np.partition(values, rank)[rank]
+
+            counts = np.zeros(_PERCENTILE_BINS, dtype='int64')
+            for values in self._selection(icond, steps):
+                counts += np.bincount(_bin_index(values, vmin, vmax),
+                                      minlength=_PERCENTILE_BINS)
+            counts = np.cumsum(counts)
+            ibin = int(np.searchsorted(counts, rank, side='right'))
+            if ibin > 0:
+                rank -= counts[ibin - 1]
+            steps.append((vmin, vmax, ibin))
+
+    def percentile(self, percentile):
+        """Percentile of the signal per condition.
+
+        The percentile is determined blockwise with bounded
+        memory consumption. It is equivalent to :code:`np.percentile`
+        across all positions and strands.
+
+        Parameters
+        ----------
+        percentile : float
+            Percentile between 0 and 100.
+
+        Returns
+        -------
+        np.ndarray
+            Percentile for each condition.
+        """
+        shapes = [self.handle[chrom].shape for chrom in self.handle]
+        size = sum(np.prod(shape[:-1]) for shape in shapes)
+        position = percentile / 100. * (size - 1)
+        rank = int(np.floor(position))
+        fraction = position - rank
+
+        quants = []
+        for icond in range(shapes[0][-1]):
+            quant = self._order_statistic(icond, rank)
+            if fraction > 0 and not np.isnan(quant):
+                quant += fraction * (self._order_statistic(icond, rank + 1) - quant)
+            quants.append(quant)
+        return np.asarray(quants)
+
     @property
     def order(self):
         """order"""
@@ -429,6 +924,43 @@ class GenomicArray(object):  # pylint: disable=too-many-instance-attributes
             return 0
         return start // self.resolution
 
+
+def get_default_storage_options(storage, storage_options, gindexer,
+                                resolution, store_whole_genome):
+    """Storage options with defaults derived from the regions of interest.
+
+    For the hdf5 storage, the chunks of a whole genome array are
+    aligned with the length of the regions of interest, such that
+    a region is read from as few chunks as possible.
+
+    Parameters
+    ----------
+    storage : str
+        Storage type.
+    storage_options : dict or None
+        User-defined storage options. These take precedence
+        over the defaults.
+    gindexer : GenomicIndexer or None
+        Regions of interest.
+    resolution : int or None
+        Resolution of the genomic array.
+    store_whole_genome : boolean
+        Whether the entire genome is stored.
+
+    Returns
+    -------
+    dict
+        Storage options.
+    """
+    options = dict(storage_options or {})
+    if storage == 'hdf5' and store_whole_genome and \
+            gindexer is not None and gindexer.binsize is not None:
+        binlength = _get_iv_length(gindexer.binsize + 2*gindexer.flank, resolution)
+        options.setdefault('chunk_length',
+                           binlength * max(1, _HDF5_CHUNK_POSITIONS // binlength))
+    return options
+
+
 def init_with_padding_value(padding_value, shape, dtype):
     """ create array with given padding value. """
     if padding_value == 0.0:
@@ -474,6 +1006,18 @@ class HDF5GenomicArray(GenomicArray):
         Function to be called for loading the genomic array.
     collapser : None or callable
         Method to aggregate values along a given interval.
+    chunk_length : int or None
+        Number of elements along the first axis (positions
+        or regions) per HDF5 chunk. If None, chunks of about 64 KB are used.
+        Default: None.
+    compression : str or None
+        HDF5 compression filter, e.g. 'gzip' or 'lzf'.
+        Default: None means no compression.
+    compression_opts : int or None
+        Options for the compression filter, e.g. the gzip level.
+        Default: None.
+    chunk_cache_size : int
+        Size of the HDF5 raw data chunk cache in bytes. Default: 64 MB.
     verbose : boolean
         Verbosity. Default: False
     """
@@ -491,6 +1035,10 @@ class HDF5GenomicArray(GenomicArray):
                  overwrite=False, loader=None,
                  normalizer=None,
                  collapser=None,
+                 chunk_length=None,
+                 compression=None,
+                 compression_opts=None,
+                 chunk_cache_size=64 * 2**20,
                  verbose=False):
         super(HDF5GenomicArray, self).__init__(stranded, conditions, typecode,
                                                resolution,
@@ -506,10 +1054,7 @@ class HDF5GenomicArray(GenomicArray):
 
         if not store_whole_genome:
             gsize_ = gsize() if callable(gsize) else gsize
-            self.region2index = {_iv_to_str(region.chrom,
-                                            region.start,
-                                            region.end): i \
-                                                for i, region in enumerate(gsize_)}
+            self._set_region_index(gsize_)
 
         cachefile = _get_cachefile(cache, datatags, '.h5')
         load_from_file = _load_data(cache, datatags, '.h5')
@@ -520,27 +1065,14 @@ class HDF5GenomicArray(GenomicArray):
 
             h5file = h5py.File(cachefile, 'w')
 
-            if store_whole_genome:
-                for region in gsize_:
-                    shape = (_get_iv_length(region.length - self.order + 1, self.resolution),
-                             2 if stranded else 1, len(self.condition))
-                    h5file.create_dataset(str(region.chrom), shape,
-                                          dtype=self.typecode,
-                                          data=init_with_padding_value(padding_value,
-                                                                       shape,
-                                                                       self.typecode))
-                    self.handle = h5file
-            else:
-                shape = (len(gsize_),
-                         _get_iv_length(gsize_.binsize + 2*gsize_.flank - self.order + 1,
-                                        self.resolution),
-                         2 if stranded else 1, len(self.condition))
-                h5file.create_dataset('data', shape,
+            for name, shape in self._dataset_shapes(gsize_):
+                h5file.create_dataset(name, shape,
                                       dtype=self.typecode,
-                                      data=init_with_padding_value(padding_value,
-                                                                   shape,
-                                                                   self.typecode))
-                self.handle = h5file
+                                      chunks=self._chunk_shape(shape, chunk_length),
+                                      compression=compression,
+                                      compression_opts=compression_opts,
+                                      fillvalue=padding_value)
+            self.handle = h5file
             # invoke the loader
             if loader:
                 loader(self)
@@ -549,10 +1081,29 @@ class HDF5GenomicArray(GenomicArray):
                 get_normalizer(norm)(self)
             h5file.close()
         if verbose: print('reload {}'.format(cachefile))
-        h5file = h5py.File(cachefile, 'a', driver='stdio')
+        _touch_cachefile(cachefile)
+        h5file = h5py.File(cachefile, 'a', rdcc_nbytes=chunk_cache_size,
+                           rdcc_nslots=_HDF5_CHUNK_SLOTS)
 
         self.handle = h5file
 
+    def _take(self, name, idxs):
+        # HDF5 datasets are read in contiguous blocks rather than
+        # via point selections, which are slow.
+        if len(idxs) == 0:
+            return np.empty((0,) + self.handle[name].shape[1:], dtype=self.typecode)
+        uniq, inverse = np.unique(idxs, return_inverse=True)
+        runs = np.split(uniq, np.nonzero(np.diff(uniq) != 1)[0] + 1)
+        data = np.concatenate([self.handle[name][run[0]:run[-1] + 1] for run in runs])
+        return data[inverse]
+
+    def _chunk_shape(self, shape, chunk_length):
+        """HDF5 chunk shape for a dataset."""
+        if chunk_length is None:
+            rowbytes = np.prod(shape[1:]) * np.dtype(self.typecode).itemsize
+            chunk_length = max(1, _HDF5_CHUNK_BYTES // rowbytes)
+        return (max(1, min(chunk_length, shape[0])),) + tuple(shape[1:])
+
 
 class NPGenomicArray(GenomicArray):
     """NPGenomicArray stores multi-dimensional genomic information.
@@ -627,10 +1178,7 @@ class NPGenomicArray(GenomicArray):
 
             gsize_ = gsize() if callable(gsize) else gsize
 
-            self.region2index = {_iv_to_str(region.chrom,
-                                            region.start,
-                                            region.end): i \
-                                                for i, region in enumerate(gsize_)}
+            self._set_region_index(gsize_)
 
         cachefile = _get_cachefile(cache, datatags, '.npz')
         load_from_file = _load_data(cache, datatags, '.npz')
@@ -672,6 +1220,7 @@ class NPGenomicArray(GenomicArray):
 
         if cachefile is not None:
             if verbose: print('reload {}'.format(cachefile))
+            _touch_cachefile(cachefile)
             data = np.load(cachefile)
             names = [x for x in data]
 
@@ -683,10 +1232,15 @@ class NPGenomicArray(GenomicArray):
             get_normalizer(norm)(self)
 
 
-class SparseGenomicArray(GenomicArray):
-    """SparseGenomicArray stores multi-dimensional genomic information.
+class MemmapGenomicArray(GenomicArray):
+    """MemmapGenomicArray stores multi-dimensional genomic information.
 
     Implements GenomicArray.
+    Each chromosome (or the block of regions of interest
+    for store_whole_genome=False) is stored as a separate
+    .npy file in the cache directory and reopened as a read-only
+    memory map. This keeps the startup time and the resident memory low
+    and allows multiple processes to share the same page cache.
 
     Parameters
     ----------
@@ -713,8 +1267,8 @@ class SparseGenomicArray(GenomicArray):
     padding_value : float
         Padding value. Default: 0.
     cache : str or None
-        Hash string of the data and parameters to cache the dataset. If None,
-        caching is deactivated. Default: None.
+        Hash string of the data and parameters to cache the dataset.
+        Caching is required for the memmap format.
     overwrite : boolean
         Whether to overwrite the cache. Default: False
     loader : callable or None
@@ -723,6 +1277,8 @@ class SparseGenomicArray(GenomicArray):
         Normalization to be applied. This argumenet can be None,
         if no normalization is applied, or a callable that takes
         a garray and returns a normalized garray.
+        Since the memory maps are reopened read-only, the normalization
+        is applied once when the cache is created.
         Default: None.
     collapser : None or callable
         Method to aggregate values along a given interval.
@@ -737,181 +1293,1496 @@ class SparseGenomicArray(GenomicArray):
                  datatags=None,
                  resolution=1,
                  order=1,
+                 padding_value=0.0,
                  store_whole_genome=True,
                  cache=None,
-                 padding_value=0.0,
-                 overwrite=False,
-                 loader=None,
-                 collapser=None,
+                 overwrite=False, loader=None,
+                 normalizer=None, collapser=None,
                  verbose=False):
-        super(SparseGenomicArray, self).__init__(stranded, conditions,
-                                                 typecode,
+
+        super(MemmapGenomicArray, self).__init__(stranded, conditions, typecode,
                                                  resolution,
                                                  order=order,
                                                  padding_value=padding_value,
                                                  store_whole_genome=store_whole_genome,
                                                  collapser=collapser)
 
-        cachefile = _get_cachefile(cache, datatags, '.npz')
-        load_from_file = _load_data(cache, datatags, '.npz')
+        if cache is None:
+            raise ValueError('cache=True required for memmap format')
 
         gsize_ = None
 
         if not store_whole_genome:
-
             gsize_ = gsize() if callable(gsize) else gsize
+            self._set_region_index(gsize_)
 
-            self.region2index = {_iv_to_str(region.chrom,
-                                            region.start,
-                                            region.end): i \
-                                                for i, region in enumerate(gsize_)}
+        cachedir = _get_cachefile(cache, datatags, '.mmap')
 
-        if load_from_file:
+        if _load_dir_data(cachedir):
             if gsize_ is None:
                 gsize_ = gsize() if callable(gsize) else gsize
 
-            if store_whole_genome:
-                data = {str(region.chrom): sparse.dok_matrix(
-                    (_get_iv_length(region.length - self.order + 1,
-                                    resolution),
-                     (2 if stranded else 1) * len(self.condition)),
-                    dtype=self.typecode)
-                        for region in gsize_}
-            else:
-                data = {'data': sparse.dok_matrix(
-                    (len(gsize_),
-                     (_get_iv_length(gsize_.binsize + 2*gsize_.flank - self.order + 1,
-                                     self.resolution) if self.resolution is not None else 1) *
-                     (2 if stranded else 1) * len(self.condition)),
-                    dtype=self.typecode)}
-            self.handle = data
+            self.handle, index = _create_memmaps(cachedir,
+                                                 self._dataset_shapes(gsize_),
+                                                 self.typecode, padding_value)
 
             # invoke the loader
             if loader:
                 loader(self)
 
-            data = self.handle
+            for norm in normalizer or []:
+                get_normalizer(norm)(self)
 
-            data = {chrom: data[chrom].tocoo() for chrom in data}
+            for name in self.handle:
+                self.handle[name].flush()
+            self.handle = OrderedDict()
 
-            storage = {chrom: np.column_stack([data[chrom].data,
-                                               data[chrom].row,
-                                               data[chrom].col]) \
-                                               for chrom in data}
-            for region in gsize_:
-                if store_whole_genome:
-                    storage[region.chrom + '__length__'] = region.length
+            _write_cacheindex(cachedir, {'files': index})
 
-            names = [name for name in storage]
+        if verbose: print('reload {}'.format(cachedir))
+        _touch_cachefile(cachedir)
+        self._cachedir = cachedir
+        self._open()
 
-            if cachefile is not None:
-                np.savez(cachefile, **storage)
+    def _open(self):
+        index = _read_cacheindex(self._cachedir)
+        self.handle = OrderedDict(
+            (name, np.load(os.path.join(self._cachedir, filename),
+                           mmap_mode='r')) for name, filename in index['files'])
 
-        if cachefile is not None:
-            if verbose: print('reload {}'.format(cachefile))
-            storage = np.load(cachefile)
+    def __getstate__(self):
+        # only the location of the memory maps is pickled
+        # rather than their content. This way, the page cache
+        # is shared with worker processes.
+        state = self.__dict__.copy()
+        del state['handle']
+        return state
 
-        names = [name for name in storage if '__length__' not in name]
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
 
-        if store_whole_genome:
-            self.handle = {name: sparse.coo_matrix(
-                (storage[name][:, 0],
-                 (storage[name][:, 1].astype('int'),
-                  storage[name][:, 2].astype('int'))),
-                shape=(_get_iv_length(storage[str(name)+'__length__'], resolution),
-                       (2 if stranded else 1) * len(self.condition))).tocsr()
-                           for name in names}
-        else:
-            # gsize_ is always available for store_whole_genome=False
-            self.handle = {name: sparse.coo_matrix(
-                (storage[name][:, 0],
-                 (storage[name][:, 1].astype('int'),
-                  storage[name][:, 2].astype('int'))),
-                shape=(len(gsize_),
-                       (_get_iv_length(gsize_.binsize + 2*gsize_.flank, resolution)
-                        if self.resolution is not None else 1) *
-                       (2 if stranded else 1) * len(self.condition))).tocsr()
-                           for name in names}
 
-    def _reshape(self, data, shape):
-        # what to do with zero padding
-        data = data.toarray()
+class _ChunkCache(object):
+    """Least-recently-used cache of decompressed chunks.
 
-        if self._full_genome_stored:
-            return data.reshape(data.shape[0], data.shape[1]//(shape[-1]), shape[-1])
+    Parameters
+    ----------
+    maxbytes : int
+        Maximum number of bytes of decompressed chunks that are kept
+        in memory.
+    """
+    def __init__(self, maxbytes):
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, load):
+        """Get a chunk from the cache or load it.
+
+        The cache may be shared by several threads (e.g. the workers
+        of a JangguSequence). Chunks are decompressed outside
+        of the lock.
+        """
+        with self._lock:
+            if key in self._chunks:
+                self._chunks.move_to_end(key)
+                return self._chunks[key]
+
+        chunk = load()
+        with self._lock:
+            if key in self._chunks:
+                # the chunk was loaded by another thread in the meantime
+                self._chunks.move_to_end(key)
+                return self._chunks[key]
+            self._chunks[key] = chunk
+            self.nbytes += chunk.nbytes
+            while self.nbytes > self.maxbytes and len(self._chunks) > 1:
+                _, evicted = self._chunks.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+        return chunk
+
+    def __getstate__(self):
+        # decompressed chunks are not pickled
+        return {'maxbytes': self.maxbytes, 'nbytes': 0}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._chunks = OrderedDict()
+        self._lock = threading.Lock()
+
+
+class _ChunkWriter(object):
+    """Writable array-like access for assembling a chunked dataset.
+
+    The chunks are kept decompressed in memory while they are written.
+    If the chunks exceed maxbytes, the least recently used ones
+    are compressed and appended to a temporary file, from
+    which they are restored if they are accessed again.
+    Chunks that are never written are filled with the padding value.
+
+    Parameters
+    ----------
+    tmpfile : str
+        Temporary file for the compressed chunks.
+    shape : tuple
+        Shape of the dataset.
+    dtype : str
+        Datatype.
+    chunklen : int
+        Number of elements per chunk along the first axis.
+    padding_value : float
+        Padding value.
+    compression_level : int
+        zlib compression level.
+    maxbytes : int
+        Maximum number of bytes of decompressed chunks
+        that are kept in memory.
+    """
+    def __init__(self, tmpfile, shape, dtype, chunklen, padding_value,
+                 compression_level, maxbytes):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.chunklen = chunklen
+        self.chunks = (chunklen,) + self.shape[1:]
+        self.padding_value = padding_value
+        self.compression_level = compression_level
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._tmpfile = open(tmpfile, 'w+b') if tmpfile is not None else None
+        self._stored = {}
+        self._chunks = OrderedDict()
+
+    @property
+    def ndim(self):
+        """Number of dimensions"""
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _chunklength(self, ichunk):
+        return min(self.chunklen, self.shape[0] - ichunk * self.chunklen)
+
+    def _read(self, ichunk):
+        offset, length = self._stored[ichunk]
+        self._tmpfile.seek(offset)
+        return self._tmpfile.read(length)
+
+    def _store(self, ichunk, data):
+        """Stores an evicted chunk."""
+        self._tmpfile.seek(0, os.SEEK_END)
+        compressed = zlib.compress(data.tobytes(), self.compression_level)
+        self._stored[ichunk] = (self._tmpfile.tell(), len(compressed))
+        self._tmpfile.write(compressed)
+
+    def _restore(self, ichunk):
+        """Restores a previously evicted chunk."""
+        return np.frombuffer(zlib.decompress(self._read(ichunk)),
+                             dtype=self.dtype).reshape(
+                                 (self._chunklength(ichunk),) + self.shape[1:]).copy()
+
+    def _chunk(self, ichunk):
+        if ichunk in self._chunks:
+            self._chunks.move_to_end(ichunk)
+            return self._chunks[ichunk]
+
+        if ichunk in self._stored:
+            chunk = self._restore(ichunk)
         else:
-            return data.reshape(data.shape[1]//(shape[-2]*shape[-1]), shape[-2], shape[-1])
+            chunk = np.full((self._chunklength(ichunk),) + self.shape[1:],
+                            self.padding_value, dtype=self.dtype)
+        self._chunks[ichunk] = chunk
+        self.nbytes += chunk.nbytes
+        while self.nbytes > self.maxbytes and len(self._chunks) > 1:
+            evicted, data = self._chunks.popitem(last=False)
+            self.nbytes -= data.nbytes
+            self._store(evicted, data)
+        return chunk
+
+    def _rows(self, first):
+        """Row indices for the key along the first axis."""
+        if isinstance(first, (int, np.integer)):
+            if first < 0:
+                first += self.shape[0]
+            if not 0 <= first < self.shape[0]:
+                raise IndexError('index {} out of bounds for axis 0 with '
+                                 'size {}'.format(first, self.shape[0]))
+            return np.asarray([first])
+        if isinstance(first, slice):
+            return np.arange(*first.indices(self.shape[0]))
+        rows = np.asarray(first)
+        if rows.dtype == bool:
+            rows = np.nonzero(rows)[0]
+        return np.where(rows < 0, rows + self.shape[0], rows)
+
+    def _groups(self, rows):
+        """Groups the rows by chunk."""
+        ichunks = rows // self.chunklen
+        order = np.argsort(ichunks, kind='stable')
+        bounds = np.flatnonzero(np.diff(ichunks[order])) + 1
+        for sel in np.split(order, bounds):
+            if len(sel):
+                yield ichunks[sel[0]], sel
+
+    def _gather(self, rows):
+        data = np.empty((len(rows),) + self.shape[1:], dtype=self.dtype)
+        for ichunk, sel in self._groups(rows):
+            data[sel] = self._chunk(ichunk)[rows[sel] - ichunk * self.chunklen]
+        return data
 
-    def _setitem(self, interval, condition, length, value):
-        if not self._full_genome_stored:
-            regidx = self.region2index[_iv_to_str(interval.chrom, interval.start, interval.end)]
-            nconditions = len(self.condition)
-            ncondstrand = len(self.condition) * value.shape[-1]
-            #end = end - self.order + 1
-            idxs = np.where(value > 0)
-            for idx in zip(*idxs):
-                basepos = idx[0] * ncondstrand
-                strand = idx[1] * nconditions
-                cond = condition if isinstance(condition, int) else idx[2]
-                self.handle['data'][regidx,
-                                    basepos + strand + cond] = value[idx]
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        data = self._gather(self._rows(key[0]))
+        if isinstance(key[0], (int, np.integer)):
+            return data[0][key[1:]]
+        return data[(slice(None),) + key[1:]]
+
+    def __setitem__(self, key, value):
+        if not isinstance(key, tuple):
+            key = (key,)
+        rows = self._rows(key[0])
+        data = self._gather(rows)
+        if isinstance(key[0], (int, np.integer)):
+            data[0][key[1:]] = value
         else:
-            ref_start, ref_end, array_start, _ = self._get_indices(interval, value.shape[0])
-            idxs = np.where(value > 0)
-            iarray = np.arange(ref_start, ref_end)
-            for idx in zip(*idxs):
-                cond = condition if isinstance(condition, int) else idx[2]
-                self.handle[interval.chrom][iarray[idx[0]],
-                                            idx[1] * len(self.condition)
-                                            + cond] = value[idx[0] + array_start][idx[1:]]
+            data[(slice(None),) + key[1:]] = value
+        for ichunk, sel in self._groups(rows):
+            self._chunk(ichunk)[rows[sel] - ichunk * self.chunklen] = data[sel]
 
-class PercentileTrimming(object):
-    """Percentile trimming normalization.
+    def finalize(self, datafile):
+        """Writes the compressed chunks in order to the data file.
 
-    This class performs percentile trimming of a GenomicArray to aleviate
-    the effect of outliers.
-    All values that exceed the value associated with the given percentile
-    are set to be equal to the percentile.
+        Returns
+        -------
+        list(int)
+            Byte offsets of the chunks in the data file.
+        """
+        offsets = [datafile.tell()]
+        padding = {}
+        for ichunk in range(-(-self.shape[0] // self.chunklen)):
+            if ichunk in self._chunks:
+                compressed = zlib.compress(self._chunks.pop(ichunk).tobytes(),
+                                           self.compression_level)
+            elif ichunk in self._stored:
+                compressed = self._read(ichunk)
+            else:
+                length = self._chunklength(ichunk)
+                if length not in padding:
+                    padding[length] = zlib.compress(
+                        np.full((length,) + self.shape[1:], self.padding_value,
+                                dtype=self.dtype).tobytes(),
+                        self.compression_level)
+                compressed = padding[length]
+            datafile.write(compressed)
+            offsets.append(datafile.tell())
+        self._tmpfile.close()
+        self._chunks = OrderedDict()
+        self.nbytes = 0
+        return offsets
+
+
+class _ChunkedDataset(object):
+    """Read-only array-like access to a chunked, compressed dataset.
+
+    The dataset is split into chunks of :code:`chunklen`
+    elements along the first axis. Each chunk is stored
+    as a zlib-compressed block in a shared data file.
+    Indexing decompresses only the chunks that overlap the query.
 
     Parameters
     ----------
-    percentile : float
-        Percentile at which to perform chromosome-level trimming.
+    datafile : str
+        File containing the compressed chunks.
+    name : str
+        Name of the dataset.
+    shape : tuple
+        Shape of the dataset.
+    dtype : str
+        Datatype.
+    chunklen : int
+        Number of elements per chunk along the first axis.
+    offsets : list(int)
+        Byte offsets of the chunks in the data file. The last
+        element marks the end of the last chunk.
+    cache : _ChunkCache
+        Cache of decompressed chunks.
     """
-    def __init__(self, percentile):
-        self.percentile = percentile
+    def __init__(self, datafile, name, shape, dtype, chunklen, offsets, cache):
+        self.datafile = datafile
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.chunklen = chunklen
+        self.offsets = offsets
+        self.cache = cache
+        self._raw = None
 
-    def __call__(self, garray):
+    @property
+    def ndim(self):
+        """Number of dimensions"""
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _chunk(self, ichunk):
+        def _load():
+            if self._raw is None:
+                self._raw = np.memmap(self.datafile, dtype='uint8', mode='r')
+            start = ichunk * self.chunklen
+            end = min(start + self.chunklen, self.shape[0])
+            buf = zlib.decompress(
+                self._raw[self.offsets[ichunk]:self.offsets[ichunk + 1]])
+            return np.frombuffer(buf, dtype=self.dtype).reshape(
+                (end - start,) + self.shape[1:])
+        return self.cache.get((self.name, ichunk), _load)
+
+    def _take_range(self, start, end):
+        data = np.empty((max(end - start, 0),) + self.shape[1:], dtype=self.dtype)
+        if end <= start:
+            return data
+        for ichunk in range(start // self.chunklen, (end - 1) // self.chunklen + 1):
+            cstart = ichunk * self.chunklen
+            chunk = self._chunk(ichunk)
+            lo = max(start, cstart)
+            hi = min(end, cstart + chunk.shape[0])
+            data[lo - start:hi - start] = chunk[lo - cstart:hi - cstart]
+        return data
 
-        quants = np.percentile(np.concatenate(np.asarray([garray.handle[chrom] for \
-                                      chrom in garray.handle]), axis=0),
-                               self.percentile, axis=(0, 1))
+    def _take_indices(self, idxs):
+        idxs = np.asarray(idxs)
+        if idxs.dtype == bool:
+            idxs = np.nonzero(idxs)[0]
+        idxs = np.where(idxs < 0, idxs + self.shape[0], idxs)
+        data = np.empty(idxs.shape + self.shape[1:], dtype=self.dtype)
+        ichunks = idxs // self.chunklen
+        for ichunk in np.unique(ichunks):
+            sel = ichunks == ichunk
+            data[sel] = self._chunk(ichunk)[idxs[sel] - ichunk * self.chunklen]
+        return data
 
-        for icond, quant in enumerate(quants):
-            for chrom in garray.handle:
-                arr = garray.handle[chrom][:, :, icond]
-                arr[arr > quant] = quant
-                garray.handle[chrom][:, :, icond] = arr
-        return garray
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        first, rest = key[0], key[1:]
+
+        if isinstance(first, (int, np.integer)):
+            if first < 0:
+                first += self.shape[0]
+            if not 0 <= first < self.shape[0]:
+                raise IndexError('index {} out of bounds for axis 0 with '
+                                 'size {}'.format(first, self.shape[0]))
+            row = self._chunk(first // self.chunklen)[first % self.chunklen]
+            return row[rest] if rest else row.copy()
+
+        if isinstance(first, slice):
+            start, stop, step = first.indices(self.shape[0])
+            if step == 1:
+                data = self._take_range(start, stop)
+            else:
+                data = self._take_indices(np.arange(start, stop, step))
+        else:
+            data = self._take_indices(first)
 
-    def __str__(self):  # pragma: no cover
-        return 'PercentileTrimming({})'.format(self.percentile)
+        if rest:
+            return data[(slice(None),) + rest]
+        return data
 
-    def __repr__(self):  # pragma: no cover
-        return str(self)
+    def __array__(self, dtype=None):
+        data = self[:]
+        return data if dtype is None else data.astype(dtype)
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_raw'] = None
+        return state
 
-class RegionLengthNormalization(object):
-    """ Normalization for variable-region length.
 
-    This class performs region length normalization of a GenomicArray.
-    This is relevant when genomic features are of variable size, e.g.
-    enhancer regions of different width or when using variable length genes.
+class ChunkedGenomicArray(GenomicArray):
+    """ChunkedGenomicArray stores multi-dimensional genomic information.
+
+    Implements GenomicArray.
+    Each chromosome (or the block of regions of interest
+    for store_whole_genome=False) is split into fixed-size chunks
+    along the first axis, which are compressed
+    and stored in the cache directory.
+    Upon access, only the chunks overlapping the query are read
+    and decompressed. Recently used chunks are kept in
+    a bounded least-recently-used cache.
+    This is useful for coverage tracks that are largely composed of
+    zeros or repeated values for which the uncompressed ndarray or hdf5 caches
+    would be unnecessarily large.
 
     Parameters
     ----------
-    regionmask : str or GenomicIndexer, None
-        A bed file or a genomic indexer that contains the masking region
+    gsize : GenomicIndexer or callable
+        GenomicIndexer containing the genome sizes or a callable that
+        returns a GenomicIndexer to enable lazy loading.
+    stranded : bool
+        Consider stranded profiles. Default: True.
+    conditions : list(str) or None
+        List of cell-type or condition labels associated with the corresponding
+        array dimensions. Default: None means a one-dimensional array is produced.
+    typecode : str
+        Datatype. Default: 'd'.
+    datatags : list(str) or None
+        Tags describing the dataset. This is used to store the cache file.
+    resolution : int
+        Resolution for storing the genomic array. Only relevant for the use
+        with Cover Datasets. Default: 1.
+    order : int
+        Order of the alphabet size. Only relevant for Bioseq Datasets. Default: 1.
+    store_whole_genome : boolean
+        Whether to store the entire genome or only the regions of interest.
+        Default: True
+    padding_value : float
+        Padding value. Default: 0.
+    cache : str or None
+        Hash string of the data and parameters to cache the dataset.
+        Caching is required for the chunked format.
+    overwrite : boolean
+        Whether to overwrite the cache. Default: False
+    loader : callable or None
+        Function to be called for loading the genomic array.
+    normalizer : callable or None
+        Normalization to be applied. This argumenet can be None,
+        if no normalization is applied, or a callable that takes
+        a garray and returns a normalized garray.
+        The normalization is applied once when the cache is created.
+        Default: None.
+    collapser : None or callable
+        Method to aggregate values along a given interval.
+    chunk_length : int or None
+        Number of elements along the first axis (positions
+        or regions) per chunk. If None, the chunk length is determined
+        such that a decompressed chunk amounts to about 1 MB.
+        Default: None.
+    chunk_cache_size : int
+        Maximum number of bytes of decompressed chunks
+        to keep in memory. Default: 64 MB.
+    compression_level : int
+        zlib compression level. Default: 1.
+    verbose : boolean
+        Verbosity. Default: False
+    """
+
+    def __init__(self, gsize,  # pylint: disable=too-many-locals
+                 stranded=True,
+                 conditions=None,
+                 typecode='d',
+                 datatags=None,
+                 resolution=1,
+                 order=1,
+                 padding_value=0.0,
+                 store_whole_genome=True,
+                 cache=None,
+                 overwrite=False, loader=None,
+                 normalizer=None, collapser=None,
+                 chunk_length=None,
+                 chunk_cache_size=64 * 2**20,
+                 compression_level=1,
+                 verbose=False):
+
+        super(ChunkedGenomicArray, self).__init__(stranded, conditions, typecode,
+                                                  resolution,
+                                                  order=order,
+                                                  padding_value=padding_value,
+                                                  store_whole_genome=store_whole_genome,
+                                                  collapser=collapser)
+
+        if cache is None:
+            raise ValueError('cache=True required for chunked format')
+
+        gsize_ = None
+
+        if not store_whole_genome:
+            gsize_ = gsize() if callable(gsize) else gsize
+            self._set_region_index(gsize_)
+
+        cachedir = _get_cachefile(cache, datatags, '.chunked')
+
+        if _load_dir_data(cachedir):
+            if gsize_ is None:
+                gsize_ = gsize() if callable(gsize) else gsize
+
+            # the chunks are compressed while the data is assembled,
+            # such that the uncompressed data is never stored on disk.
+            tmpdir = os.path.join(cachedir, 'tmp')
+            if not os.path.exists(tmpdir):
+                os.makedirs(tmpdir)
+            self.handle = OrderedDict()
+            for i, (name, shape) in enumerate(self._dataset_shapes(gsize_)):
+                rowbytes = max(int(np.prod(shape[1:])) *
+                               np.dtype(self.typecode).itemsize, 1)
+                chunklen = chunk_length if chunk_length is not None \
+                    else max(1, 2**20 // rowbytes)
+                self.handle[name] = _ChunkWriter(os.path.join(tmpdir, '{}.bin'.format(i)),
+                                                 shape, self.typecode, chunklen,
+                                                 padding_value, compression_level,
+                                                 chunk_cache_size)
+
+            # invoke the loader
+            if loader:
+                loader(self)
+
+            for norm in normalizer or []:
+                get_normalizer(norm)(self)
+
+            datasets = []
+            with open(os.path.join(cachedir, 'data.bin'), 'wb') as datafile:
+                for name, data in self.handle.items():
+                    datasets.append({'name': name, 'shape': data.shape,
+                                     'chunklen': data.chunklen,
+                                     'offsets': data.finalize(datafile)})
+
+            self.handle = OrderedDict()
+            shutil.rmtree(tmpdir)
+
+            _write_cacheindex(cachedir, {'dtype': np.dtype(self.typecode).str,
+                                         'datasets': datasets})
+
+        if verbose: print('reload {}'.format(cachedir))
+        _touch_cachefile(cachedir)
+        self._cachedir = cachedir
+        self.chunk_cache = _ChunkCache(chunk_cache_size)
+
+        index = _read_cacheindex(cachedir)
+        self.handle = OrderedDict(
+            (dataset['name'],
+             _ChunkedDataset(os.path.join(cachedir, 'data.bin'), dataset['name'],
+                             dataset['shape'], index['dtype'],
+                             dataset['chunklen'], dataset['offsets'],
+                             self.chunk_cache)) for dataset in index['datasets'])
+
+
+class SparseGenomicArray(GenomicArray):
+    """SparseGenomicArray stores multi-dimensional genomic information.
+
+    Implements GenomicArray.
+
+    Parameters
+    ----------
+    gsize : GenomicIndexer or callable
+        GenomicIndexer containing the genome sizes or a callable that
+        returns a GenomicIndexer to enable lazy loading.
+    stranded : bool
+        Consider stranded profiles. Default: True.
+    conditions : list(str) or None
+        List of cell-type or condition labels associated with the corresponding
+        array dimensions. Default: None means a one-dimensional array is produced.
+    typecode : str
+        Datatype. Default: 'd'.
+    datatags : list(str) or None
+        Tags describing the dataset. This is used to store the cache file.
+    resolution : int
+        Resolution for storing the genomic array. Only relevant for the use
+        with Cover Datasets. Default: 1.
+    order : int
+        Order of the alphabet size. Only relevant for Bioseq Datasets. Default: 1.
+    store_whole_genome : boolean
+        Whether to store the entire genome or only the regions of interest.
+        Default: True
+    padding_value : float
+        Padding value. Default: 0.
+    cache : str or None
+        Hash string of the data and parameters to cache the dataset. If None,
+        caching is deactivated. Default: None.
+    overwrite : boolean
+        Whether to overwrite the cache. Default: False
+    loader : callable or None
+        Function to be called for loading the genomic array.
+    normalizer : callable or None
+        Normalization to be applied. This argumenet can be None,
+        if no normalization is applied, or a callable that takes
+        a garray and returns a normalized garray.
+        Default: None.
+    collapser : None or callable
+        Method to aggregate values along a given interval.
+    verbose : boolean
+        Verbosity. Default: False
+    """
+
+    def __init__(self, gsize,  # pylint: disable=too-many-locals
+                 stranded=True,
+                 conditions=None,
+                 typecode='d',
+                 datatags=None,
+                 resolution=1,
+                 order=1,
+                 store_whole_genome=True,
+                 cache=None,
+                 padding_value=0.0,
+                 overwrite=False,
+                 loader=None,
+                 collapser=None,
+                 verbose=False):
+        super(SparseGenomicArray, self).__init__(stranded, conditions,
+                                                 typecode,
+                                                 resolution,
+                                                 order=order,
+                                                 padding_value=padding_value,
+                                                 store_whole_genome=store_whole_genome,
+                                                 collapser=collapser)
+
+        cachefile = _get_cachefile(cache, datatags, '.npz')
+        load_from_file = _load_data(cache, datatags, '.npz')
+
+        gsize_ = None
+
+        if not store_whole_genome:
+
+            gsize_ = gsize() if callable(gsize) else gsize
+
+            self._set_region_index(gsize_)
+
+        if load_from_file:
+            if gsize_ is None:
+                gsize_ = gsize() if callable(gsize) else gsize
+
+            if store_whole_genome:
+                data = {str(region.chrom): _SparseBuilder(
+                    (_get_iv_length(region.length - self.order + 1,
+                                    resolution),
+                     (2 if stranded else 1) * len(self.condition)),
+                    dtype=self.typecode)
+                        for region in gsize_}
+            else:
+                data = {'data': _SparseBuilder(
+                    (len(gsize_),
+                     (_get_iv_length(gsize_.binsize + 2*gsize_.flank - self.order + 1,
+                                     self.resolution) if self.resolution is not None else 1) *
+                     (2 if stranded else 1) * len(self.condition)),
+                    dtype=self.typecode)}
+            self.handle = data
+
+            # invoke the loader
+            if loader:
+                loader(self)
+
+            data = self.handle
+
+            data = {chrom: data[chrom].tocoo() for chrom in data}
+
+            storage = {chrom: np.column_stack([data[chrom].data,
+                                               data[chrom].row,
+                                               data[chrom].col]) \
+                                               for chrom in data}
+            for region in gsize_:
+                if store_whole_genome:
+                    storage[region.chrom + '__length__'] = region.length
+
+            names = [name for name in storage]
+
+            if cachefile is not None:
+                np.savez(cachefile, **storage)
+
+        if cachefile is not None:
+            if verbose: print('reload {}'.format(cachefile))
+            _touch_cachefile(cachefile)
+            storage = np.load(cachefile)
+
+        names = [name for name in storage if '__length__' not in name]
+
+        if store_whole_genome:
+            self.handle = {name: sparse.coo_matrix(
+                (storage[name][:, 0],
+                 (storage[name][:, 1].astype('int'),
+                  storage[name][:, 2].astype('int'))),
+                shape=(_get_iv_length(storage[str(name)+'__length__'], resolution),
+                       (2 if stranded else 1) * len(self.condition))).tocsr()
+                           for name in names}
+        else:
+            # gsize_ is always available for store_whole_genome=False
+            self.handle = {name: sparse.coo_matrix(
+                (storage[name][:, 0],
+                 (storage[name][:, 1].astype('int'),
+                  storage[name][:, 2].astype('int'))),
+                shape=(len(gsize_),
+                       (_get_iv_length(gsize_.binsize + 2*gsize_.flank, resolution)
+                        if self.resolution is not None else 1) *
+                       (2 if stranded else 1) * len(self.condition))).tocsr()
+                           for name in names}
+
+    def _take(self, name, idxs):
+        return self.handle[name][idxs].toarray()
+
+    def _reshape_batch(self, data):
+        nstrands = 2 if self.stranded else 1
+        if self._full_genome_stored:
+            return data.reshape(data.shape[0], nstrands, len(self.condition))
+        return data.reshape(data.shape[0], -1, nstrands, len(self.condition))
+
+    def _reshape(self, data, shape):
+        # what to do with zero padding
+        data = data.toarray()
+
+        if self._full_genome_stored:
+            return data.reshape(data.shape[0], data.shape[1]//(shape[-1]), shape[-1])
+        else:
+            return data.reshape(data.shape[1]//(shape[-2]*shape[-1]), shape[-2], shape[-1])
+
+    def _setitem(self, interval, condition, length, value):
+        if value.ndim == 2:
+            value = value[:, :, None]
+        nconditions = len(self.condition)
+        nstrands = value.shape[1]
+
+        if not self._full_genome_stored:
+            regidx = self.region2index[_iv_to_str(interval.chrom, interval.start, interval.end)]
+            name = 'data'
+        else:
+            ref_start, ref_end, array_start, array_end = self._get_indices(interval,
+                                                                           value.shape[0])
+            value = value[array_start:array_end]
+            name = interval.chrom
+
+        # only positive entries are stored.
+        pos, strand, cond = np.nonzero(value > 0)
+        values = value[pos, strand, cond]
+        if isinstance(condition, (int, np.integer)):
+            cond = np.full_like(cond, condition)
+
+        if not self._full_genome_stored:
+            rows = np.full_like(pos, regidx)
+            cols = pos * nstrands * nconditions + strand * nconditions + cond
+        else:
+            rows = pos + ref_start
+            cols = strand * nconditions + cond
+
+        self.handle[name].add(rows, cols, values)
+
+
+class _SparseBuilder(object):
+    """Accumulates the entries of a sparse matrix.
+
+    Entries are collected as (row, col, value) triplets in numpy
+    buffers and converted to a sparse matrix at once.
+    If an entry is assigned multiple times, the latest value is kept.
+    The buffers are compacted regularly, which keeps the
+    memory consumption bounded by the number of distinct entries.
+
+    Parameters
+    ----------
+    shape : tuple(int)
+        Shape of the sparse matrix.
+    dtype : str
+        Datatype.
+    """
+    def __init__(self, shape, dtype):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self._rows = []
+        self._cols = []
+        self._values = []
+        self._pending = 0
+
+    def add(self, rows, cols, values):
+        """Add entries to the matrix."""
+        self._rows.append(np.asarray(rows, dtype='int64'))
+        self._cols.append(np.asarray(cols, dtype='int64'))
+        self._values.append(np.asarray(values, dtype=self.dtype))
+        self._pending += len(self._values[-1])
+        if self._pending > _SPARSE_COMPACT_SIZE:
+            self._compact()
+
+    def _compact(self):
+        rows = np.concatenate(self._rows) if self._rows else np.zeros(0, dtype='int64')
+        cols = np.concatenate(self._cols) if self._cols else np.zeros(0, dtype='int64')
+        values = np.concatenate(self._values) if self._values \
+            else np.zeros(0, dtype=self.dtype)
+
+        # keep the latest assignment of each entry
+        keys = rows[::-1] * self.shape[1] + cols[::-1]
+        _, last = np.unique(keys, return_index=True)
+        last = len(keys) - 1 - last
+
+        self._rows = [rows[last]]
+        self._cols = [cols[last]]
+        self._values = [values[last]]
+        self._pending = 0
+
+    def tocoo(self):
+        """Convert to coo_matrix."""
+        self._compact()
+        return sparse.coo_matrix((self._values[0], (self._rows[0], self._cols[0])),
+                                 shape=self.shape, dtype=self.dtype)
+
+
+def _run_starts(data, previous=None):
+    """Positions at which a new run of identical rows starts.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        Array whose first axis is run-length encoded.
+    previous : np.ndarray or None
+        Last row preceding data. If None, the first row
+        always starts a new run.
+    """
+    if previous is not None:
+        data = np.concatenate([previous[None], data])
+    axis = tuple(range(1, data.ndim))
+    diff = data[1:] != data[:-1]
+    if np.issubdtype(data.dtype, np.floating):
+        # nan's are considered to be identical
+        diff &= ~(np.isnan(data[1:]) & np.isnan(data[:-1]))
+    starts = np.nonzero(diff.any(axis=axis))[0]
+    if previous is None:
+        return np.concatenate([[0], starts + 1])
+    return starts
+
+
+class _RunLengthDataset(object):
+    """Read-only array-like access to a run-length encoded dataset.
+
+    Consecutive positions with identical values
+    are stored as a single run, described by the start
+    position and the associated values (similar to a bedGraph file).
+    For datasets of regions (store_whole_genome=False),
+    the positions of all regions are concatenated.
+
+    Parameters
+    ----------
+    starts : np.ndarray
+        Sorted start positions of the runs.
+    values : np.ndarray
+        Values of the runs with shape (nruns, strand, condition).
+    shape : tuple
+        Shape of the decoded dataset.
+    """
+    def __init__(self, starts, values, shape):
+        self.starts = starts
+        self.values = values
+        self.shape = tuple(shape)
+        self.dtype = values.dtype
+        # number of positions per element of the first axis
+        self._rowlen = int(np.prod(self.shape[1:-2]))
+
+    @property
+    def ndim(self):
+        """Number of dimensions"""
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _decode_range(self, start, end):
+        """Decode the positions [start, end)."""
+        if end <= start:
+            return np.empty((0,) + self.values.shape[1:], dtype=self.dtype)
+        first = np.searchsorted(self.starts, start, side='right') - 1
+        last = np.searchsorted(self.starts, end, side='left')
+        bounds = np.concatenate([[start], self.starts[first + 1:last], [end]])
+        return np.repeat(self.values[first:last], np.diff(bounds), axis=0)
+
+    def _decode_positions(self, positions):
+        """Decode arbitrary positions."""
+        return self.values[np.searchsorted(self.starts, positions, side='right') - 1]
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        first, rest = key[0], key[1:]
+
+        if isinstance(first, (int, np.integer)):
+            if first < 0:
+                first += self.shape[0]
+            if not 0 <= first < self.shape[0]:
+                raise IndexError('index {} out of bounds for axis 0 with '
+                                 'size {}'.format(first, self.shape[0]))
+            data = self._decode_range(first * self._rowlen, (first + 1) * self._rowlen)
+            data = data.reshape(self.shape[1:])
+            return data[rest] if rest else data
+
+        if isinstance(first, slice) and first.indices(self.shape[0])[2] == 1:
+            start, stop, _ = first.indices(self.shape[0])
+            stop = max(start, stop)
+            data = self._decode_range(start * self._rowlen, stop * self._rowlen)
+            nrows = stop - start
+        else:
+            if isinstance(first, slice):
+                idxs = np.arange(*first.indices(self.shape[0]))
+            else:
+                idxs = np.asarray(first)
+                if idxs.dtype == bool:
+                    idxs = np.nonzero(idxs)[0]
+                idxs = np.where(idxs < 0, idxs + self.shape[0], idxs)
+            positions = (idxs[:, None] * self._rowlen + np.arange(self._rowlen)).ravel()
+            data = self._decode_positions(positions)
+            nrows = len(idxs)
+
+        data = data.reshape((nrows,) + self.shape[1:])
+        if rest:
+            return data[(slice(None),) + rest]
+        return data
+
+    def __array__(self, dtype=None):
+        data = self[:]
+        return data if dtype is None else data.astype(dtype)
+
+
+class _RunLengthWriter(_ChunkWriter):
+    """Writable array-like access for assembling a run-length encoded dataset.
+
+    Similar to :class:`_ChunkWriter`, the chunks are kept
+    decoded in memory while they are written, but the least recently
+    used ones are run-length encoded in memory rather than
+    compressed to a temporary file.
+    Chunks that are never written consist of a single run of the padding value.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape of the dataset.
+    dtype : str
+        Datatype.
+    chunklen : int
+        Number of elements per chunk along the first axis.
+    padding_value : float
+        Padding value.
+    maxbytes : int
+        Maximum number of bytes of decoded chunks
+        that are kept in memory.
+    """
+    def __init__(self, shape, dtype, chunklen, padding_value, maxbytes):
+        super(_RunLengthWriter, self).__init__(None, shape, dtype, chunklen,
+                                               padding_value, None, maxbytes)
+        # number of positions per element of the first axis
+        self._rowlen = int(np.prod(self.shape[1:-2]))
+
+    def _runs(self, data):
+        """Run-length encode the positions of a chunk."""
+        data = data.reshape((-1,) + self.shape[-2:])
+        starts = _run_starts(data)
+        return starts, data[starts]
+
+    def _store(self, ichunk, data):
+        self._stored[ichunk] = self._runs(data)
+
+    def _restore(self, ichunk):
+        starts, values = self._stored[ichunk]
+        length = self._chunklength(ichunk)
+        bounds = np.concatenate([starts, [length * self._rowlen]])
+        return np.repeat(values, np.diff(bounds), axis=0).reshape(
+            (length,) + self.shape[1:])
+
+    def finalize(self):
+        """Concatenates the runs of all chunks.
+
+        Returns
+        -------
+        tuple(np.ndarray, np.ndarray)
+            Start positions and values of the runs.
+        """
+        starts = []
+        values = []
+        previous = None
+        for ichunk in range(-(-self.shape[0] // self.chunklen)):
+            if ichunk in self._chunks:
+                cstarts, cvalues = self._runs(self._chunks.pop(ichunk))
+            elif ichunk in self._stored:
+                cstarts, cvalues = self._stored.pop(ichunk)
+            else:
+                cstarts = np.zeros(1, dtype='int64')
+                cvalues = np.full((1,) + self.shape[-2:], self.padding_value,
+                                  dtype=self.dtype)
+            if previous is not None and not len(_run_starts(cvalues[:1], previous)):
+                # the first run continues the last run of the preceding chunk
+                cstarts, cvalues = cstarts[1:], cvalues[1:]
+            if len(cvalues):
+                previous = cvalues[-1]
+            starts.append(cstarts + ichunk * self.chunklen * self._rowlen)
+            values.append(cvalues)
+        self.nbytes = 0
+        if not starts:
+            return np.zeros(0, dtype='int64'), np.zeros((0,) + self.shape[-2:],
+                                                         dtype=self.dtype)
+        return np.concatenate(starts).astype('int64'), np.concatenate(values)
+
+
+class RunLengthGenomicArray(GenomicArray):
+    """RunLengthGenomicArray stores multi-dimensional genomic information.
+
+    Implements GenomicArray.
+    The data is stored as run-length encoded arrays in memory,
+    i.e. sorted start positions of the runs of identical values
+    together with the associated values.
+    Upon access, only the requested window is decoded.
+    This is useful for piecewise constant signals, e.g. labels obtained from
+    BED files or bigwig tracks that consist of long runs of identical values.
+
+    Parameters
+    ----------
+    gsize : GenomicIndexer or callable
+        GenomicIndexer containing the genome sizes or a callable that
+        returns a GenomicIndexer to enable lazy loading.
+    stranded : bool
+        Consider stranded profiles. Default: True.
+    conditions : list(str) or None
+        List of cell-type or condition labels associated with the corresponding
+        array dimensions. Default: None means a one-dimensional array is produced.
+    typecode : str
+        Datatype. Default: 'd'.
+    datatags : list(str) or None
+        Tags describing the dataset. This is used to store the cache file.
+    resolution : int
+        Resolution for storing the genomic array. Only relevant for the use
+        with Cover Datasets. Default: 1.
+    order : int
+        Order of the alphabet size. Only relevant for Bioseq Datasets. Default: 1.
+    store_whole_genome : boolean
+        Whether to store the entire genome or only the regions of interest.
+        Default: True
+    padding_value : float
+        Padding value. Default: 0.
+    cache : str or None
+        Hash string of the data and parameters to cache the dataset. If None,
+        caching is deactivated. Default: None.
+    overwrite : boolean
+        Whether to overwrite the cache. Default: False
+    loader : callable or None
+        Function to be called for loading the genomic array.
+    normalizer : callable or None
+        Normalization to be applied. This argumenet can be None,
+        if no normalization is applied, or a callable that takes
+        a garray and returns a normalized garray.
+        The normalization is applied before the data is encoded.
+        Default: None.
+    collapser : None or callable
+        Method to aggregate values along a given interval.
+    verbose : boolean
+        Verbosity. Default: False
+    """
+
+    def __init__(self, gsize,  # pylint: disable=too-many-locals
+                 stranded=True,
+                 conditions=None,
+                 typecode='d',
+                 datatags=None,
+                 resolution=1,
+                 order=1,
+                 padding_value=0.0,
+                 store_whole_genome=True,
+                 cache=None,
+                 overwrite=False, loader=None,
+                 normalizer=None, collapser=None,
+                 verbose=False):
+
+        super(RunLengthGenomicArray, self).__init__(stranded, conditions, typecode,
+                                                    resolution,
+                                                    order=order,
+                                                    padding_value=padding_value,
+                                                    store_whole_genome=store_whole_genome,
+                                                    collapser=collapser)
+
+        gsize_ = None
+
+        if not store_whole_genome:
+            gsize_ = gsize() if callable(gsize) else gsize
+            self._set_region_index(gsize_)
+
+        cachefile = _get_cachefile(cache, datatags, '.rle.npz')
+        load_from_file = _load_data(cache, datatags, '.rle.npz')
+
+        if load_from_file:
+            if gsize_ is None:
+                gsize_ = gsize() if callable(gsize) else gsize
+
+            # the chunks are run-length encoded while the data is assembled,
+            # such that at most _BLOCK_BYTES of the data are kept decoded.
+            self.handle = OrderedDict()
+            for name, shape in self._dataset_shapes(gsize_):
+                rowbytes = max(int(np.prod(shape[1:])) *
+                               np.dtype(self.typecode).itemsize, 1)
+                self.handle[name] = _RunLengthWriter(shape, self.typecode,
+                                                     max(1, 2**20 // rowbytes),
+                                                     padding_value, _BLOCK_BYTES)
+
+            # invoke the loader
+            if loader:
+                loader(self)
+
+            for norm in normalizer or []:
+                get_normalizer(norm)(self)
+
+            storage = OrderedDict()
+            for name, data in self.handle.items():
+                starts, values = data.finalize()
+                storage[name + '__starts__'] = starts
+                storage[name + '__values__'] = values
+                storage[name + '__shape__'] = np.asarray(data.shape)
+            self.handle = OrderedDict()
+
+            if cachefile is not None:
+                np.savez(cachefile, **storage)
+
+        if cachefile is not None:
+            if verbose: print('reload {}'.format(cachefile))
+            _touch_cachefile(cachefile)
+            storage = np.load(cachefile)
+
+        names = [name[:-len('__shape__')] for name in storage
+                 if name.endswith('__shape__')]
+        self.handle = OrderedDict(
+            (name, _RunLengthDataset(storage[name + '__starts__'],
+                                     storage[name + '__values__'],
+                                     storage[name + '__shape__'])) for name in names)
+
+
+class _PackedDataset(object):
+    """Array-like access to a dataset of 2-bit packed letter indices.
+
+    Each element takes a value between 0 and 3 (e.g. the index of
+    a nucleotide), four of which are packed into a single byte.
+    Elements with values outside of this range (e.g. 'N')
+    are recorded in a separate mask of runs of consecutive positions
+    and are decoded as the padding value.
+    For datasets of regions (store_whole_genome=False),
+    the positions of all regions are concatenated.
+
+    Parameters
+    ----------
+    packed : np.ndarray
+        uint8 array containing four elements per byte.
+    mask_starts : np.ndarray
+        Sorted start positions of the masked runs.
+    mask_ends : np.ndarray
+        End positions of the masked runs.
+    shape : tuple
+        Shape of the decoded dataset. All but the first two
+        dimensions must be of length one.
+    dtype : str
+        Datatype of the decoded dataset.
+    padding_value : int
+        Value of the masked elements.
+    """
+    def __init__(self, packed, mask_starts, mask_ends, shape, dtype,
+                 padding_value):
+        self.packed = packed
+        self.mask_starts = mask_starts
+        self.mask_ends = mask_ends
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.padding_value = padding_value
+        # number of positions per element of the first axis
+        self._rowlen = int(np.prod(self.shape[1:]))
+
+    @classmethod
+    def empty(cls, shape, dtype, padding_value):
+        """Create a dataset in which all elements are masked."""
+        size = int(np.prod(shape))
+        return cls(np.zeros((size + 3) // 4, dtype='uint8'),
+                   np.asarray([0] if size else [], dtype='int64'),
+                   np.asarray([size] if size else [], dtype='int64'),
+                   shape, dtype, padding_value)
+
+    @property
+    def ndim(self):
+        """Number of dimensions"""
+        return len(self.shape)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _masked(self, positions):
+        irun = np.searchsorted(self.mask_starts, positions, side='right') - 1
+        return (irun >= 0) & (positions < self.mask_ends[np.maximum(irun, 0)])
+
+    def _decode_positions(self, positions):
+        """Decode arbitrary positions."""
+        positions = np.asarray(positions, dtype='int64')
+        data = ((self.packed[positions // 4] >> (2 * (positions % 4)).astype('uint8'))
+                & 3).astype(self.dtype)
+        if len(self.mask_starts):
+            data[self._masked(positions)] = self.padding_value
+        return data
+
+    def _decode_range(self, start, end):
+        """Decode the positions [start, end)."""
+        if end <= start:
+            return np.empty(0, dtype=self.dtype)
+        bytes_ = self.packed[start // 4:(end + 3) // 4]
+        data = ((bytes_[:, None] >> np.asarray([0, 2, 4, 6], dtype='uint8')) & 3).ravel()
+        data = data[start % 4:start % 4 + end - start].astype(self.dtype)
+
+        first = np.searchsorted(self.mask_ends, start, side='right')
+        last = np.searchsorted(self.mask_starts, end, side='left')
+        for mstart, mend in zip(self.mask_starts[first:last], self.mask_ends[first:last]):
+            data[max(mstart, start) - start:min(mend, end) - start] = self.padding_value
+        return data
+
+    def _encode_range(self, start, values):
+        """Encode values at the positions [start, start + len(values))."""
+        end = start + len(values)
+        valid = (values >= 0) & (values < 4)
+        codes = np.where(valid, values, 0).astype('uint8')
+
+        # positions sharing a byte with positions outside of the range
+        # are set one by one.
+        head = min(end, -(-start // 4) * 4)
+        tail = max(head, end // 4 * 4)
+        for pos in list(range(start, head)) + list(range(tail, end)):
+            shift = 2 * (pos % 4)
+            self.packed[pos // 4] = (self.packed[pos // 4] & ~np.uint8(3 << shift)) | \
+                (codes[pos - start] << shift)
+        body = codes[head - start:tail - start].reshape(-1, 4)
+        self.packed[head // 4:tail // 4] = body[:, 0] | (body[:, 1] << 2) | \
+            (body[:, 2] << 4) | (body[:, 3] << 6)
+
+        # update the mask of non-letter elements
+        left = self.mask_starts < start
+        right = self.mask_ends > end
+        mstarts = [self.mask_starts[left], np.maximum(self.mask_starts[right], end)]
+        mends = [np.minimum(self.mask_ends[left], start), self.mask_ends[right]]
+        change = np.diff(np.concatenate([[False], ~valid, [False]]).astype('int8'))
+        mstarts.append(np.nonzero(change == 1)[0] + start)
+        mends.append(np.nonzero(change == -1)[0] + start)
+        mstarts = np.concatenate(mstarts).astype('int64')
+        mends = np.concatenate(mends).astype('int64')
+        order = np.argsort(mstarts, kind='mergesort')
+        self.mask_starts, self.mask_ends = mstarts[order], mends[order]
+
+    def _positions(self, key):
+        """Flat start position and length addressed by a key."""
+        if not isinstance(key, tuple):
+            key = (key,)
+        first = key[0]
+        second = key[1] if self.ndim > 3 and len(key) > 1 else slice(None)
+        if isinstance(first, (int, np.integer)):
+            first = slice(first, first + 1)
+        if not isinstance(first, slice) or not isinstance(second, slice):
+            raise IndexError('Unsupported index for packed dataset: {}'.format(key))
+        rstart, rstop, rstep = first.indices(self.shape[0])
+        if rstep != 1:
+            raise IndexError('Unsupported index for packed dataset: {}'.format(key))
+        if self.ndim > 3:
+            if rstop - rstart != 1:
+                raise IndexError('Only a single region can be set at once.')
+            pstart, pstop, _ = second.indices(self.shape[1])
+            return rstart * self._rowlen + pstart, pstop - pstart
+        return rstart * self._rowlen, (rstop - rstart) * self._rowlen
+
+    def __setitem__(self, key, value):
+        start, length = self._positions(key)
+        value = np.asarray(value).ravel()
+        if value.size == 1:
+            value = np.repeat(value, length)
+        self._encode_range(start, value)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        first, rest = key[0], key[1:]
+
+        if isinstance(first, (int, np.integer)):
+            if first < 0:
+                first += self.shape[0]
+            if not 0 <= first < self.shape[0]:
+                raise IndexError('index {} out of bounds for axis 0 with '
+                                 'size {}'.format(first, self.shape[0]))
+            data = self._decode_range(first * self._rowlen, (first + 1) * self._rowlen)
+            data = data.reshape(self.shape[1:])
+            return data[rest] if rest else data
+
+        if isinstance(first, slice) and first.indices(self.shape[0])[2] == 1:
+            start, stop, _ = first.indices(self.shape[0])
+            stop = max(start, stop)
+            data = self._decode_range(start * self._rowlen, stop * self._rowlen)
+            nrows = stop - start
+        else:
+            if isinstance(first, slice):
+                idxs = np.arange(*first.indices(self.shape[0]))
+            else:
+                idxs = np.asarray(first)
+                if idxs.dtype == bool:
+                    idxs = np.nonzero(idxs)[0]
+                idxs = np.where(idxs < 0, idxs + self.shape[0], idxs)
+            positions = (idxs[:, None] * self._rowlen + np.arange(self._rowlen)).ravel()
+            data = self._decode_positions(positions)
+            nrows = len(idxs)
+
+        data = data.reshape((nrows,) + self.shape[1:])
+        if rest:
+            return data[(slice(None),) + rest]
+        return data
+
+    def __array__(self, dtype=None):
+        data = self[:]
+        return data if dtype is None else data.astype(dtype)
+
+
+class PackedGenomicArray(GenomicArray):
+    """PackedGenomicArray stores letter indices of biological sequences.
+
+    Implements GenomicArray.
+    The data is stored with two bits per position in memory,
+    which reduces the memory consumption of a nucleotide sequence
+    sixteen-fold compared to an int32 array.
+    Positions that do not correspond to one of the four letters,
+    e.g. 'N', are kept in a separate mask of runs of consecutive positions
+    and are decoded as the padding value.
+    Upon access, only the requested window is decoded.
+    This storage is only applicable to unstranded data with a single
+    condition whose values are letter indices between 0 and 3.
+
+    Parameters
+    ----------
+    gsize : GenomicIndexer or callable
+        GenomicIndexer containing the genome sizes or a callable that
+        returns a GenomicIndexer to enable lazy loading.
+    stranded : bool
+        Consider stranded profiles. Must be False.
+    conditions : list(str) or None
+        List of cell-type or condition labels associated with the corresponding
+        array dimensions. At most one condition is supported.
+        Default: None means a one-dimensional array is produced.
+    typecode : str
+        Datatype of the decoded data. Default: 'int32'.
+    datatags : list(str) or None
+        Tags describing the dataset. This is used to store the cache file.
+    resolution : int
+        Resolution for storing the genomic array. Must be 1.
+    order : int
+        Order of the alphabet size. Must be 1. Default: 1.
+    store_whole_genome : boolean
+        Whether to store the entire genome or only the regions of interest.
+        Default: True
+    padding_value : int
+        Padding value, which is also used for the masked positions. Default: 0.
+    cache : str or None
+        Hash string of the data and parameters to cache the dataset. If None,
+        caching is deactivated. Default: None.
+    overwrite : boolean
+        Whether to overwrite the cache. Default: False
+    loader : callable or None
+        Function to be called for loading the genomic array.
+    normalizer : callable or None
+        Normalization is not supported for the packed storage.
+    collapser : None or callable
+        Method to aggregate values along a given interval.
+    verbose : boolean
+        Verbosity. Default: False
+    """
+
+    def __init__(self, gsize,  # pylint: disable=too-many-locals
+                 stranded=False,
+                 conditions=None,
+                 typecode='int32',
+                 datatags=None,
+                 resolution=1,
+                 order=1,
+                 padding_value=0,
+                 store_whole_genome=True,
+                 cache=None,
+                 overwrite=False, loader=None,
+                 normalizer=None, collapser=None,
+                 verbose=False):
+
+        super(PackedGenomicArray, self).__init__(stranded, conditions, typecode,
+                                                 resolution,
+                                                 order=order,
+                                                 padding_value=padding_value,
+                                                 store_whole_genome=store_whole_genome,
+                                                 collapser=collapser)
+
+        if stranded or len(self.condition) > 1 or resolution != 1 or order != 1:
+            raise ValueError('The packed storage requires unstranded data '
+                             'with a single condition, resolution=1 and order=1.')
+        if normalizer:
+            raise ValueError('Normalization is not supported for the packed storage.')
+
+        gsize_ = None
+
+        if not store_whole_genome:
+            gsize_ = gsize() if callable(gsize) else gsize
+            self._set_region_index(gsize_)
+
+        cachefile = _get_cachefile(cache, datatags, '.packed.npz')
+        load_from_file = _load_data(cache, datatags, '.packed.npz')
+
+        if load_from_file:
+            if gsize_ is None:
+                gsize_ = gsize() if callable(gsize) else gsize
+
+            self.handle = OrderedDict(
+                (name, _PackedDataset.empty(shape, self.typecode, padding_value))
+                for name, shape in self._dataset_shapes(gsize_))
+
+            # invoke the loader
+            if loader:
+                loader(self)
+
+            if cachefile is not None:
+                storage = OrderedDict()
+                for name, data in self.handle.items():
+                    storage[name + '__packed__'] = data.packed
+                    storage[name + '__mstarts__'] = data.mask_starts
+                    storage[name + '__mends__'] = data.mask_ends
+                    storage[name + '__shape__'] = np.asarray(data.shape)
+                np.savez(cachefile, **storage)
+
+        if cachefile is not None:
+            if verbose: print('reload {}'.format(cachefile))
+            _touch_cachefile(cachefile)
+            storage = np.load(cachefile)
+
+            names = [name[:-len('__shape__')] for name in storage
+                     if name.endswith('__shape__')]
+            self.handle = OrderedDict(
+                (name, _PackedDataset(storage[name + '__packed__'],
+                                      storage[name + '__mstarts__'],
+                                      storage[name + '__mends__'],
+                                      storage[name + '__shape__'],
+                                      self.typecode, padding_value)) for name in names)
+
+
+class PercentileTrimming(object):
+    """Percentile trimming normalization.
+
+    This class performs percentile trimming of a GenomicArray to aleviate
+    the effect of outliers.
+    All values that exceed the value associated with the given percentile
+    are set to be equal to the percentile.
+
+    Parameters
+    ----------
+    percentile : float
+        Percentile at which to perform chromosome-level trimming.
+    """
+    def __init__(self, percentile):
+        self.percentile = percentile
+
+    def __call__(self, garray):
+
+        quants = garray.percentile(self.percentile)
+
+        for chrom in garray.handle:
+            for block in garray._blocks(chrom):
+                arr = garray.handle[chrom][block]
+                garray.handle[chrom][block] = np.where(arr > quants, quants, arr)
+        return garray
+
+    def __str__(self):  # pragma: no cover
+        return 'PercentileTrimming({})'.format(self.percentile)
+
+    def __repr__(self):  # pragma: no cover
+        return str(self)
+
+
+class RegionLengthNormalization(object):
+    """ Normalization for variable-region length.
+
+    This class performs region length normalization of a GenomicArray.
+    This is relevant when genomic features are of variable size, e.g.
+    enhancer regions of different width or when using variable length genes.
+
+    Parameters
+    ----------
+    regionmask : str or GenomicIndexer, None
+        A bed file or a genomic indexer that contains the masking region
         that is considered for the signal. For instance, when normalizing
         gene expression to TPM, the mask contains exons. Otherwise, the
         TPM would normalize for the full length gene annotation.
@@ -995,7 +2866,8 @@ class LogTransform(object):
     def __call__(self, garray):
 
         for chrom in garray.handle:
-            garray.handle[chrom][:] = np.log(garray.handle[chrom][:] + 1.)
+            for block in garray._blocks(chrom):
+                garray.handle[chrom][block] = np.log(garray.handle[chrom][block] + 1.)
         return garray
 
     def __str__(self):  # pragma: no cover
@@ -1090,6 +2962,7 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
                          datatags=None, cache=None, overwrite=False,
                          loader=None,
                          normalizer=None, collapser=None,
+                         storage_options=None,
                          verbose=False):
     """Factory function for creating a GenomicArray.
 
@@ -1108,16 +2981,33 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
     typecode : str
         Datatype. Default: 'float32'.
     storage : str
-        Storage type can be 'ndarray', 'hdf5' or 'sparse'.
+        Storage type can be 'ndarray', 'hdf5', 'memmap', 'chunked',
+        'runlength', 'sparse' or 'packed'.
         Numpy loads the entire dataset into the memory. HDF5 keeps
         the data on disk and loads the mini-batches from disk.
+        Memmap stores each chromosome in a separate .npy file which is
+        reopened as a read-only memory map.
+        Chunked stores the data as compressed chunks on disk
+        and decompresses the chunks overlapping a query on demand.
+        Runlength maintains the dataset as runs of identical values
+        in the memory.
         Sparse maintains sparse matrix representation of the dataset
         in the memory.
+        Packed stores letter indices of nucleotide sequences with two bits
+        per position in the memory.
         Usage of numpy will require high memory consumption, but allows fast
         slicing operations on the dataset. HDF5 requires low memory consumption,
         but fetching the data from disk might be time consuming.
+        memmap starts up quickly and only keeps the regions in memory
+        that are actually accessed, which can also be shared across processes.
+        chunked reduces the size of the cache on disk and the amount
+        of I/O for coverage tracks that are dominated by zeros or
+        long runs of identical values.
+        runlength is most suitable for piecewise constant signals,
+        such as labels derived from BED files.
         sparse will be a good compromise if the data is indeed sparse. In this
         case, memory consumption will be low while slicing will still be fast.
+        packed is only applicable to nucleotide sequences.
     datatags : list(str) or None
         Tags describing the dataset. This is used to store the cache file.
     resolution : int
@@ -1145,6 +3035,10 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
     collapser : str, callable or None
         Collapse method defines how the signal is aggregated for resolution>1 or resolution=None.
         For example, by summing the signal over a given interval.
+    storage_options : dict or None
+        Additional keyword arguments that are specific to the storage type.
+        For example, chunk_length, compression or chunk_cache_size
+        for storage='hdf5'. Default: None.
     verbose : boolean
         Verbosity. Default: False
     """
@@ -1159,6 +3053,8 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
               'with resolution=None. store_whole_genome=False is used instead.')
         store_whole_genome = False
 
+    storage_options = storage_options or {}
+
     if storage == 'hdf5':
         return HDF5GenomicArray(chroms, stranded=stranded,
                                 conditions=conditions,
@@ -1173,7 +3069,8 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
                                 loader=loader,
                                 normalizer=normalizer,
                                 collapser=get_collapser(collapser),
-                                verbose=verbose)
+                                verbose=verbose,
+                                **storage_options)
     elif storage == 'ndarray':
         return NPGenomicArray(chroms, stranded=stranded,
                               conditions=conditions,
@@ -1188,7 +3085,56 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
                               loader=loader,
                               normalizer=normalizer,
                               collapser=get_collapser(collapser),
-                              verbose=verbose)
+                              verbose=verbose,
+                              **storage_options)
+    elif storage == 'memmap':
+        return MemmapGenomicArray(chroms, stranded=stranded,
+                                  conditions=conditions,
+                                  typecode=typecode,
+                                  datatags=datatags,
+                                  resolution=resolution,
+                                  order=order,
+                                  store_whole_genome=store_whole_genome,
+                                  cache=cache,
+                                  padding_value=padding_value,
+                                  overwrite=overwrite,
+                                  loader=loader,
+                                  normalizer=normalizer,
+                                  collapser=get_collapser(collapser),
+                                  verbose=verbose,
+                                  **storage_options)
+    elif storage == 'chunked':
+        return ChunkedGenomicArray(chroms, stranded=stranded,
+                                   conditions=conditions,
+                                   typecode=typecode,
+                                   datatags=datatags,
+                                   resolution=resolution,
+                                   order=order,
+                                   store_whole_genome=store_whole_genome,
+                                   cache=cache,
+                                   padding_value=padding_value,
+                                   overwrite=overwrite,
+                                   loader=loader,
+                                   normalizer=normalizer,
+                                   collapser=get_collapser(collapser),
+                                   verbose=verbose,
+                                   **storage_options)
+    elif storage == 'runlength':
+        return RunLengthGenomicArray(chroms, stranded=stranded,
+                                     conditions=conditions,
+                                     typecode=typecode,
+                                     datatags=datatags,
+                                     resolution=resolution,
+                                     order=order,
+                                     store_whole_genome=store_whole_genome,
+                                     cache=cache,
+                                     padding_value=padding_value,
+                                     overwrite=overwrite,
+                                     loader=loader,
+                                     normalizer=normalizer,
+                                     collapser=get_collapser(collapser),
+                                     verbose=verbose,
+                                     **storage_options)
     elif storage == 'sparse':
         return SparseGenomicArray(chroms, stranded=stranded,
                                   conditions=conditions,
@@ -1202,6 +3148,25 @@ def create_genomic_array(chroms, stranded=True, conditions=None, typecode='float
                                   overwrite=overwrite,
                                   loader=loader,
                                   collapser=get_collapser(collapser),
-                                  verbose=verbose)
+                                  verbose=verbose,
+                                  **storage_options)
+
+    elif storage == 'packed':
+        return PackedGenomicArray(chroms, stranded=stranded,
+                                  conditions=conditions,
+                                  typecode=typecode,
+                                  datatags=datatags,
+                                  resolution=resolution,
+                                  order=order,
+                                  store_whole_genome=store_whole_genome,
+                                  cache=cache,
+                                  padding_value=padding_value,
+                                  overwrite=overwrite,
+                                  loader=loader,
+                                  normalizer=normalizer,
+                                  collapser=get_collapser(collapser),
+                                  verbose=verbose,
+                                  **storage_options)
 
-    raise Exception("Storage type must be 'hdf5', 'ndarray' or 'sparse'")
+    raise Exception("Storage type must be 'hdf5', 'ndarray', 'memmap', "
+                    "'chunked', 'runlength', 'sparse' or 'packed'")
@@ -0,0 +1,149 @@
+"""Interval algebra on columnar interval arrays.
+
+The functions in this module operate on intervals
+that are represented as a tuple of arrays (chroms, starts, ends)
+with zero-based, half-open coordinates. Additional arrays (e.g. strands)
+may be appended to the tuple. They are ignored by all operations
+except for :func:`sort`.
+
+In contrast to bedtools, the operations are carried out
+in-process without writing temporary files.
+"""
+
+import numpy as np
+
+
+def _linearize(*intervals, distance=0):
+    """Place the intervals of all chromosomes on a common axis.
+
+    The chromosomes are concatenated in lexicographic order
+    with a spacer, such that intervals on different chromosomes
+    neither overlap nor become adjacent.
+
+    Returns
+    -------
+    tuple
+        Sorted chromosome names, the span per chromosome
+        and (starts, ends) arrays for each intervals argument.
+    """
+    chroms = [np.asarray(interval[0]).astype(str) for interval in intervals]
+    names, codes = np.unique(np.concatenate(chroms), return_inverse=True)
+    span = max([int(np.max(interval[2], initial=0)) for interval in intervals]) \
+        + distance + 1
+
+    linear = []
+    offset = 0
+    for chrom, interval in zip(chroms, intervals):
+        code = codes[offset:offset + len(chrom)].astype('int64')
+        offset += len(chrom)
+        linear.append((np.asarray(interval[1], dtype='int64') + code * span,
+                       np.asarray(interval[2], dtype='int64') + code * span))
+    return names, span, linear
+
+
+def sort(intervals):
+    """Sort intervals by chromosome, start and end.
+
+    Chromosomes are ordered lexicographically as with
+    :code:`bedtools sort`.
+
+    Parameters
+    ----------
+    intervals : tuple(np.ndarray)
+        Intervals (chroms, starts, ends, ...).
+
+    Returns
+    -------
+    tuple(np.ndarray)
+        Sorted intervals including all additional arrays.
+    """
+    order = np.lexsort((np.asarray(intervals[2]), np.asarray(intervals[1]),
+                        np.asarray(intervals[0]).astype(str)))
+    return tuple(np.asarray(array)[order] for array in intervals)
+
+
+def merge(intervals, distance=0):
+    """Merge overlapping intervals.
+
+    Parameters
+    ----------
+    intervals : tuple(np.ndarray)
+        Intervals (chroms, starts, ends).
+    distance : int
+        Intervals that are separated by at most distance base pairs
+        are merged as well. Default: 0.
+
+    Returns
+    -------
+    tuple(np.ndarray)
+        Merged intervals (chroms, starts, ends), sorted by
+        chromosome and start.
+    """
+    if not len(intervals[1]):
+        return (np.zeros(0, dtype=str), np.zeros(0, dtype='int64'),
+                np.zeros(0, dtype='int64'))
+    names, span, ((starts, ends),) = _linearize(intervals, distance=distance)
+
+    order = np.argsort(starts, kind='stable')
+    starts = starts[order]
+    ends = np.maximum.accumulate(ends[order])
+    # a new block begins where an interval does not reach
+    # the maximum end of all preceding intervals.
+    newblock = np.ones(len(starts), dtype='bool')
+    newblock[1:] = starts[1:] > ends[:-1] + distance
+    bstarts = starts[newblock]
+    bends = ends[np.append(np.where(newblock)[0][1:] - 1, len(ends) - 1)]
+    codes = bstarts // span
+    return names[codes], bstarts - codes * span, bends - codes * span
+
+
+def intersect(a, b, unique=False):
+    """Find the overlapping intervals between a and b.
+
+    Parameters
+    ----------
+    a : tuple(np.ndarray)
+        Intervals (chroms, starts, ends).
+    b : tuple(np.ndarray)
+        Intervals (chroms, starts, ends).
+    unique : boolean
+        If True, only the indices of the intervals in a
+        that overlap with any interval in b are reported
+        (as with :code:`bedtools intersect -u`). Default: False.
+
+    Returns
+    -------
+    tuple(np.ndarray, np.ndarray) or np.ndarray
+        Index pairs (ia, ib) of all overlapping intervals, ordered by ia
+        and ib, or the indices ia if unique=True.
+    """
+    if not len(a[1]) or not len(b[1]):
+        empty = np.zeros(0, dtype='int64')
+        return empty if unique else (empty, empty)
+    _, _, ((astarts, aends), (bstarts, bends)) = _linearize(a, b)
+
+    order = np.argsort(bstarts, kind='stable')
+    bstarts = bstarts[order]
+    bends = bends[order]
+
+    if unique:
+        # maximum end among all intervals starting before a given position
+        maxends = np.maximum.accumulate(bends)
+        nbefore = np.searchsorted(bstarts, aends, side='left')
+        return np.where((nbefore > 0) &
+                        (maxends[np.maximum(nbefore - 1, 0)] > astarts))[0]
+
+    # candidates start within the maximum interval length
+    # before the start of an interval in a.
+    maxlength = int(np.max(bends - bstarts))
+    first = np.searchsorted(bstarts, astarts - maxlength, side='right')
+    last = np.searchsorted(bstarts, aends, side='left')
+    counts = np.maximum(last - first, 0)
+    ia = np.repeat(np.arange(len(astarts)), counts)
+    ib = np.repeat(first - np.cumsum(counts) + counts, counts) + \
+        np.arange(counts.sum())
+    keep = bends[ib] > astarts[ia]
+    ia, ib = ia[keep], order[ib[keep]]
+    pairs = np.lexsort((ib, ia))
+    return ia[pairs], ib[pairs]
+
@@ -0,0 +1,149 @@
+"""janggu-cache dataset cache management utility."""
+
+import argparse
+import json
+import os
+import time
+
+import h5py
+import numpy as np
+
+from janggu.data.cache import INDEXFILE
+from janggu.data.cache import find_cache_entry
+from janggu.data.cache import get_cache_max_size
+from janggu.data.cache import list_cache_entries
+from janggu.data.cache import parse_size
+from janggu.data.cache import pin_cache_entry
+from janggu.data.cache import prune_cache
+
+
+def _format_size(size):
+    """Human readable size."""
+    for unit in ['B', 'K', 'M', 'G']:
+        if size < 1024:
+            return '{:.1f}{}'.format(size, unit) if unit != 'B' \
+                else '{}{}'.format(size, unit)
+        size /= 1024.
+    return '{:.1f}T'.format(size)
+
+
+def _format_time(timestamp):
+    """Human readable time."""
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+
+def _datasets(path):
+    """Names and shapes of the datasets contained in a cache entry."""
+    if path.endswith('.h5'):
+        with h5py.File(path, 'r') as h5file:
+            return [(name, h5file[name].shape) for name in h5file]
+    if path.endswith('.npz'):
+        with np.load(path) as storage:
+            return [(name, storage[name].shape) for name in storage.files]
+    indexfile = os.path.join(path, INDEXFILE)
+    if not os.path.exists(indexfile):
+        # the entry was not completely written
+        return []
+    with open(indexfile, 'r') as file_:
+        index = json.load(file_)
+    if 'datasets' in index:
+        return [(dataset['name'], tuple(dataset['shape']))
+                for dataset in index['datasets']]
+    return [(name, np.load(os.path.join(path, filename), mmap_mode='r').shape)
+            for name, filename in index['files']]
+
+
+def list_entries(args):
+    """Lists the cache entries."""
+    entries = list_cache_entries()
+    for entry in entries:
+        print('{}\t{}\t{}\t{}'.format(_format_time(entry['accessed']),
+                                      _format_size(entry['size']),
+                                      'pinned' if entry['pinned'] else '-',
+                                      entry['name']))
+    max_size = get_cache_max_size()
+    print('{} entries, {} in total{}'.format(
+        len(entries), _format_size(sum(entry['size'] for entry in entries)),
+        ' (budget: {})'.format(_format_size(max_size)) if max_size is not None else ''))
+
+
+def inspect_entry(args):
+    """Shows the details of a cache entry."""
+    entry = find_cache_entry(args.entry)
+    print('name:     {}'.format(entry['name']))
+    print('path:     {}'.format(entry['path']))
+    print('size:     {}'.format(_format_size(entry['size'])))
+    print('accessed: {}'.format(_format_time(entry['accessed'])))
+    print('pinned:   {}'.format(entry['pinned']))
+    for name, shape in _datasets(entry['path']):
+        print('dataset:  {} {}'.format(name, tuple(shape)))
+
+
+def pin_entry(args):
+    """Pins or unpins a cache entry."""
+    pin_cache_entry(args.entry, not args.unpin)
+
+
+def prune_entries(args):
+    """Evicts the least recently used cache entries."""
+    max_size = parse_size(args.max_size) if args.max_size is not None \
+        else get_cache_max_size()
+    if max_size is None:
+        raise ValueError('No size budget given. Use -max-size or '
+                         'set JANGGU_CACHE_MAX_SIZE.')
+    for entry in prune_cache(max_size, dry_run=args.dry_run):
+        print('{}\t{}\t{}'.format('would remove' if args.dry_run else 'removed',
+                                  _format_size(entry['size']), entry['name']))
+
+
+def main(argv=None):
+    """janggu-cache command line tool."""
+
+    parser = argparse.ArgumentParser(
+        description='janggu-cache - dataset cache management tool.\n\n'
+                    'The tool lists, inspects, pins and prunes the datasets\n'
+                    'that are cached in JANGGU_OUTPUT/datasets.\n'
+                    'janggu (GPL-v3). Copyright (C) 2017-2018 '
+                    'Wolfgang Kopp')
+    parser.add_argument('-path', dest='janggu_results', type=str,
+                        default=None,
+                        help="Janggu output directory. "
+                             "Default: JANGGU_OUTPUT.")
+    subparsers = parser.add_subparsers(dest='command')
+    subparsers.required = True
+
+    subparser = subparsers.add_parser('list', help='List the cache entries '
+                                      'from the least to the most recently used.')
+    subparser.set_defaults(func=list_entries)
+
+    subparser = subparsers.add_parser('inspect', help='Show the details of a cache entry.')
+    subparser.add_argument('entry', type=str,
+                           help="Name or path of the cache entry.")
+    subparser.set_defaults(func=inspect_entry)
+
+    subparser = subparsers.add_parser('pin', help='Protect a cache entry from eviction.')
+    subparser.add_argument('entry', type=str,
+                           help="Name or path of the cache entry.")
+    subparser.add_argument('-unpin', dest='unpin', action='store_true',
+                           default=False,
+                           help="Remove the protection again.")
+    subparser.set_defaults(func=pin_entry)
+
+    subparser = subparsers.add_parser('prune', help='Evict the least recently used '
+                                      'cache entries that are not pinned.')
+    subparser.add_argument('-max-size', dest='max_size', type=str,
+                           default=None,
+                           help="Size budget, e.g. 500M or 20G. "
+                                "Default: JANGGU_CACHE_MAX_SIZE.")
+    subparser.add_argument('-dry-run', dest='dry_run', action='store_true',
+                           default=False,
+                           help="Only report the entries that would be removed.")
+    subparser.set_defaults(func=prune_entries)
+
+    args = parser.parse_args(argv)
+    if args.janggu_results is not None:
+        os.environ['JANGGU_OUTPUT'] = args.janggu_results
+    try:
+        args.func(args)
+    except ValueError as err:
+        parser.error(str(err))
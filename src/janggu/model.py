@@ -1209,7 +1209,7 @@ def predict_variant_effect(model,  # pylint: disable=too-many-locals
         A keras model
     bioseq : :code:`Bioseq` or str
         Bioseq container containing a reference genome or the reference genome file
-        in fasta format.
+        in fasta or UCSC .2bit format.
         If a Bioseq object is used, it has to be loaded with store_whole_genome=True.
         This may be faster for large amounts of variants.
         Consider using cache=True as well, such that the genome only needs to be loaded
@@ -1276,7 +1276,7 @@ def predict_variant_effect(model,  # pylint: disable=too-many-locals
         return layer.input_shape
 
     if isinstance(bioseq, Bioseq):
-        order = bioseq.garray.order
+        order = bioseq.order
 
     if len(model.inputs) > 1:
         raise ValueError('Only one input layer supported for predict_variant_effect.')
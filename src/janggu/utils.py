@@ -2,9 +2,11 @@
 
 import json
 import os
+import warnings
 from collections import defaultdict
 from collections import OrderedDict
 from copy import deepcopy
+from functools import lru_cache
 
 import numpy as np
 import pandas as pd
@@ -14,6 +16,7 @@ from Bio.Seq import Seq
 from Bio.SeqRecord import SeqRecord
 from pybedtools import BedTool
 from pybedtools import Interval
+from pysam import FastaFile
 
 import matplotlib.pyplot as plt
 import pyBigWig
@@ -85,6 +88,165 @@ def sequences_from_fasta(fasta, string='dna'):
     return seqs
 
 
+class TwoBitFile(object):
+    """Random access to a reference genome in UCSC .2bit format.
+
+    The interface mimics pysam.FastaFile.
+    Only the requested windows are decoded from the file,
+    including the blocks of N's. Soft-masked (lower case) regions
+    are returned in upper case.
+
+    Parameters
+    -----------
+    filename : str
+        2bit-filename
+    """
+    _SIGNATURE = 0x1A412743
+    _LETTERS = np.frombuffer(b'TCAG', dtype='uint8')
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._data = np.memmap(filename, dtype='uint8', mode='r')
+
+        for byteorder in ['<', '>']:
+            header = self._data[:16].view(byteorder + 'u4')
+            if header[0] == self._SIGNATURE:
+                break
+        else:
+            raise ValueError('{} is not a 2bit file.'.format(filename))
+        self._byteorder = byteorder
+        version, nseqs = int(header[1]), int(header[2])
+        if version not in [0, 1]:
+            raise ValueError('Unsupported 2bit version {}.'.format(version))
+
+        # the index holds the names of the sequences and
+        # the offsets at which the records start.
+        self._offsets = OrderedDict()
+        pos = 16
+        offsetsize = 8 if version == 1 else 4
+        for _ in range(nseqs):
+            namelen = int(self._data[pos])
+            name = self._data[pos + 1:pos + 1 + namelen].tobytes().decode()
+            pos += 1 + namelen
+            self._offsets[name] = int(self._read_uint(pos, 1, offsetsize)[0])
+            pos += offsetsize
+
+        self._records = {}
+
+    def _read_uint(self, pos, count, size=4):
+        return self._data[pos:pos + count * size].view(
+            '{}u{}'.format(self._byteorder, size))
+
+    def _record(self, reference):
+        """Length, N-blocks and position of the packed sequence."""
+        if reference not in self._records:
+            if reference not in self._offsets:
+                raise KeyError('sequence {} not present in {}'.format(reference,
+                                                                      self.filename))
+            pos = self._offsets[reference]
+            length, nblocks = self._read_uint(pos, 2).astype('int64')
+            nstarts = self._read_uint(pos + 8, nblocks).astype('int64')
+            nsizes = self._read_uint(pos + 8 + 4 * nblocks, nblocks).astype('int64')
+            pos += 8 + 8 * nblocks
+            nmask = int(self._read_uint(pos, 1)[0])
+            # skip the mask blocks and the reserved field
+            pos += 4 + 8 * nmask + 4
+            self._records[reference] = (int(length), nstarts, nstarts + nsizes, pos)
+        return self._records[reference]
+
+    @property
+    def references(self):
+        """Names of the sequences"""
+        return tuple(self._offsets)
+
+    @property
+    def lengths(self):
+        """Lengths of the sequences"""
+        return tuple(self.get_reference_length(name) for name in self._offsets)
+
+    def get_reference_length(self, reference):
+        """Length of a sequence"""
+        return self._record(reference)[0]
+
+    def fetch(self, reference, start=None, end=None):
+        """Fetch a subsequence.
+
+        Parameters
+        -----------
+        reference : str
+            Sequence name.
+        start : int or None
+            Start position (0-based). Default: None means 0.
+        end : int or None
+            End position. Default: None means the end of the sequence.
+
+        Returns
+        -------
+        str
+            Sequence.
+        """
+        length, nstarts, nends, pos = self._record(reference)
+        start = 0 if start is None else max(start, 0)
+        end = length if end is None else min(end, length)
+        if end <= start:
+            return ''
+
+        packed = self._data[pos + start // 4:pos + (end + 3) // 4]
+        codes = (packed[:, None] >> np.asarray([6, 4, 2, 0], dtype='uint8')) & 3
+        seq = self._LETTERS[codes.ravel()[start % 4:start % 4 + end - start]]
+
+        first = np.searchsorted(nends, start, side='right')
+        last = np.searchsorted(nstarts, end, side='left')
+        for nstart, nend in zip(nstarts[first:last], nends[first:last]):
+            seq[max(nstart, start) - start:min(nend, end) - start] = ord('N')
+        return seq.tobytes().decode()
+
+    def close(self):
+        """Close the file."""
+        self._data = None
+
+
+def open_indexed_reference(filename):
+    """Opens a reference genome for random access.
+
+    Reference genomes in UCSC .2bit format are accessed directly.
+    Otherwise, the sequences are accessed via the fasta index (.fai).
+    Note that if the index does not exist yet, it is created
+    next to the fasta file (filename.fai and filename.gzi for
+    bgzip-compressed files).
+    Both uncompressed and bgzip-compressed fasta files are supported.
+
+    Parameters
+    -----------
+    filename : str
+        Fasta- or 2bit-filename
+
+    Returns
+    -------
+    pysam.FastaFile, TwoBitFile or None
+        Indexed reference genome. None is returned with a warning
+        if the file cannot be indexed, e.g. because it is compressed
+        with gzip rather than bgzip or because the index cannot be written
+        to a read-only directory. In this case, the entire fasta file
+        needs to be parsed instead.
+    """
+    if filename.endswith('.2bit'):
+        return TwoBitFile(filename)
+    if not os.path.exists(filename + '.fai') and \
+            not os.access(os.path.dirname(os.path.abspath(filename)), os.W_OK):
+        warnings.warn('The fasta index {}.fai cannot be written. '
+                      'The entire reference genome is parsed '
+                      'instead.'.format(filename))
+        return None
+    try:
+        return FastaFile(filename)
+    except (IOError, OSError, ValueError) as err:
+        warnings.warn('{} cannot be accessed via a fasta index ({}). '
+                      'The entire reference genome is parsed '
+                      'instead.'.format(filename, err))
+        return None
+
+
 def _to_list(objs):
     """Makes a list of objs"""
     if objs is None:
@@ -116,6 +278,20 @@ PMAP = defaultdict(lambda: NOLETTER)
 PMAP.update(LETTERMAP)
 
 
+def _lookup_table(lettermap):
+    """Table mapping the byte values of the letters to their indices."""
+    table = np.full(256, NOLETTER, dtype='int32')
+    for letter, idx in lettermap.items():
+        table[ord(letter.upper())] = idx
+        table[ord(letter.lower())] = idx
+    table.flags.writeable = False
+    return table
+
+
+NLUT = _lookup_table(NMAP)
+PLUT = _lookup_table(PMAP)
+
+
 def seq2ind(seq):
     """Transforms a biological sequence into an int array.
 
@@ -129,20 +305,27 @@ def seq2ind(seq):
     ----------
     seq : str, Bio.SeqRecord or Bio.Seq.Seq
         Sequence represented as string, SeqRecord or Seq.
+        Strings are interpreted as nucleotide sequences.
 
     Returns
     -------
-    list(int)
+    numpy.array
         Integer array representation of the biological sequence.
     """
 
     if isinstance(seq, SeqRecord):
         seq = seq.seq
     if isinstance(seq, (str, Seq)):
-        if type(seq.alphabet) is type(IUPAC.unambiguous_dna):
-            return [NMAP[x.upper()] for x in seq]
-        # else proteins should be used
-        return [PMAP[x.upper()] for x in seq]
+        if type(getattr(seq, 'alphabet',
+                        IUPAC.unambiguous_dna)) is type(IUPAC.unambiguous_dna):
+            table = NLUT
+        else:
+            # else proteins should be used
+            table = PLUT
+        # the characters are translated via their byte values.
+        # non-ascii characters are replaced by '?', which maps to NOLETTER.
+        return table[np.frombuffer(str(seq).encode('ascii', 'replace'),
+                                   dtype='uint8')]
     raise TypeError('seq2ind: Format is not supported')
 
 
@@ -171,7 +354,21 @@ def sequence_padding(seqs, length):
     return seqs_
 
 
-def as_onehot(iseq, order, alphabetsize):
+@lru_cache(maxsize=None)
+def _onehot_table(size, dtype):
+    """Lookup table for the one-hot encoding.
+
+    Row i contains the one-hot vector of index i. The last row
+    is used for indices outside of the alphabet (e.g. 'N') and
+    contains only zeros.
+    """
+    table = np.zeros((size + 1, size), dtype=dtype)
+    table[np.arange(size), np.arange(size)] = 1
+    table.flags.writeable = False
+    return table
+
+
+def as_onehot(iseq, order, alphabetsize, dtype='int8'):
     """Converts a index sequence into one-hot representation.
 
     This method is used to transform a biological sequence
@@ -189,6 +386,9 @@ def as_onehot(iseq, order, alphabetsize):
         motif modelling.
     alphabetsize : int
         Alphabetsize.
+    dtype : str
+        Data type of the one-hot representation, e.g. 'int8',
+        'float16' or 'float32'. Default: 'int8'.
 
     Returns
     -------
@@ -198,13 +398,13 @@ def as_onehot(iseq, order, alphabetsize):
         `(batch_size, sequence length, 1, pow(alphabetsize, order))`
     """
 
-    onehot = np.zeros((len(iseq),
-                       iseq.shape[1], 1,
-                       pow(alphabetsize, order)), dtype='int8')
-    for nuc in np.arange(pow(alphabetsize, order)):
-        onehot[:, :, 0, nuc][iseq == nuc] = 1
+    size = pow(alphabetsize, order)
+    iseq = np.asarray(iseq)
+    # indices outside of the alphabet point to the all-zero row
+    idx = np.where((iseq >= 0) & (iseq < size), iseq, size).astype('intp')
+    onehot = _onehot_table(size, np.dtype(dtype))[idx]
 
-    return onehot
+    return onehot.reshape((len(iseq), iseq.shape[1], 1, size))
 
 
 def _complement_index(idx, order):
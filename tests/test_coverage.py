@@ -1,3 +1,4 @@
+import gzip
 import os
 from itertools import product
 
@@ -7,8 +8,11 @@ matplotlib.use('AGG')  # pylint: disable=
 import numpy as np
 import pandas
 import pkg_resources
+import pyBigWig
+import pysam
 import pytest
 from pybedtools import BedTool
+from pybedtools import Interval
 
 from janggu.data import Bioseq
 from janggu.data import Cover
@@ -18,6 +22,8 @@ from janggu.data import plotGenomeTrack
 from janggu.data import LineTrack
 from janggu.data import SeqTrack
 from janggu.data import HeatTrack
+from janggu.data import create_genomic_array
+from janggu.data.coverage import _run_loader_jobs
 
 
 def test_channel_last_first():
@@ -733,6 +739,54 @@ def test_bigwig_store_whole_genome_option():
     assert cover3[:].sum() == 1044.0
 
 
+def test_bigwig_roi_blocks():
+    # overlapping, adjacent and distant regions of interest
+    # are queried as merged blocks from the bigwig file.
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+    bwfile_ = os.path.join(data_path, "sample.bw")
+    roi = [Interval('chr1', 15900, 16000), Interval('chr1', 15950, 16050),
+           Interval('chr1', 16050, 16150), Interval('chr1', 29950, 30050),
+           Interval('chr2', 1000, 1100)]
+
+    ref = Cover.create_from_bigwig('ref', bigwigfiles=bwfile_, roi=roi,
+                                   binsize=100, flank=10,
+                                   store_whole_genome=True)
+    cover = Cover.create_from_bigwig('roi', bigwigfiles=bwfile_, roi=roi,
+                                     binsize=100, flank=10,
+                                     store_whole_genome=False)
+    assert cover.shape == (5, 120, 1, 1)
+    np.testing.assert_equal(cover[:], ref[:])
+    assert cover[:].sum() > 0
+    # positions beyond the chromosome end are zero
+    assert cover[3][0, 60:].sum() == 0
+
+
+def test_bigwig_zoom(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    # sparse signal with gaps that are not covered by the bigwig file
+    bwfile_ = os.path.join(tmpdir.strpath, "sparse.bw")
+    bwfile = pyBigWig.open(bwfile_, 'w')
+    bwfile.addHeader([('chr1', 1000), ('chr2', 1010)])
+    bwfile.addEntries(['chr1'] * 3, [10, 120, 500], ends=[60, 250, 900],
+                      values=[1., 3., 0.5])
+    bwfile.addEntries(['chr2'] * 2, [0, 990], ends=[100, 1010],
+                      values=[2., 4.])
+    bwfile.close()
+    roi = [Interval('chr1', 0, 400), Interval('chr1', 200, 600),
+           Interval('chr2', 0, 400), Interval('chr2', 800, 1200)]
+
+    for store_whole_genome, collapser, nan_to_num in product(
+            [True, False], ['mean', 'max', 'sum'], [True, False]):
+        kwargs = dict(bigwigfiles=bwfile_, roi=roi, binsize=400,
+                      resolution=50, collapser=collapser,
+                      nan_to_num=nan_to_num,
+                      store_whole_genome=store_whole_genome)
+        ref = Cover.create_from_bigwig('ref', **kwargs)
+        cover = Cover.create_from_bigwig('zoom', zoom=True, **kwargs)
+        assert cover.shape == ref.shape == (4, 8, 1, 1)
+        np.testing.assert_allclose(cover[:], ref[:], rtol=1e-5)
+
+
 def test_bigwig_store_whole_genome_option_dataframe(tmpdir):
     os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
     data_path = pkg_resources.resource_filename('janggu', 'resources/')
@@ -1332,6 +1386,187 @@ def test_cover_bam_paired_midpoint():
     assert cover.garray.handle['ref'][34, 0, 0] == 1
 
 
+def test_cover_bam_chunked_counting(monkeypatch):
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+
+    for bamfile_, pairedend in [("sample.bam", '5prime'),
+                                ("sample2.bam", '5prime'),
+                                ("sample2.bam", 'midpoint')]:
+        kwargs = dict(bamfiles=os.path.join(data_path, bamfile_),
+                      pairedend=pairedend, min_mapq=30,
+                      store_whole_genome=True)
+        ref = Cover.create_from_bam("ref", **kwargs)
+
+        # process a few alignments at a time using
+        # multithreaded decompression
+        monkeypatch.setattr('janggu.data.coverage._BAM_CHUNK_SIZE', 3)
+        cover = Cover.create_from_bam("chunked", threads=2, **kwargs)
+        monkeypatch.undo()
+
+        assert cover.garray.handle.keys() == ref.garray.handle.keys()
+        for chrom in ref.garray.handle:
+            np.testing.assert_equal(cover.garray.handle[chrom],
+                                    ref.garray.handle[chrom])
+
+
+def test_cover_bam_roi_blocks():
+    # overlapping and adjacent regions of interest are fetched
+    # as merged blocks from the bam file.
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+    bamfile_ = os.path.join(data_path, "sample2.bam")
+    roi = [Interval('ref', 0, 10), Interval('ref', 5, 30),
+           Interval('ref', 30, 46), Interval('ref2', 0, 46)]
+
+    for pairedend in ['5prime', 'midpoint']:
+        kwargs = dict(bamfiles=bamfile_, roi=roi, pairedend=pairedend,
+                      flank=5, template_extension=50)
+        ref = Cover.create_from_bam("ref", store_whole_genome=True, **kwargs)
+        cover = Cover.create_from_bam("roi", store_whole_genome=False, **kwargs)
+        assert cover.shape == ref.shape
+        np.testing.assert_equal(cover[:], ref[:])
+
+
+def _write_paired_bam(filename, nfragments=500, seed=0):
+    """Paired-end BAM file with long fragments.
+
+    Returns the fragment mid points.
+    """
+    rng = np.random.RandomState(seed)
+    header = {'HD': {'VN': '1.0', 'SO': 'coordinate'},
+              'SQ': [{'SN': 'chr1', 'LN': 5000}]}
+    reads = []
+    midpoints = []
+    for ifrag in range(nfragments):
+        start = rng.randint(0, 4400)
+        length = rng.randint(100, 600)
+        # read 1 is either the upstream or the downstream read
+        read1_upstream = rng.rand() < .5
+        for upstream in [True, False]:
+            read1 = upstream == read1_upstream
+            flag = 0x1 | 0x2 | (0x40 if read1 else 0x80) | \
+                (0x20 if upstream else 0x10)
+            pos = start if upstream else start + length - 50
+            reads.append((pos, 'frag{}'.format(ifrag), flag,
+                          start + length - 50 if upstream else start,
+                          length if upstream else -length))
+        midpoints.append(start + length // 2)
+
+    with pysam.AlignmentFile(filename, 'wb', header=header) as bamfile:
+        for pos, name, flag, nextpos, tlen in sorted(reads):
+            aln = pysam.AlignedSegment()
+            aln.query_name = name
+            aln.query_sequence = 'A' * 50
+            aln.flag = flag
+            aln.reference_id = 0
+            aln.reference_start = pos
+            aln.mapping_quality = 60
+            aln.cigarstring = '50M'
+            aln.next_reference_id = 0
+            aln.next_reference_start = nextpos
+            aln.template_length = tlen
+            aln.query_qualities = pysam.qualitystring_to_array('I' * 50)
+            bamfile.write(aln)
+    pysam.index(filename)
+    return np.asarray(midpoints)
+
+
+def test_cover_bam_roi_midpoint(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    bamfile_ = os.path.join(tmpdir.strpath, 'paired.bam')
+    midpoints = _write_paired_bam(bamfile_)
+
+    # the reads of many fragments are located outside of
+    # the regions of interest, but their mid points are inside.
+    roi = [Interval('chr1', 1000, 1200), Interval('chr1', 2500, 2700)]
+    kwargs = dict(bamfiles=bamfile_, roi=roi, pairedend='midpoint',
+                  stranded=False, template_extension=300)
+    ref = Cover.create_from_bam("ref", store_whole_genome=True, **kwargs)
+    cover = Cover.create_from_bam("roi", store_whole_genome=False, **kwargs)
+    np.testing.assert_equal(cover[:], ref[:])
+
+    for i, region in enumerate(roi):
+        inside = (midpoints >= region.start) & (midpoints < region.end)
+        expected = np.bincount(midpoints[inside] - region.start,
+                               minlength=region.length)
+        np.testing.assert_equal(cover[i][0, :, 0, 0], expected)
+
+
+def test_cover_bam_blockwise(tmpdir, monkeypatch):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    bamfile_ = os.path.join(tmpdir.strpath, 'paired.bam')
+    _write_paired_bam(bamfile_)
+    # small blocks split the chromosome into several counting jobs
+    monkeypatch.setattr('janggu.data.genomicarray._BLOCK_POSITIONS', 700)
+
+    roi = [Interval('chr1', 0, 5000)]
+    for ext in [0, 60]:
+        kwargs = dict(bamfiles=bamfile_, roi=roi, template_extension=ext)
+        ref = Cover.create_from_bam("ref", store_whole_genome=False, **kwargs)
+        cover = Cover.create_from_bam("blocks", store_whole_genome=True, **kwargs)
+        np.testing.assert_equal(cover[:], ref[:])
+        assert cover[:].sum() == 1000
+
+    # fragment mid points are counted across the block boundaries
+    # if the template extension covers the fragments
+    kwargs = dict(bamfiles=bamfile_, roi=roi, pairedend='midpoint',
+                  template_extension=300)
+    ref = Cover.create_from_bam("ref", store_whole_genome=False, **kwargs)
+    cover = Cover.create_from_bam("blocks", store_whole_genome=True, **kwargs)
+    np.testing.assert_equal(cover[:], ref[:])
+    assert cover[:].sum() == 500
+
+
+def test_cover_n_jobs():
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+    bed_file = os.path.join(data_path, "sample.bed")
+
+    for store_whole_genome in [True, False]:
+        loaders = [(Cover.create_from_bam,
+                    dict(bamfiles=[os.path.join(data_path, "sample2.bam")] * 2,
+                         conditions=['rep1', 'rep2'],
+                         roi=[Interval('ref', 0, 46), Interval('ref2', 0, 46)])),
+                   (Cover.create_from_bigwig,
+                    dict(bigwigfiles=[os.path.join(data_path, "sample.bw")] * 2,
+                         conditions=['rep1', 'rep2'],
+                         roi=bed_file, binsize=200)),
+                   (Cover.create_from_bed,
+                    dict(bedfiles=[os.path.join(data_path, "scored_sample.bed")] * 2,
+                         conditions=['rep1', 'rep2'],
+                         roi=bed_file, binsize=200, mode='score'))]
+        for create, kwargs in loaders:
+            ref = create('ref', store_whole_genome=store_whole_genome, **kwargs)
+            cover = create('parallel', store_whole_genome=store_whole_genome,
+                           n_jobs=2, **kwargs)
+            assert cover.shape == ref.shape
+            np.testing.assert_equal(cover[:], ref[:])
+
+    with pytest.raises(ValueError):
+        Cover.create_from_bigwig('n_jobs',
+                                 bigwigfiles=os.path.join(data_path, "sample.bw"),
+                                 roi=bed_file, binsize=200, n_jobs=0)
+
+
+class _PickleCountingLoader(object):
+    npickled = 0
+
+    def __getstate__(self):
+        _PickleCountingLoader.npickled += 1
+        return self.__dict__
+
+    def __call__(self, pos):
+        return [(Interval('chr1', pos, pos + 1), 0, np.full((1, 1), pos))]
+
+
+def test_cover_n_jobs_loader_transfer():
+    garray = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 20}),
+                                  stranded=False, typecode='int32', cache=False)
+    _run_loader_jobs(garray, _PickleCountingLoader(),
+                     [(pos,) for pos in range(20)], n_jobs=2)
+    # the loader is transferred at most once per worker process
+    assert _PickleCountingLoader.npickled <= 2
+    np.testing.assert_equal(garray[Interval('chr1', 0, 20)][:, 0, 0], np.arange(20))
+
+
 def test_cover_bam_list(tmpdir):
     os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
     data_path = pkg_resources.resource_filename('janggu', 'resources/')
@@ -1951,6 +2186,70 @@ def test_load_cover_bedgraph():
         np.testing.assert_equal(cover[4], [[[[.5]]]])
 
 
+def test_load_cover_bedgraph_bulk(tmpdir, monkeypatch):
+    # bedgraph with a track line, overlapping features and
+    # features outside of the regions of interest
+    lines = ['track type=bedGraph name=test',
+             'chr1\t10\t30\t1.5',
+             'chr1\t20\t40\t2.5',
+             'chr1\t100\t120\t4',
+             'chr2\t0\t10\t3']
+    score_file = os.path.join(tmpdir.strpath, 'sample.bedgraph.gz')
+    with gzip.open(score_file, 'wt') as handle:
+        handle.write('\n'.join(lines) + '\n')
+    roi = [Interval('chr1', 0, 50), Interval('chr1', 25, 75),
+           Interval('chr1', 60, 110), Interval('chr3', 0, 50)]
+
+    cover = Cover.create_from_bed("cov", bedfiles=score_file, roi=roi,
+                                  binsize=50,
+                                  mode='bedgraph')
+    expected = np.zeros((4, 50))
+    # later features overwrite earlier ones
+    expected[0, 10:20] = 1.5
+    expected[0, 20:40] = 2.5
+    expected[1, :15] = 2.5
+    expected[2, 40:] = 4
+    np.testing.assert_equal(cover[:][:, :, 0, 0], expected)
+
+    # uncompressed file without track line parsed in chunks
+    score_file = os.path.join(tmpdir.strpath, 'sample.bedgraph')
+    with open(score_file, 'w') as handle:
+        handle.write('\n'.join(lines[1:]) + '\n')
+    monkeypatch.setattr('janggu.data.coverage._BED_CHUNK_SIZE', 3)
+    cover = Cover.create_from_bed("cov", bedfiles=score_file, roi=roi,
+                                  binsize=50,
+                                  mode='bedgraph')
+    np.testing.assert_equal(cover[:][:, :, 0, 0], expected)
+
+
+def test_load_cover_bed_minoverlap_categories(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    bed_file = os.path.join(tmpdir.strpath, 'labels.bed')
+    with open(bed_file, 'w') as handle:
+        handle.write('chr1\t0\t30\tc2\t1\n'
+                     'chr1\t120\t150\tc1\t1\n'
+                     'chr1\t140\t160\tc3\t1\n'
+                     'chr1\t290\t300\tc1\t1\n')
+    roi = [Interval('chr1', 0, 400)]
+
+    # 30%, 40%, 10% and 0% of the bins are covered
+    for minoverlap, expected in [(None, [30, 40, 10, 0]),
+                                 (.25, [30, 40, 0, 0]),
+                                 (.35, [0, 40, 0, 0])]:
+        cover = Cover.create_from_bed('binary', bedfiles=bed_file, roi=roi,
+                                      binsize=100, mode='binary',
+                                      minoverlap=minoverlap)
+        np.testing.assert_equal(cover[:].sum(axis=(1, 2, 3)), expected)
+
+    for store in ['ndarray', 'hdf5', 'sparse']:
+        cover = Cover.create_from_bed('categories', bedfiles=bed_file, roi=roi,
+                                      binsize=100, mode='name_category',
+                                      storage=store, cache=True)
+        assert cover.conditions == ['c1', 'c2', 'c3']
+        np.testing.assert_equal(cover[:].sum(axis=(1, 2)),
+                                [[0, 30, 0], [20, 0, 20], [10, 0, 0], [0, 0, 0]])
+
+
 def test_load_cover_bed_name_category():
     bed_file = pkg_resources.resource_filename('janggu', 'resources/sample.bed')
     score_file = pkg_resources.resource_filename('janggu',
@@ -2603,3 +2902,27 @@ def test_fulltilebed2():
     assert cover1.shape == cover2.shape
     np.testing.assert_equal(cover1[:], cover2[:])
 
+
+
+def test_cover_output_dtype():
+    variantsfile = pkg_resources.resource_filename('janggu', 'resources/pseudo_snps.vcf')
+    gindexer = GenomicIndexer.create_from_file(variantsfile, None, None)
+    array = np.arange(len(gindexer) * 3, dtype='float32').reshape(-1, 3)
+
+    snpcov = Cover.create_from_array('snps', array,
+                                     gindexer,
+                                     store_whole_genome=False)
+
+    # the data type of the genomic array is used by default
+    assert snpcov[[0, 1]].dtype == np.float32
+    snpcov.output_dtype = 'float64'
+    assert snpcov[[0, 1]].dtype == np.float64
+    np.testing.assert_equal(snpcov[[0, 1]][:, 0, 0, :], array[:2])
+
+    out = np.ones((2, 1, 1, 3), dtype='float32')
+    ret = snpcov.take([2, 3], out=out)
+    assert ret is out
+    np.testing.assert_equal(out[:, 0, 0, :], array[2:4])
+
+    with pytest.raises(ValueError):
+        snpcov.take([2, 3, 4], out=out)
@@ -1,11 +1,17 @@
 import glob
+import gzip
 import os
+import shutil
+from itertools import product
 
 import matplotlib
 import numpy as np
 import pandas
 import pkg_resources
+import pysam
 import pytest
+from Bio.Alphabet import IUPAC
+from Bio.Seq import Seq
 from keras.layers import Input
 from keras.models import Model
 from pybedtools import BedTool
@@ -14,9 +20,14 @@ from pybedtools import Interval
 from janggu.data import Bioseq
 from janggu.data import GenomicIndexer
 from janggu.data import VariantStreamer
+from janggu.data.cache import list_cache_entries
 from janggu.layers import Complement
 from janggu.layers import Reverse
+from janggu.utils import NOLETTER
+from janggu.utils import as_onehot
 from janggu.utils import complement_permmatrix
+from janggu.utils import open_indexed_reference
+from janggu.utils import seq2ind
 from janggu.utils import sequences_from_fasta
 
 matplotlib.use('AGG')
@@ -407,6 +418,28 @@ def test_complement_order_2(tmpdir):
     complement_layer(2)
 
 
+def test_revcomp_index_batch(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+    refgenome = os.path.join(data_path, 'sample_genome.fa')
+
+    for order in [1, 2]:
+        data = Bioseq.create_from_refgenome('train', refgenome=refgenome,
+                                            order=order,
+                                            store_whole_genome=True)
+        iseq = np.asarray([[0, 1, 2, 3, NOLETTER],
+                           [3, -128, 1, 1, 0]])
+        if order == 1:
+            expected = np.asarray([[NOLETTER, 0, 1, 2, 3],
+                                   [3, 2, 2, -128, 0]])
+        else:
+            # e.g. AC (index 1) is complemented to GT (index 11)
+            expected = np.asarray([[NOLETTER, 3, 7, 11, 15],
+                                   [15, 11, 11, -128, 3]])
+        np.testing.assert_equal(data._revcomp(iseq), expected)
+        np.testing.assert_equal(data._revcomp(iseq[1]), expected[1])
+
+
 def test_revcomp_rcmatrix(tmpdir):
     os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
 
@@ -455,6 +488,39 @@ def test_rcmatrix_identity():
                                 np.matmul(rcmatrix, rcmatrix))
 
 
+def test_seq2ind():
+    seq = 'ACGTNacgtn.-'
+    np.testing.assert_equal(seq2ind(Seq(seq, IUPAC.unambiguous_dna)),
+                            [0, 1, 2, 3, NOLETTER, 0, 1, 2, 3, NOLETTER,
+                             NOLETTER, NOLETTER])
+    np.testing.assert_equal(seq2ind(seq)[:4], [0, 1, 2, 3])
+
+    seq = 'ACDYacdyXB*'
+    np.testing.assert_equal(seq2ind(Seq(seq, IUPAC.protein)),
+                            [0, 1, 2, 19, 0, 1, 2, 19, NOLETTER,
+                             NOLETTER, NOLETTER])
+
+    with pytest.raises(TypeError):
+        seq2ind(123)
+
+
+def test_as_onehot():
+    iseq = np.asarray([[0, 3, -128, 15], [NOLETTER, 5, 1, 2]])
+
+    onehot = as_onehot(iseq, 2, 4)
+    assert onehot.shape == (2, 4, 1, 16)
+    assert onehot.dtype == np.int8
+    for i, j in product(range(2), range(4)):
+        expected = np.zeros(16)
+        if iseq[i, j] >= 0:
+            expected[iseq[i, j]] = 1
+        np.testing.assert_equal(onehot[i, j, 0], expected)
+
+    onehot = as_onehot(iseq, 2, 4, dtype='float32')
+    assert onehot.dtype == np.float32
+    np.testing.assert_equal(onehot.sum(axis=(1, 2, 3)), [3, 3])
+
+
 def test_dna_dataset_sanity(tmpdir):
     os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
     data_path = pkg_resources.resource_filename('janggu', 'resources/')
@@ -697,6 +763,160 @@ def test_dnabed_overreaching_ends_partial_genome():
     np.testing.assert_equal(bioseq[-1].sum(), 42 - 4)
 
 
+def test_dna_indexed_refgenome(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+    roi = os.path.join(data_path, 'sample.gtf')
+    refgenome = os.path.join(data_path, 'sample_genome.fa')
+    # bgzip compressed copy of the reference genome
+    bgzfile = os.path.join(tmpdir.strpath, 'sample_genome.fa.gz')
+    pysam.tabix_compress(refgenome, bgzfile)
+
+    for store_whole_genome in [True, False]:
+        # the sequences are parsed from the SeqRecords
+        ref = Bioseq.create_from_refgenome('ref',
+                                           refgenome=sequences_from_fasta(refgenome),
+                                           roi=roi, binsize=200, flank=20,
+                                           store_whole_genome=store_whole_genome)
+        for filename in [refgenome, bgzfile]:
+            # the sequences are fetched from the indexed reference genome
+            data = Bioseq.create_from_refgenome('indexed', refgenome=filename,
+                                                roi=roi, binsize=200, flank=20,
+                                                store_whole_genome=store_whole_genome)
+            np.testing.assert_equal(data[:], ref[:])
+
+
+def test_dna_indexed_refgenome_fallback(tmpdir, monkeypatch):
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+    refgenome = os.path.join(tmpdir.strpath, 'sample_genome.fa')
+    with open(os.path.join(data_path, 'sample_genome.fa')) as fin, \
+            open(refgenome, 'w') as fout:
+        fout.write(fin.read())
+
+    # the index cannot be written to a read-only directory
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'access', lambda path, mode: False)
+        with pytest.warns(UserWarning, match='cannot be written'):
+            assert open_indexed_reference(refgenome) is None
+    assert not os.path.exists(refgenome + '.fai')
+
+    # gzip compressed files cannot be indexed
+    gzfile = os.path.join(tmpdir.strpath, 'sample_genome.fa.gz')
+    with open(refgenome, 'rb') as fin, gzip.open(gzfile, 'wb') as fout:
+        fout.write(fin.read())
+    with pytest.warns(UserWarning, match='fasta index'):
+        assert open_indexed_reference(gzfile) is None
+
+    reference = open_indexed_reference(refgenome)
+    assert os.path.exists(refgenome + '.fai')
+    reference.close()
+
+
+def test_dna_indexed_refgenome_cache(tmpdir, monkeypatch):
+    monkeypatch.setenv('JANGGU_OUTPUT', tmpdir.strpath)
+    monkeypatch.delenv('JANGGU_CACHE_HASH', raising=False)
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+    refgenome = os.path.join(tmpdir.strpath, 'sample_genome.fa')
+    shutil.copy(os.path.join(data_path, 'sample_genome.fa'), refgenome)
+
+    # the fasta index that is created during the first load
+    # does not alter the cache key
+    for _ in range(2):
+        Bioseq.create_from_refgenome('dna', refgenome=refgenome, cache=True,
+                                     store_whole_genome=True)
+    assert os.path.exists(refgenome + '.fai')
+    assert len(list_cache_entries()) == 1
+
+
+def _write_twobit(filename, records):
+    # minimal UCSC .2bit writer with N-blocks and mask blocks
+    def _blocks(mask):
+        mask = np.concatenate([[False], mask, [False]]).astype('int8')
+        starts = np.where(np.diff(mask) == 1)[0]
+        ends = np.where(np.diff(mask) == -1)[0]
+        return starts, ends - starts
+
+    index = b''
+    body = b''
+    offset = 16 + sum(1 + len(rec.id) + 4 for rec in records)
+    for rec in records:
+        seq = str(rec.seq)
+        index += bytes([len(rec.id)]) + rec.id.encode() + \
+            np.asarray([offset + len(body)], dtype='<u4').tobytes()
+        nstarts, nsizes = _blocks(np.asarray([c in 'Nn' for c in seq]))
+        mstarts, msizes = _blocks(np.asarray([c.islower() for c in seq]))
+        codes = np.asarray(['TCAG'.find(c) % 4 for c in seq.upper()], dtype='uint8')
+        codes = np.concatenate([codes, np.zeros((-len(codes)) % 4, dtype='uint8')])
+        packed = (codes.reshape(-1, 4) << np.asarray([6, 4, 2, 0], dtype='uint8')).sum(axis=1)
+        body += np.asarray([len(seq), len(nstarts)], dtype='<u4').tobytes()
+        body += np.asarray(list(nstarts) + list(nsizes), dtype='<u4').tobytes()
+        body += np.asarray([len(mstarts)], dtype='<u4').tobytes()
+        body += np.asarray(list(mstarts) + list(msizes) + [0], dtype='<u4').tobytes()
+        body += packed.astype('uint8').tobytes()
+    header = np.asarray([0x1A412743, 0, len(records), 0], dtype='<u4').tobytes()
+    with open(filename, 'wb') as handle:
+        handle.write(header + index + body)
+
+
+def test_dna_twobit_refgenome(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+    roi = os.path.join(data_path, 'sample.gtf')
+    seqs = sequences_from_fasta(os.path.join(data_path, 'sample_genome.fa'))
+    # introduce blocks of N's at the start, within and at the end
+    # of the chromosomes
+    for rec in seqs:
+        seq = str(rec.seq)
+        seq = 'NNN' + seq[3:1000] + 'N' * 501 + seq[1501:-7] + 'NNNNNNN'
+        rec.seq = Seq(seq, IUPAC.unambiguous_dna)
+    refgenome = os.path.join(tmpdir.strpath, 'sample_genome.2bit')
+    _write_twobit(refgenome, seqs)
+
+    reference = open_indexed_reference(refgenome)
+    assert reference.references == tuple(rec.id for rec in seqs)
+    assert reference.lengths == tuple(len(rec) for rec in seqs)
+    for start, end in [(0, 1), (1, 10), (998, 1503), (5, 5), (-3, 4)]:
+        assert reference.fetch(seqs[0].id, start, end) == \
+            str(seqs[0].seq)[max(start, 0):end].upper()
+    assert reference.fetch(seqs[1].id) == str(seqs[1].seq).upper()
+
+    for store_whole_genome in [True, False]:
+        ref = Bioseq.create_from_refgenome('ref', refgenome=seqs,
+                                           roi=roi, binsize=200, flank=20,
+                                           store_whole_genome=store_whole_genome)
+        data = Bioseq.create_from_refgenome('twobit', refgenome=refgenome,
+                                            roi=roi, binsize=200, flank=20,
+                                            store_whole_genome=store_whole_genome)
+        np.testing.assert_equal(data[:], ref[:])
+
+
+def test_dna_packed_storage(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+    roi = os.path.join(data_path, 'sample.gtf')
+    refgenome = os.path.join(data_path, 'sample_genome.fa')
+
+    for order, store_whole_genome, cache in [(1, True, False), (2, True, True),
+                                             (3, False, False), (2, False, True)]:
+        kwargs = dict(refgenome=refgenome, roi=roi, binsize=200,
+                      flank=20, order=order,
+                      store_whole_genome=store_whole_genome)
+        ref = Bioseq.create_from_refgenome('ref', storage='ndarray', **kwargs)
+        packed = Bioseq.create_from_refgenome('packed', storage='packed',
+                                              cache=cache, **kwargs)
+        assert packed.shape == ref.shape
+        np.testing.assert_equal(packed[:], ref[:])
+        packed.output_dtype = 'float32'
+        assert packed[[0, 1]].dtype == np.float32
+        if store_whole_genome:
+            np.testing.assert_equal(packed['chr1', 29990, 30010, '-'],
+                                    ref['chr1', 29990, 30010, '-'])
+
+    with pytest.raises(ValueError):
+        Bioseq.create_from_seq('prot', fastafile=os.path.join(data_path, 'sample_protein.fa'),
+                               seqtype='protein', fixedlen=5, storage='packed')
+
+
 @pytest.mark.filterwarnings("ignore:The truth value")
 def test_janggu_variant_streamer_order_1(tmpdir):
     os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
@@ -1,4 +1,6 @@
 import os
+import pickle
+import threading
 
 import numpy as np
 import pytest
@@ -6,7 +8,11 @@ from pybedtools import Interval
 
 from janggu.data import GenomicIndexer
 from janggu.data import create_genomic_array
+from janggu.data import genomicarray
+from janggu.data.genomicarray import ChunkedGenomicArray
+from janggu.data.genomicarray import create_sha256_cache
 from janggu.data.genomicarray import get_collapser
+from janggu.data.genomicarray import get_default_storage_options
 from janggu.data.genomicarray import get_normalizer
 
 
@@ -45,6 +51,368 @@ def test_hdf5_no_cache():
                                   storage='hdf5', cache=None)
 
 
+def test_memmap_no_cache():
+
+    with pytest.raises(Exception):
+        # cache must be True
+        ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr10': 300}),
+                                  stranded=True, typecode='int8',
+                                  storage='memmap', cache=None)
+
+
+def test_memmap_reload(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    iv = Interval('chr10', 100, 120, strand='+')
+
+    def loading(garray):
+        garray[iv, 0] = np.ones((20, 1))
+        return garray
+
+    gsize = GenomicIndexer.create_from_genomesize({'chr10': 300, 'chr2': 100})
+    ga = create_genomic_array(gsize, stranded=False, typecode='int8',
+                              storage='memmap', cache='memmap_test',
+                              loader=loading, padding_value=-1)
+    assert isinstance(ga.handle['chr10'], np.memmap)
+    np.testing.assert_equal(ga[iv].shape, (20, 1, 1))
+    np.testing.assert_equal(ga[iv], np.ones((20, 1, 1)))
+    np.testing.assert_equal(ga[Interval('chr2', 0, 10)], -np.ones((10, 1, 1)))
+    np.testing.assert_equal(list(ga.handle.keys()), ['chr10', 'chr2'])
+
+    def failing_loader(garray):
+        raise AssertionError('the cache should be used')
+
+    # reload from cache without invoking the loader
+    ga = create_genomic_array(gsize, stranded=False, typecode='int8',
+                              storage='memmap', cache='memmap_test',
+                              loader=failing_loader)
+    np.testing.assert_equal(ga[iv], np.ones((20, 1, 1)))
+
+    # pickling reopens the memory maps
+    ga2 = pickle.loads(pickle.dumps(ga))
+    assert isinstance(ga2.handle['chr10'], np.memmap)
+    np.testing.assert_equal(ga2[iv], np.ones((20, 1, 1)))
+
+
+def test_chunked_no_cache():
+
+    with pytest.raises(Exception):
+        # cache must be True
+        ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr10': 300}),
+                                  stranded=True, typecode='int8',
+                                  storage='chunked', cache=None)
+
+
+def test_chunked_access(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+
+    values = np.random.RandomState(0).randint(0, 5, size=(300, 2, 1))
+
+    def loading(garray):
+        garray[Interval('chr10', 0, 300), 0] = values[:, :, 0]
+        return garray
+
+    gsize = GenomicIndexer.create_from_genomesize({'chr10': 300})
+    ga = ChunkedGenomicArray(gsize, stranded=True, typecode='int16',
+                             cache='chunked_test', loader=loading,
+                             chunk_length=32, chunk_cache_size=100)
+
+    data = ga.handle['chr10']
+    assert data.shape == (300, 2, 1)
+    np.testing.assert_equal(data[:], values)
+    # slices across chunk boundaries
+    np.testing.assert_equal(data[30:70], values[30:70])
+    np.testing.assert_equal(data[250:], values[250:])
+    np.testing.assert_equal(data[10:100:7, 1, :], values[10:100:7, 1, :])
+    np.testing.assert_equal(data[299], values[299])
+    np.testing.assert_equal(data[np.array([290, 3, 45])], values[[290, 3, 45]])
+    np.testing.assert_equal(ga[Interval('chr10', 95, 130, strand='+')],
+                            values[95:130])
+    # the chunk cache remains bounded
+    assert len(ga.chunk_cache._chunks) == 1
+
+    ga2 = pickle.loads(pickle.dumps(ga))
+    np.testing.assert_equal(ga2.handle['chr10'][:], values)
+
+
+def test_chunked_bounded_writes(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+
+    values = np.random.RandomState(1).randint(0, 5, size=(300, 1, 1))
+
+    def loading(garray):
+        # blocks are written in reverse order and partially overwritten,
+        # such that evicted chunks need to be restored.
+        for start in range(250, -1, -50):
+            garray[Interval('chr10', start, start + 50), 0] = values[start:start + 50, :, 0]
+        garray[Interval('chr10', 20, 40), 0] = values[20:40, :, 0] + 1
+        return garray
+
+    gsize = GenomicIndexer.create_from_genomesize({'chr10': 300, 'chr11': 70})
+    ga = ChunkedGenomicArray(gsize, stranded=False, typecode='int16',
+                             cache='chunked_writes', loader=loading,
+                             padding_value=-1,
+                             chunk_length=16, chunk_cache_size=64)
+    expected = values.copy()
+    expected[20:40] += 1
+    np.testing.assert_equal(ga.handle['chr10'][:], expected)
+    # chunks that are never written contain the padding value
+    np.testing.assert_equal(ga.handle['chr11'][:], -np.ones((70, 1, 1)))
+    assert not os.path.exists(os.path.join(tmpdir.strpath, 'datasets',
+                                           'chunked_writes.chunked', 'tmp'))
+
+    # concurrent readers share the chunk cache
+    errors = []
+
+    def _read(offset):
+        try:
+            for _ in range(50):
+                np.testing.assert_equal(ga.handle['chr10'][offset:offset + 100],
+                                        expected[offset:offset + 100])
+        except Exception as err:
+            errors.append(err)
+
+    threads = [threading.Thread(target=_read, args=(offset,))
+               for offset in [0, 50, 100, 150, 200]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert ga.chunk_cache.nbytes == sum(chunk.nbytes for chunk in
+                                        ga.chunk_cache._chunks.values())
+
+
+def test_hdf5_chunking(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    iv = Interval('chr10', 100, 120, strand='+')
+
+    def loading(garray):
+        garray[iv, 0] = np.ones((20, 1))
+        return garray
+
+    gsize = GenomicIndexer.create_from_genomesize({'chr10': 300})
+    ga = create_genomic_array(gsize, stranded=False, typecode='float32',
+                              storage='hdf5', cache='hdf5_chunk_test',
+                              loader=loading,
+                              storage_options={'chunk_length': 50,
+                                               'compression': 'gzip',
+                                               'chunk_cache_size': 2**20})
+    assert ga.handle['chr10'].chunks == (50, 1, 1)
+    assert ga.handle['chr10'].compression == 'gzip'
+    np.testing.assert_equal(ga[iv], np.ones((20, 1, 1)))
+
+    # chunks of about 64 KB comprise several regions of interest
+    roi = GenomicIndexer.create_from_region('chr10', 0, 300000, '.', binsize=200,
+                                            stepsize=200)
+    ga = create_genomic_array(roi, stranded=False, typecode='float32',
+                              storage='hdf5', cache='hdf5_chunk_test_roi',
+                              store_whole_genome=False)
+    assert ga.handle['data'].chunks == (81, 200, 1, 1)
+
+
+def test_hdf5_fillvalue(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+    iv = Interval('chr10', 100, 120, strand='+')
+
+    def loading(garray):
+        garray[iv, 0] = np.ones((20, 1))
+        return garray
+
+    gsize = GenomicIndexer.create_from_genomesize({'chr10': 300})
+    ga = create_genomic_array(gsize, stranded=False, typecode='float32',
+                              storage='hdf5', cache='hdf5_fill_test',
+                              loader=loading, padding_value=-1.)
+    assert ga.handle['chr10'].fillvalue == -1.
+    np.testing.assert_equal(ga[iv], np.ones((20, 1, 1)))
+    np.testing.assert_equal(ga[Interval('chr10', 0, 100)], -np.ones((100, 1, 1)))
+
+
+def test_blocks():
+    ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr10': 300}),
+                              stranded=False, typecode='float32',
+                              storage='ndarray', resolution=50,
+                              collapser='sum')
+    iv = Interval('chr10', 0, 3000000)
+    blocks = list(ga.blocks(iv))
+    assert blocks[0].start == 0
+    assert blocks[-1].end == 3000000
+    for block in blocks[:-1]:
+        assert block.length % 50 == 0
+    assert sum(block.length for block in blocks) == 3000000
+
+
+def test_default_storage_options():
+    roi = GenomicIndexer.create_from_region('chr10', 0, 3000, '.', binsize=200,
+                                            stepsize=200)
+    options = get_default_storage_options('hdf5', None, roi, 50, True)
+    assert options['chunk_length'] % 4 == 0
+    # user options take precedence
+    options = get_default_storage_options('hdf5', {'chunk_length': 7}, roi, 50, True)
+    assert options['chunk_length'] == 7
+    assert get_default_storage_options('ndarray', None, roi, 50, True) == {}
+    assert get_default_storage_options('hdf5', None, roi, 50, False) == {}
+
+
+def test_cache_fingerprint(tmpdir, monkeypatch):
+    monkeypatch.setenv('JANGGU_OUTPUT', tmpdir.strpath)
+    monkeypatch.delenv('JANGGU_CACHE_HASH', raising=False)
+    filename = tmpdir.join('data.txt')
+    filename.write('a' * 4000000)
+    tmpdir.join('data.txt.tbi').write('chr1\t10\n')
+
+    cache_hash = create_sha256_cache([filename.strpath], ['param'])
+    assert os.path.exists(os.path.join(tmpdir.strpath, 'datasets', 'fingerprints.json'))
+
+    # unchanged files are looked up in the manifest
+    def _fail(filename):
+        raise AssertionError('file must not be read')
+    with monkeypatch.context() as patch:
+        patch.setattr(genomicarray, 'file_fingerprint', _fail)
+        assert create_sha256_cache([filename.strpath], ['param']) == cache_hash
+        assert create_sha256_cache([filename.strpath], ['other']) != cache_hash
+
+    # changes to the file or to the index are detected
+    filename.write('a' * 3999999 + 'b')
+    os.utime(filename.strpath, ns=(0, 0))
+    modified_hash = create_sha256_cache([filename.strpath], ['param'])
+    assert modified_hash != cache_hash
+    tmpdir.join('data.txt.tbi').write('chr1\t11\n')
+    cache_hash = create_sha256_cache([filename.strpath], ['param'])
+    assert cache_hash != modified_hash
+
+    # the verify mode retains the cache key
+    monkeypatch.setenv('JANGGU_CACHE_HASH', 'verify')
+    assert create_sha256_cache([filename.strpath], ['param']) == cache_hash
+
+    # the content is modified outside of the sampled blocks
+    # without changing the size and the modification time
+    with open(filename.strpath, 'r+b') as file_:
+        file_.seek(100000)
+        file_.write(b'c')
+    os.utime(filename.strpath, ns=(0, 0))
+    monkeypatch.setenv('JANGGU_CACHE_HASH', 'fingerprint')
+    assert create_sha256_cache([filename.strpath], ['param']) == cache_hash
+
+    # which is only detected by the verify mode
+    monkeypatch.setenv('JANGGU_CACHE_HASH', 'verify')
+    with pytest.warns(UserWarning):
+        verified_hash = create_sha256_cache([filename.strpath], ['param'])
+    assert verified_hash != cache_hash
+    assert create_sha256_cache([filename.strpath], ['param']) == verified_hash
+    monkeypatch.setenv('JANGGU_CACHE_HASH', 'fingerprint')
+    assert create_sha256_cache([filename.strpath], ['param']) == verified_hash
+
+    monkeypatch.setenv('JANGGU_CACHE_HASH', 'unknown')
+    with pytest.raises(ValueError):
+        create_sha256_cache([filename.strpath], ['param'])
+
+
+def test_sparse_bulk_writes(monkeypatch):
+    # force frequent compaction of the triplet buffers
+    monkeypatch.setattr(genomicarray, '_SPARSE_COMPACT_SIZE', 10)
+    rng = np.random.RandomState(1)
+    values = rng.randint(0, 3, size=(2, 100, 2, 2))
+    # zeros are not stored in sparse mode, so they cannot override earlier writes
+    values[1] += 1
+    roi = GenomicIndexer.create_from_region('chr10', 0, 300, '.', binsize=100,
+                                            stepsize=100)
+
+    def loading(garray):
+        for i, iv in enumerate(roi):
+            garray[iv, slice(None)] = values[0]
+            # later writes take precedence
+            garray[iv, 1] = values[1][:, :, 1]
+        return garray
+
+    for swg in [True, False]:
+        gas = [create_genomic_array(roi if not swg else
+                                    GenomicIndexer.create_from_genomesize({'chr10': 300}),
+                                    stranded=True, typecode='int16',
+                                    conditions=['c1', 'c2'],
+                                    storage=store, store_whole_genome=swg,
+                                    loader=loading, cache=None)
+               for store in ['ndarray', 'sparse']]
+        for iv in roi:
+            np.testing.assert_equal(gas[0][iv], gas[1][iv])
+        np.testing.assert_equal(gas[1][roi[0]][:, :, 1], values[1][:, :, 1])
+
+
+def test_runlength_access(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+
+    values = np.zeros((300, 2, 2), dtype='float32')
+    values[10:50, 0, 0] = 1.
+    values[40:120, 1, 1] = 2.5
+    values[200:, :, :] = np.nan
+
+    def loading(garray):
+        garray[Interval('chr10', 0, 300), slice(None)] = values
+        return garray
+
+    gsize = GenomicIndexer.create_from_genomesize({'chr10': 300})
+    for cache in [None, 'runlength_test', 'runlength_test']:
+        ga = create_genomic_array(gsize, stranded=True, typecode='float32',
+                                  conditions=['c1', 'c2'],
+                                  storage='runlength', cache=cache,
+                                  loader=loading, padding_value=-1.)
+
+        data = ga.handle['chr10']
+        assert data.shape == (300, 2, 2)
+        # runs: 0, 10, 40, 50, 120, 200
+        assert len(data.starts) == 6
+        np.testing.assert_equal(data[:], values)
+        np.testing.assert_equal(data[45:130], values[45:130])
+        np.testing.assert_equal(data[5:100:7, 1, :], values[5:100:7, 1, :])
+        np.testing.assert_equal(data[np.array([299, 3, 45])], values[[299, 3, 45]])
+        np.testing.assert_equal(data[41], values[41])
+        np.testing.assert_equal(ga[Interval('chr10', 280, 320, strand='+')][-20:],
+                                -np.ones((20, 2, 2)))
+
+    # regions of interest
+    roi = GenomicIndexer.create_from_region('chr10', 0, 300, '.', binsize=100,
+                                            stepsize=100)
+
+    def loading_roi(garray):
+        for i, region in enumerate(roi):
+            garray[region, slice(None)] = values[i*100:(i+1)*100]
+        return garray
+
+    ga = create_genomic_array(roi, stranded=True, typecode='float32',
+                              conditions=['c1', 'c2'], store_whole_genome=False,
+                              storage='runlength', cache=None,
+                              loader=loading_roi)
+    assert ga.handle['data'].shape == (3, 100, 2, 2)
+    for i, region in enumerate(roi):
+        np.testing.assert_equal(ga[region], values[i*100:(i+1)*100])
+    np.testing.assert_equal(ga.handle['data'][np.array([2, 0])],
+                            values.reshape(3, 100, 2, 2)[[2, 0]])
+
+
+def test_runlength_bounded_writes():
+    values = np.zeros((300, 1, 1), dtype='float32')
+    values[30:170] = 1.
+    values[250:] = np.nan
+
+    writer = genomicarray._RunLengthWriter((400, 1, 1), 'float32', 16,
+                                           padding_value=-1., maxbytes=256)
+    # blocks are written in reverse order and partially overwritten,
+    # such that evicted chunks need to be restored.
+    for start in range(250, -1, -50):
+        writer[start:start + 50] = values[start:start + 50]
+    writer[20:40] = values[20:40] + 1
+    assert writer.nbytes <= 256
+    assert writer._stored
+
+    expected = np.concatenate([values, -np.ones((100, 1, 1))])
+    expected[20:40] += 1
+    np.testing.assert_equal(writer[:], expected)
+
+    starts, runvalues = writer.finalize()
+    # runs that span several chunks are merged: 0, 20, 30, 40, 170, 250, 300
+    np.testing.assert_equal(starts, [0, 20, 30, 40, 170, 250, 300])
+    np.testing.assert_equal(runvalues[:, 0, 0], [0, 1, 2, 1, 0, np.nan, -1])
+
+
 def test_invalid_access():
 
     ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr10': 300}), stranded=False,
@@ -152,7 +520,7 @@ def test_zscore_normalization(tmpdir):
         garray[Interval('chr2', 0, 300), 0] = np.repeat(-1, 300).reshape(-1,1)
         return garray
 
-    for store in ['ndarray', 'hdf5']:
+    for store in ['ndarray', 'hdf5', 'memmap', 'chunked', 'runlength']:
         ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 150, 'chr2': 300}),
                                   stranded=False, typecode='float32',
                                   storage=store, cache=True, loader=loading,
@@ -197,7 +565,7 @@ def test_logzscore_normalization(tmpdir):
                           stranded=False, typecode='float32',
                           storage='ndarray', cache=None, loader=loading,
                           normalizer=['zscorelog'])
-    for store in ['ndarray', 'hdf5']:
+    for store in ['ndarray', 'hdf5', 'memmap', 'chunked', 'runlength']:
         ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 150, 'chr2': 300}),
                                   stranded=False, typecode='float32',
                                   storage=store, cache="cache_file", loader=loading,
@@ -222,13 +590,42 @@ def test_perctrim(tmpdir):
         garray[Interval('chr2', 0, 300), 0] = np.random.normal(loc=100, size=300).reshape(-1, 1)
         return garray
 
-    for store in ['ndarray', 'hdf5']:
+    for store in ['ndarray', 'hdf5', 'memmap', 'chunked', 'runlength']:
         ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 150, 'chr2': 300}),
                               stranded=False, typecode='float32',
                               storage=store, cache="cache_file", loader=loading,
                               normalizer=['binsizenorm', 'perctrim'])
 
 
+def test_percentile_blockwise(monkeypatch):
+    # small blocks enforce several passes over the data
+    monkeypatch.setattr(genomicarray, '_BLOCK_BYTES', 800)
+    monkeypatch.setattr(genomicarray, '_PERCENTILE_BINS', 4)
+    np.random.seed(0)
+    data = {'chr1': np.random.normal(loc=10, size=(1000, 2, 2)),
+            'chr2': np.random.exponential(size=(3000, 2, 2))}
+    data['chr2'][:1000] = 0.
+
+    def loading(garray):
+        for chrom in data:
+            garray[Interval(chrom, 0, len(data[chrom])), 0] = data[chrom][:, :, 0]
+            garray[Interval(chrom, 0, len(data[chrom])), 1] = data[chrom][:, :, 1]
+        return garray
+
+    ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 1000, 'chr2': 3000}),
+                              stranded=True, typecode='float64', conditions=['a', 'b'],
+                              storage='ndarray', cache=False, loader=loading)
+    alldata = np.concatenate([data['chr1'], data['chr2']])
+    for percentile in [0, 10, 33.3, 50, 99, 100]:
+        np.testing.assert_allclose(ga.percentile(percentile),
+                                   np.percentile(alldata, percentile, axis=(0, 1)))
+
+    genomicarray.PercentileTrimming(99)(ga)
+    quants = np.percentile(alldata, 99, axis=(0, 1))
+    np.testing.assert_allclose(ga[Interval('chr2', 1000, 3000)],
+                               np.minimum(data['chr2'][1000:], quants))
+
+
 def test_tmp_normalization(tmpdir):
     os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
 
@@ -237,7 +634,7 @@ def test_tmp_normalization(tmpdir):
         garray[Interval('chr2', 0, 300), 0] = np.repeat(1, 300).reshape(-1, 1)
         return garray
 
-    for store in ['ndarray', 'hdf5']:
+    for store in ['ndarray', 'hdf5', 'memmap', 'chunked', 'runlength']:
         ga = create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 150, 'chr2': 300}), stranded=False, typecode='float32',
                                   storage=store, cache="cache_file", resolution=50, loader=loading,
                                   collapser='sum',
@@ -281,3 +678,43 @@ def test_check_resolution_collapse_compatibility(tmpdir):
                               storage="ndarray", cache=None, resolution=None, loader=loading,
                               collapser='sum',
                               normalizer=['tpm'])
+
+
+def test_get_batch(tmpdir):
+    os.environ['JANGGU_OUTPUT'] = tmpdir.strpath
+
+    def loading(garray):
+        garray[Interval('chr1', 0, 150), 0] = np.arange(300).reshape(150, 2)
+        garray[Interval('chr2', 0, 300), 0] = np.arange(600).reshape(300, 2)
+        return garray
+
+    ivs = [Interval('chr1', 10, 60, strand='+'),
+           Interval('chr2', 40, 90, strand='-'),
+           Interval('chr1', 120, 170, strand='-'),
+           Interval('chr2', 0, 50, strand='.')]
+
+    gindexer = GenomicIndexer.create_from_file(ivs, None, None)
+    for swg in [True, False]:
+        gsize = GenomicIndexer.create_from_genomesize({'chr1': 150, 'chr2': 300}) \
+            if swg else gindexer
+        for store in ['ndarray', 'hdf5', 'sparse', 'memmap', 'chunked', 'runlength']:
+            ga = create_genomic_array(gsize, stranded=True, typecode='float32',
+                                      storage=store, cache='batch{}{}'.format(store, swg),
+                                      store_whole_genome=swg,
+                                      resolution=1, loader=loading)
+            chroms, starts, ends, strands = gindexer.coordinates()
+            batch = ga.get_batch(chroms, starts, ends, strands)
+            assert batch.shape == (4, 50, 2, 1)
+            for i, iv in enumerate(ivs):
+                expected = ga[iv]
+                if iv.strand == '-':
+                    expected = expected[::-1, ::-1, :]
+                np.testing.assert_equal(batch[i, :len(expected)], expected)
+            # the reversed region overlapping the chromosome end is padded
+            if swg:
+                np.testing.assert_equal(batch[2, :20], 0)
+
+            out = np.ones((4, 60, 2, 1), dtype='float32')
+            ga.get_batch(chroms, starts, ends, strands, out=out)
+            np.testing.assert_equal(out[:, :50], batch)
+            np.testing.assert_equal(out[:, 50:], 0)
@@ -127,3 +127,51 @@ def test_gindexer_merged_variable_length_ranges():
     iv = gi[-1]
     np.testing.assert_equal((iv.chrom, iv.start, iv.end, iv.strand),
                             ('chr2', 24000, 25000, '-'))
+
+
+def test_gindexer_coordinates():
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+
+    for flank, random_state in [(0, None), (20, None), (0, 1)]:
+        gi = GenomicIndexer.create_from_file(os.path.join(data_path,
+                                                          'sample.bed'),
+                                             binsize=200, stepsize=50,
+                                             flank=flank,
+                                             random_state=random_state)
+        idxs = [3, 0, 10, len(gi) - 1]
+        chroms, starts, ends, strands = gi.coordinates(idxs)
+        assert len(chroms) == len(idxs)
+        for i, idx in enumerate(idxs):
+            iv = gi[idx]
+            assert chroms[i] == iv.chrom
+            assert starts[i] == iv.start
+            assert ends[i] == iv.end
+            assert strands[i] == iv.strand
+
+        chroms, _, _, _ = gi.coordinates()
+        assert len(chroms) == len(gi)
+
+
+def test_gindexer_digest():
+    data_path = pkg_resources.resource_filename('janggu', 'resources/')
+
+    def _create(**kwargs):
+        options = dict(binsize=200, stepsize=50)
+        options.update(kwargs)
+        return GenomicIndexer.create_from_file(os.path.join(data_path,
+                                                            'sample.bed'),
+                                               **options)
+
+    digest = _create().digest()
+    assert digest == _create().digest()
+    assert digest != _create(stepsize=100).digest()
+    assert digest != _create(flank=20).digest()
+    assert digest != _create(random_state=1).digest()
+
+    gi = _create()
+    gi.strand[0] = '-'
+    assert digest != gi.digest()
+
+    gi = _create()
+    gi.chrs[-1] = 'chr3'
+    assert digest != gi.digest()
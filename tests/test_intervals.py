@@ -0,0 +1,55 @@
+import numpy as np
+
+from janggu.data.intervals import intersect
+from janggu.data.intervals import merge
+from janggu.data.intervals import sort
+
+
+def _intervals():
+    a = (np.asarray(['chr2', 'chr1', 'chr1', 'chr1', 'chr3']),
+         np.asarray([10, 50, 0, 20, 0]),
+         np.asarray([30, 60, 10, 25, 10]))
+    b = (np.asarray(['chr1', 'chr1', 'chr2', 'chr1']),
+         np.asarray([5, 12, 40, 22]),
+         np.asarray([15, 30, 41, 23]))
+    return a, b
+
+
+def test_intervals_sort():
+    a, _ = _intervals()
+    strands = np.asarray(['+', '-', '+', '-', '.'])
+    chroms, starts, ends, strands = sort(a + (strands,))
+    np.testing.assert_equal(chroms, ['chr1', 'chr1', 'chr1', 'chr2', 'chr3'])
+    np.testing.assert_equal(starts, [0, 20, 50, 10, 0])
+    np.testing.assert_equal(ends, [10, 25, 60, 30, 10])
+    np.testing.assert_equal(strands, ['+', '-', '-', '+', '.'])
+
+
+def test_intervals_merge():
+    a, b = _intervals()
+    chroms, starts, ends = merge(tuple(np.concatenate([x, y]) for x, y in zip(a, b)))
+    np.testing.assert_equal(chroms, ['chr1', 'chr1', 'chr2', 'chr2', 'chr3'])
+    np.testing.assert_equal(starts, [0, 50, 10, 40, 0])
+    np.testing.assert_equal(ends, [30, 60, 30, 41, 10])
+
+    # adjacent intervals are merged, but not across chromosomes
+    chroms, starts, ends = merge((['chr1', 'chr1', 'chr2'], [0, 12, 14],
+                                  [10, 20, 30]), distance=2)
+    np.testing.assert_equal(chroms, ['chr1', 'chr2'])
+    np.testing.assert_equal(starts, [0, 14])
+    np.testing.assert_equal(ends, [20, 30])
+
+    chroms, starts, ends = merge(([], [], []))
+    assert len(chroms) == len(starts) == len(ends) == 0
+
+
+def test_intervals_intersect():
+    a, b = _intervals()
+    ia, ib = intersect(a, b)
+    np.testing.assert_equal(ia, [2, 3, 3])
+    np.testing.assert_equal(ib, [0, 1, 3])
+
+    np.testing.assert_equal(intersect(a, b, unique=True), [2, 3])
+    np.testing.assert_equal(intersect(b, a, unique=True), [0, 1, 3])
+    assert len(intersect(a, ([], [], []), unique=True)) == 0
+
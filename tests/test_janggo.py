@@ -1218,6 +1218,24 @@ def test_sequence_config():
         break
 
 
+def test_sequence_buffer_pool():
+    variantsfile = pkg_resources.resource_filename('janggu', 'resources/pseudo_snps.vcf')
+    gindexer = GenomicIndexer.create_from_file(variantsfile, None, None)
+    array = np.random.random((len(gindexer), 3)).astype('float32')
+    cover = Cover.create_from_array('snps', array, gindexer,
+                                    store_whole_genome=False)
+
+    jseq = JangguSequence(cover, batch_size=2, buffer_pool_size=2)
+    batches = [jseq[i][0]['snps'] for i in range(len(jseq))]
+    assert batches[2] is batches[0]
+    assert batches[1] is not batches[0]
+    np.testing.assert_equal(batches[2][:, 0, 0, :], array[4:6])
+    np.testing.assert_equal(batches[1][:, 0, 0, :], array[2:4])
+
+    with pytest.raises(ValueError):
+        JangguSequence(cover, batch_size=2, buffer_pool_size=0)
+
+
 @pytest.mark.filterwarnings("ignore:inspect")
 def test_janggu_train_predict_sequence(tmpdir):
     """Train, predict and evaluate on dummy data.
@@ -0,0 +1,168 @@
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import pytest
+
+from janggu.data import GenomicIndexer
+from janggu.data import cache
+from janggu.data import create_genomic_array
+from janggu.data.cache import _touch_cachefile
+from janggu.data.cache import get_cache_grace_period
+from janggu.data.cache import list_cache_entries
+from janggu.data.cache import parse_size
+from janggu.data.cache import pin_cache_entry
+from janggu.data.cache import prune_cache
+from janggu.janggucache import main
+
+
+def _create(cache, storage='ndarray'):
+    def _loader(garray):
+        garray[GenomicIndexer.create_from_region('chr1', 0, 1000, '.', 1000, 1000)[0], 0] = \
+            np.ones((1000, 1), dtype='int32')
+        return garray
+
+    return create_genomic_array(GenomicIndexer.create_from_genomesize({'chr1': 1000}),
+                                stranded=False, typecode='int32',
+                                storage=storage, cache=cache, datatags=['test'],
+                                loader=_loader)
+
+
+def test_parse_size():
+    assert parse_size(100) == 100
+    assert parse_size('2K') == 2048
+    assert parse_size('1.5M') == int(1.5 * 1024**2)
+    assert parse_size('20GB') == 20 * 1024**3
+    with pytest.raises(ValueError):
+        parse_size('lots')
+    with pytest.raises(ValueError):
+        parse_size('-1')
+
+
+def test_cache_registry(tmpdir, monkeypatch):
+    monkeypatch.setenv('JANGGU_OUTPUT', tmpdir.strpath)
+    monkeypatch.delenv('JANGGU_CACHE_MAX_SIZE', raising=False)
+
+    _create('first')
+    _create('second', 'memmap')
+    _create('third', 'hdf5')
+    entries = list_cache_entries()
+    assert [entry['name'] for entry in entries] == \
+        [os.path.join('test', name) for name in ['first.npz', 'second.mmap', 'third.h5']]
+    assert all(entry['size'] > 0 for entry in entries)
+
+    # reloading the first entry makes it the most recently used one
+    _create('first')
+    assert list_cache_entries()[-1]['name'] == os.path.join('test', 'first.npz')
+
+    pin_cache_entry(os.path.join('test', 'second.mmap'))
+    with pytest.raises(ValueError):
+        pin_cache_entry('unknown.npz')
+
+    evicted = prune_cache(0, dry_run=True)
+    assert [entry['name'] for entry in evicted] == \
+        [os.path.join('test', 'third.h5'), os.path.join('test', 'first.npz')]
+    assert len(list_cache_entries()) == 3
+
+    prune_cache(0)
+    entries = list_cache_entries()
+    assert [entry['name'] for entry in entries] == [os.path.join('test', 'second.mmap')]
+    assert entries[0]['pinned']
+
+
+def test_cache_max_size(tmpdir, monkeypatch):
+    monkeypatch.setenv('JANGGU_OUTPUT', tmpdir.strpath)
+    monkeypatch.setenv('JANGGU_CACHE_MAX_SIZE', '1')
+    monkeypatch.setenv('JANGGU_CACHE_GRACE_PERIOD', '0')
+    monkeypatch.setattr(cache, '_OPEN_ENTRIES', set())
+    region = GenomicIndexer.create_from_region('chr1', 0, 10, '.', 10, 10)[0]
+
+    # the entries in use by this process are never evicted
+    first = _create('first', 'chunked')
+    second = _create('second', 'chunked')
+    assert len(list_cache_entries()) == 2
+    np.testing.assert_equal(first[region].sum(), 10)
+    np.testing.assert_equal(second[region].sum(), 10)
+
+    # the entries of a previous process are evicted once a new entry is created
+    monkeypatch.setattr(cache, '_OPEN_ENTRIES', set())
+    _create('first', 'chunked')
+    assert len(list_cache_entries()) == 2
+    _create('third')
+    entries = list_cache_entries()
+    assert [entry['name'] for entry in entries] == \
+        [os.path.join('test', 'first.chunked'), os.path.join('test', 'third.npz')]
+
+    # recently used entries of other processes are retained
+    monkeypatch.setattr(cache, '_OPEN_ENTRIES', set())
+    monkeypatch.delenv('JANGGU_CACHE_GRACE_PERIOD')
+    _create('fourth')
+    assert len(list_cache_entries()) == 3
+
+    monkeypatch.setenv('JANGGU_CACHE_GRACE_PERIOD', '30')
+    assert get_cache_grace_period() == 30
+    monkeypatch.setenv('JANGGU_CACHE_GRACE_PERIOD', 'soon')
+    with pytest.raises(ValueError):
+        get_cache_grace_period()
+
+
+def _touch_all(filenames):
+    for filename in filenames:
+        _touch_cachefile(filename)
+
+
+def test_cache_registry_concurrent_updates(tmpdir, monkeypatch):
+    monkeypatch.setenv('JANGGU_OUTPUT', tmpdir.strpath)
+    monkeypatch.delenv('JANGGU_CACHE_MAX_SIZE', raising=False)
+    os.makedirs(os.path.join(tmpdir.strpath, 'datasets', 'test'))
+    names = [os.path.join('test', 'entry{}.npz'.format(i)) for i in range(400)]
+    filenames = [os.path.join(tmpdir.strpath, 'datasets', name) for name in names]
+    for filename in filenames:
+        open(filename, 'w').close()
+
+    # no process loses the records of the others
+    pool = Pool(4)
+    try:
+        pool.map(_touch_all, [filenames[i::4] for i in range(4)])
+    finally:
+        pool.close()
+        pool.join()
+    with open(os.path.join(tmpdir.strpath, 'datasets', 'registry.json')) as file_:
+        registry = json.load(file_)
+    assert sorted(registry) == sorted(names)
+
+
+def test_janggu_cache_cli(tmpdir, monkeypatch, capsys):
+    monkeypatch.setenv('JANGGU_OUTPUT', tmpdir.strpath)
+    monkeypatch.delenv('JANGGU_CACHE_MAX_SIZE', raising=False)
+    _create('first')
+    _create('second', 'chunked')
+    name = os.path.join('test', 'first.npz')
+
+    main(['list'])
+    out = capsys.readouterr().out
+    assert name in out
+    assert '2 entries' in out
+
+    main(['inspect', name])
+    out = capsys.readouterr().out
+    assert 'chr1' in out
+
+    main(['inspect', os.path.join(tmpdir.strpath, 'datasets', 'test', 'second.chunked')])
+    out = capsys.readouterr().out
+    assert 'chr1' in out
+
+    main(['pin', name])
+    main(['prune', '-max-size', '0', '-dry-run'])
+    out = capsys.readouterr().out
+    assert 'would remove' in out and 'second.chunked' in out
+    assert len(list_cache_entries()) == 2
+
+    main(['pin', name, '-unpin'])
+    main(['-path', tmpdir.strpath, 'prune', '-max-size', '0'])
+    assert list_cache_entries() == []
+
+    # a budget is required for pruning
+    with pytest.raises(SystemExit):
+        main(['prune'])